@@ -0,0 +1,8 @@
+###
+# Async interface for the read-only endpoints, served by uvicorn
+# (`uvicorn asgi_app:app --port 4001`). backend_app.py is still
+# the main application and serves everything else.
+###
+from backend.asgi_entry import create_asgi_app
+
+app = create_asgi_app()
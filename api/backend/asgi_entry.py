@@ -0,0 +1,59 @@
+#------------------------------------------------------------
+# Async serving mode for the read-only endpoints (see
+# coopconnect_routes/async_read_routes.py). Runs next to the
+# Flask app, which still serves every route including writes:
+#
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 4001 --workers 2
+#------------------------------------------------------------
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+
+from backend.db_connection import PoolExhausted
+from backend.db_connection.aio import async_db
+from backend.coopconnect_routes.async_read_routes import routes, FlaskJSONResponse
+from backend.rest_entry import load_database_config
+
+
+async def handle_pool_exhausted(request, exc):
+    # the same back-off answer the Flask app gives
+    return FlaskJSONResponse({'error': str(exc)}, 503)
+
+
+async def handle_error(request, exc):
+    # the {'error': ...} 500 the Flask routes answer a failed query with
+    return FlaskJSONResponse({'error': str(exc)}, 500)
+
+
+def create_asgi_app():
+    load_dotenv()
+    config = {}
+    load_database_config(config)
+    async_db.init_app(config)
+    FlaskJSONResponse.http_dates = os.getenv('API_JSON_DATES', 'iso').lower() == 'http'
+
+    # one pool per worker process, opened on that worker's event loop
+    @asynccontextmanager
+    async def lifespan(app):
+        await async_db.open()
+        try:
+            yield
+        finally:
+            await async_db.close()
+
+    # gzip with the same threshold and level as the Flask app's compressor
+    middleware = []
+    if os.getenv('API_COMPRESSION_ENABLED', 'true').lower() == 'true':
+        middleware.append(Middleware(
+            GZipMiddleware,
+            minimum_size=int(os.getenv('API_COMPRESSION_MIN_SIZE', '1024')),
+            compresslevel=int(os.getenv('API_COMPRESSION_LEVEL', '6'))))
+
+    # no response cache here: writes go through the Flask app, in another
+    # process, so nothing would ever invalidate it
+    return Starlette(routes=routes, lifespan=lifespan, middleware=middleware,
+                     exception_handlers={PoolExhausted: handle_pool_exhausted, Exception: handle_error})
@@ -0,0 +1,246 @@
+#------------------------------------------------------------
+# This file creates a shared in-process response cache for
+# read-mostly endpoints (cities, zip codes, airports, ...)
+#------------------------------------------------------------
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, make_response, request
+from pymysql import MySQLError
+from pymysql.constants import ER
+
+from backend.compression import etag_variants
+from backend.db_connection import db
+
+# one bump per table, however many rows the write changed; executemany()
+# sends every table of a write in one multi-row statement
+BUMP_TABLE_VERSION = '''
+    INSERT INTO TableVersion (Table_Name, Version) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE Version = Version + 1
+'''
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of serialized GET responses.
+
+    Each cached view names the tables its response is built from.
+    Write routes call invalidate() with the tables they change, which
+    drops every cached response built from those tables.
+
+    Every cached response carries a strong ETag made from the request
+    and the TableVersion counters of its tables, which invalidate() bumps
+    once per write. The counters live in MySQL, so the tag is the same in
+    every worker and across restarts, and a write made anywhere changes
+    it: a client revalidating with If-None-Match gets its 304 after one
+    primary key lookup, before the view runs or anything is serialized.
+
+    A plain GET that finds its entry within the TTL is answered without
+    touching MySQL. The counters are only read on a miss, after expiry,
+    or to answer If-None-Match, so a write in another worker reaches this
+    worker's copy when it expires; the worker that wrote drops its own
+    copies at once. Revalidating clients always see the current counters.
+
+    Without the TableVersion table (a database from before migration
+    010) the ETag is a hash of the body.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped on every invalidation so a response computed while a
+        # write was happening is never stored
+        self._versions = {}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'not_modified': 0}
+        # cleared the first time TableVersion turns out not to exist
+        self._db_versions = True
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('API_CACHE_MAX_ENTRIES', self.max_entries)
+        self.enabled = app.config.get('API_CACHE_ENABLED', self.enabled)
+
+    # -- storage --------------------------------------------------------
+
+    def get(self, key, db_versions=None):
+        """The entry for `key` if it hasn't expired and, when `db_versions` is given, was built at them."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is None or entry['expires'] <= time.monotonic()
+                    or db_versions is not None and entry['db_versions'] != db_versions):
+                if entry is not None:
+                    del self._entries[key]
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def set(self, key, entry, versions):
+        with self._lock:
+            if any(self._versions.get(t, 0) != v for t, v in versions.items()):
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def table_versions(self, tables):
+        with self._lock:
+            return {t: self._versions.get(t, 0) for t in tables}
+
+    def db_versions(self, tables):
+        """
+        The TableVersion counters of `tables`, read on the request's own
+        connection. This is the first read of the request's transaction,
+        so the view's queries see the data as of these versions.
+        Returns None if the table doesn't exist.
+        """
+        if not self._db_versions:
+            return None
+        tables = sorted(tables)
+        cursor = db.get_db().cursor()
+        try:
+            cursor.execute(
+                f"SELECT Table_Name, Version FROM TableVersion WHERE Table_Name IN ({', '.join(['%s'] * len(tables))})",
+                tables)
+        except MySQLError as e:
+            self._no_table_versions(e)
+            return None
+        versions = {row['Table_Name']: row['Version'] for row in cursor.fetchall()}
+        return tuple((table, versions.get(table, 0)) for table in tables)
+
+    def bump_db_versions(self, tables):
+        """
+        Add one to the TableVersion counters of `tables` and commit, on the
+        request's own connection. Tables without a row get one.
+        """
+        if not self._db_versions or not tables:
+            return
+        conn = db.get_db()
+        cursor = conn.cursor()
+        try:
+            # in a fixed order, so concurrent writers lock the rows the same way
+            cursor.executemany(BUMP_TABLE_VERSION, [(table, 1) for table in sorted(tables)])
+            conn.commit()
+        except MySQLError as e:
+            self._no_table_versions(e)
+        finally:
+            cursor.close()
+
+    def _no_table_versions(self, error):
+        # only a missing table (a database from before migration 010) turns
+        # the counters off; anything else is a real error for the caller
+        if error.args[0] != ER.NO_SUCH_TABLE:
+            raise error
+        self._db_versions = False
+        current_app.logger.warning('No TableVersion counters (%s); ETags fall back to hashing the body', error)
+
+    def invalidate(self, *tables):
+        """
+        Drop every cached response built from any of `tables` and bump
+        their TableVersion counters, so every client's ETag goes stale
+        now and other workers' copies go when they next read the counters.
+        Call it after committing the write.
+        """
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [k for k, e in self._entries.items() if e['tables'] & set(tables)]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidations'] += 1
+        self.bump_db_versions(set(tables))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['max_entries'] = self.max_entries
+        return stats
+
+    # -- view decorator -------------------------------------------------
+
+    def cached(self, ttl, tables, key=None):
+        """
+        Cache a GET view's 200 responses for `ttl` seconds, keyed on the
+        endpoint and query string, and tag them with `tables`.
+
+        `key`, if given, is called with the view's URL arguments and its
+        result replaces them in the cache key, so requests that the view
+        answers the same way (e.g. values in the same bucket) share an entry.
+        """
+        tables = frozenset(tables)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                view_key = key(**kwargs) if key else tuple(sorted(kwargs.items()))
+                cache_key = (request.endpoint, view_key, request.query_string)
+                revalidating = bool(request.if_none_match)
+                # a plain hit is served without a round trip to MySQL
+                entry = None if revalidating else self.get(cache_key)
+                etag = None
+                if entry is None:
+                    db_versions = self.db_versions(tables)
+                    if db_versions is not None:
+                        etag = hashlib.sha1(repr((cache_key, db_versions)).encode()).hexdigest()
+                        response = self._not_modified(etag)
+                        if response is not None:
+                            return response
+                    if revalidating:
+                        entry = self.get(cache_key, db_versions)
+                if entry is None:
+                    versions = self.table_versions(tables)
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    entry = {
+                        'body': body,
+                        'mimetype': response.mimetype,
+                        'etag': etag or hashlib.sha1(body).hexdigest(),
+                        'tables': tables,
+                        'db_versions': db_versions,
+                        'expires': time.monotonic() + ttl,
+                    }
+                    self.set(cache_key, entry, versions)
+                if etag is None:
+                    response = self._not_modified(entry['etag'])
+                    if response is not None:
+                        return response
+
+                response = Response(entry['body'], mimetype=entry['mimetype'])
+                response.set_etag(entry['etag'])
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            return wrapper
+        return decorator
+
+    def _not_modified(self, etag):
+        """A 304 if the client's If-None-Match has `etag`, compressed or not."""
+        for tag in etag_variants(etag):
+            if request.if_none_match.contains_weak(tag):
+                with self._lock:
+                    self._stats['not_modified'] += 1
+                response = Response(status=304)
+                response.set_etag(tag)
+                response.headers['Cache-Control'] = 'no-cache'
+                response.vary.add('Accept-Encoding')
+                return response
+        return None
+
+
+cache = ResponseCache()
@@ -0,0 +1,120 @@
+#------------------------------------------------------------
+# ?format=arrow and ?format=parquet for the list endpoints that
+# analysts load into pandas. Rows come off an unbuffered cursor
+# as tuples a batch at a time and go straight into Arrow column
+# arrays, so neither side builds a dict per row and the client
+# gets typed columns (pyarrow.ipc.open_stream(...).read_pandas()
+# or pandas.read_parquet) instead of parsing JSON.
+#------------------------------------------------------------
+from flask import Response, jsonify, make_response
+from pymysql.constants import FIELD_TYPE, FLAG
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: without it these formats answer 501
+    pa = None
+
+from backend.db_connection import db, SSCursor
+
+# ?format= value -> media type
+COLUMNAR_FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# rows per record batch (and Parquet row group)
+COLUMNAR_BATCH_SIZE = 10000
+# error body when pyarrow isn't installed
+PYARROW_MISSING = {'error': 'Arrow and Parquet output need pyarrow installed'}
+# MySQL reports this character set for binary columns (BLOB, GEOMETRY, ...)
+BINARY_CHARSET = 63
+
+INTEGER_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.INT24, FIELD_TYPE.LONG,
+                 FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR}
+FLOAT_TYPES = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+DECIMAL_TYPES = {FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL}
+TIMESTAMP_TYPES = {FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP}
+
+
+def arrow_type(field):
+    """The Arrow type for a result column, from its pymysql field descriptor."""
+    type_code = field.type_code
+    if type_code in INTEGER_TYPES:
+        if type_code == FIELD_TYPE.LONGLONG and field.flags & FLAG.UNSIGNED:
+            return pa.uint64()
+        return pa.int64()
+    if type_code in FLOAT_TYPES:
+        return pa.float64()
+    if type_code in DECIMAL_TYPES:
+        # the reported length counts the sign and point, so it's never short
+        return pa.decimal128(min(field.length, 38), field.scale)
+    if type_code in TIMESTAMP_TYPES:
+        return pa.timestamp('us')
+    if type_code == FIELD_TYPE.DATE:
+        return pa.date32()
+    if type_code == FIELD_TYPE.TIME:
+        return pa.duration('us')
+    if field.charsetnr == BINARY_CHARSET and type_code != FIELD_TYPE.JSON:
+        return pa.binary()
+    return pa.string()
+
+
+def arrow_schema(fields):
+    """
+    Schema for a result's pymysql/aiomysql field descriptors. Columns are
+    named the way the dict cursors name their keys, so a duplicate name
+    (e.g. the CategoryID of both sides of a join) becomes "Table.column".
+    """
+    names = []
+    for field in fields:
+        name = field.name
+        if name in names:
+            name = f'{field.table_name}.{name}'
+        names.append(name)
+    return pa.schema([pa.field(name, arrow_type(field)) for name, field in zip(names, fields)])
+
+
+def record_batch(schema, rows):
+    """One record batch from a list of row tuples, built a column at a time."""
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema)
+
+
+def columnar_body(schema, batches, fmt):
+    """Write `batches` as an Arrow IPC stream or a Parquet file and return the bytes."""
+    sink = pa.BufferOutputStream()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    with writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def columnar_response(query, args=None, fmt='arrow'):
+    """
+    Run `query` on the request's connection and answer with its result in
+    `fmt`, one of COLUMNAR_FORMATS. The body is built in memory, so the
+    response can be cached and revalidated like the JSON one.
+    """
+    if pa is None:
+        return make_response(jsonify(PYARROW_MISSING), 501)
+    cursor = db.get_db().cursor(SSCursor)
+    try:
+        cursor.execute(query, args)
+        schema = arrow_schema(cursor._result.fields)
+
+        def batches():
+            while True:
+                rows = cursor.fetchmany(COLUMNAR_BATCH_SIZE)
+                if not rows:
+                    break
+                yield record_batch(schema, rows)
+
+        body = columnar_body(schema, batches(), fmt)
+    finally:
+        # reads whatever is left of the result, so the connection stays usable
+        cursor.close()
+    return Response(body, mimetype=COLUMNAR_FORMATS[fmt])
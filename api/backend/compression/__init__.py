@@ -0,0 +1,125 @@
+#------------------------------------------------------------
+# Compresses response bodies with brotli or gzip, whichever the
+# client's Accept-Encoding prefers. List endpoints like /housing
+# or /job_postings repeat the same keys on every row, so they
+# shrink to a fraction of their size on the wire.
+#------------------------------------------------------------
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+# in order of preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    # Parquet compresses its own pages; an uncompressed Arrow stream doesn't
+    'application/vnd.apache.arrow.stream',
+    'image/svg+xml',
+}
+
+
+def etag_variants(etag):
+    """`etag` and the tags Compressor gives its compressed versions."""
+    return [etag] + [f'{etag}-{encoding}' for encoding in ENCODINGS]
+
+
+class Compressor:
+    """
+    after_request hook that compresses responses of at least `min_size`
+    bytes for clients that accept br or gzip.
+
+    A compressed response gets its own strong ETag (the body's tag plus
+    "-br" or "-gzip"), as a different byte sequence has to. Bodies
+    compressed for a strong ETag are kept in a small LRU, so an unchanged
+    cached response isn't compressed again on every request.
+    """
+
+    def __init__(self, min_size=1024, level=6, max_entries=64):
+        self.enabled = True
+        self.min_size = min_size
+        self.level = level
+        self.max_entries = max_entries
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'compressed': 0, 'reused': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('API_COMPRESSION_ENABLED', self.enabled)
+        self.min_size = app.config.get('API_COMPRESSION_MIN_SIZE', self.min_size)
+        self.level = app.config.get('API_COMPRESSION_LEVEL', self.level)
+        app.after_request(self.compress)
+
+    def _compressible(self, response):
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+            return False
+        if 'Content-Encoding' in response.headers or 'no-transform' in response.cache_control:
+            return False
+        mimetype = response.mimetype or ''
+        if not (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES):
+            return False
+        return response.calculate_content_length() >= self.min_size
+
+    def _encode(self, body, encoding):
+        if encoding == 'br':
+            # brotli's quality runs 0-11; gzip's 1-9 level maps onto its lower range
+            return brotli.compress(body, quality=min(self.level, 11))
+        # mtime=0 so the same body always compresses to the same bytes
+        return gzip.compress(body, compresslevel=self.level, mtime=0)
+
+    def compress(self, response):
+        if not self.enabled or not self._compressible(response):
+            return response
+
+        # whatever the client sent, caches in between must keep one copy
+        # per encoding
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag and not weak else None
+        with self._lock:
+            compressed = self._bodies.get(key) if key else None
+            if compressed is not None:
+                self._bodies.move_to_end(key)
+                self._stats['reused'] += 1
+        if compressed is None:
+            compressed = self._encode(body, encoding)
+            if key:
+                with self._lock:
+                    self._bodies[key] = compressed
+                    while len(self._bodies) > self.max_entries:
+                        self._bodies.popitem(last=False)
+
+        with self._lock:
+            self._stats['compressed'] += 1
+            self._stats['bytes_in'] += len(body)
+            self._stats['bytes_out'] += len(compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._bodies)
+            stats['encodings'] = list(ENCODINGS)
+        return stats
+
+
+compressor = Compressor()
@@ -0,0 +1,189 @@
+#------------------------------------------------------------
+# Read-only endpoints for the ASGI app (backend/asgi_entry.py).
+# Each one answers like the Flask route with the same path and
+# shares its helpers, but awaits its query on the async pool, so
+# one event loop serves many clients waiting on MySQL at once.
+#------------------------------------------------------------
+import aiomysql
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from backend.columnar import (
+    COLUMNAR_BATCH_SIZE, COLUMNAR_FORMATS, PYARROW_MISSING, arrow_schema, columnar_body, pa, record_batch)
+from backend.db_connection.aio import async_db
+from backend.json_provider import dumpb
+from backend.coopconnect_routes.employer import format_city
+from backend.coopconnect_routes.student_route import (
+    requested_job_posting_columns, JOB_POSTINGS_DEFAULT_LIMIT, JOB_POSTINGS_MAX_LIMIT)
+from backend.coopconnect_routes.system_admin_routes import (
+    day_range, format_performance, parse_performance_range, performance_columns_query,
+    performance_range_query, performance_range_result)
+
+# rows pulled per round trip when streaming
+STREAM_BATCH_SIZE = 500
+
+
+class FlaskJSONResponse(JSONResponse):
+    """JSON encoded the way the Flask app's jsonify does it (backend/json_provider)."""
+
+    http_dates = False
+
+    def render(self, content):
+        return dumpb(content, http_dates=self.http_dates) + b'\n'
+
+
+async def stream_rows(query, args=None):
+    """
+    Yield rows through an unbuffered server-side cursor, like db.stream().
+    A stream abandoned half way closes its connection, since it can't be
+    reused until the rest of the result is read.
+    """
+    async with async_db.connection() as conn:
+        finished = False
+        try:
+            async with conn.cursor(aiomysql.SSDictCursor) as cursor:
+                await cursor.execute(query, args)
+                while True:
+                    rows = await cursor.fetchmany(STREAM_BATCH_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+            finished = True
+        finally:
+            if not finished:
+                conn.close()
+
+
+async def columnar_response(query, args=None, fmt='arrow'):
+    """Like backend.columnar.columnar_response, reading the batches on the async pool."""
+    if pa is None:
+        return FlaskJSONResponse(PYARROW_MISSING, 501)
+    batches = []
+    async with async_db.connection() as conn:
+        finished = False
+        try:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(query, args)
+                schema = arrow_schema(cursor._result.fields)
+                while True:
+                    rows = await cursor.fetchmany(COLUMNAR_BATCH_SIZE)
+                    if not rows:
+                        break
+                    batches.append(record_batch(schema, rows))
+            finished = True
+        finally:
+            if not finished:
+                conn.close()
+    return Response(columnar_body(schema, batches, fmt), media_type=COLUMNAR_FORMATS[fmt])
+
+
+async def get_all_cities(request):
+    cities_data = await async_db.fetchall('SELECT * FROM City')
+    return FlaskJSONResponse([format_city(city) for city in cities_data])
+
+
+async def get_housing(request):
+    if request.query_params.get('format') in COLUMNAR_FORMATS:
+        return await columnar_response('SELECT * FROM Housing', fmt=request.query_params['format'])
+    return FlaskJSONResponse(await async_db.fetchall('SELECT * FROM Housing'))
+
+
+async def get_airports(request):
+    return FlaskJSONResponse(await async_db.fetchall('SELECT * FROM Airport'))
+
+
+async def get_hospitals(request):
+    return FlaskJSONResponse(await async_db.fetchall('SELECT * FROM Hospital'))
+
+
+async def get_all_job_postings(request):
+    """Same query parameters and responses as GET /job_postings in student_route."""
+    args = request.query_params
+    try:
+        columns = requested_job_posting_columns(args)
+        after = int(args['after']) if 'after' in args else None
+        limit = int(args['limit']) if 'limit' in args else None
+    except ValueError as e:
+        return FlaskJSONResponse({'error': f'Invalid query parameter: {e}'}, 400)
+    if limit is not None and not 1 <= limit <= JOB_POSTINGS_MAX_LIMIT:
+        return FlaskJSONResponse({'error': f'limit must be between 1 and {JOB_POSTINGS_MAX_LIMIT}'}, 400)
+
+    params = []
+    query = f"SELECT {', '.join(columns)} FROM JobPosting"
+    if after is not None:
+        query += ' WHERE Post_ID > %s'
+        params.append(after)
+    query += ' ORDER BY Post_ID'
+
+    fmt = args.get('format')
+    if fmt == 'ndjson' or fmt in COLUMNAR_FORMATS:
+        if limit is not None:
+            query += ' LIMIT %s'
+            params.append(limit)
+        if fmt in COLUMNAR_FORMATS:
+            return await columnar_response(query, tuple(params), fmt)
+
+        async def generate():
+            async for row in stream_rows(query, tuple(params)):
+                yield dumpb(row, http_dates=FlaskJSONResponse.http_dates) + b'\n'
+
+        return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+    if after is None and limit is None:
+        return FlaskJSONResponse(await async_db.fetchall(query, tuple(params)))
+
+    if limit is None:
+        limit = JOB_POSTINGS_DEFAULT_LIMIT
+
+    # fetch one extra row to find out whether there is another page
+    query += ' LIMIT %s'
+    params.append(limit + 1)
+    rows = await async_db.fetchall(query, tuple(params))
+    page = rows[:limit]
+    next_after = page[-1]['Post_ID'] if len(rows) > limit else None
+    return FlaskJSONResponse({'job_postings': page, 'next_after': next_after})
+
+
+async def get_performance(request):
+    day = day_range(request.path_params['Date'])
+    if day is None:
+        return FlaskJSONResponse({"error": "Date must be YYYY-MM-DD"}, 400)
+    if request.query_params.get('format') in COLUMNAR_FORMATS:
+        return await columnar_response(*performance_columns_query(day), fmt=request.query_params['format'])
+    performance_data = await async_db.fetchall(
+        'SELECT * FROM Performance WHERE `Date` >= %s AND `Date` < %s ORDER BY `Date`', day)
+    return FlaskJSONResponse([format_performance(record) for record in performance_data])
+
+
+async def get_performance_range(request):
+    try:
+        start, end, bucket, merge = parse_performance_range(request.query_params)
+    except ValueError as e:
+        return FlaskJSONResponse({"error": str(e)}, 400)
+    rows = await async_db.fetchall(*performance_range_query(start, end, bucket))
+    return FlaskJSONResponse(performance_range_result(rows, start, bucket, merge))
+
+
+async def get_available_dates(request):
+    # one entry per day, read from idx_perf_date rather than the table
+    dates = await async_db.fetchall('SELECT DISTINCT DATE(`Date`) AS Day FROM Performance ORDER BY Day DESC')
+    return FlaskJSONResponse([record['Day'].strftime('%Y-%m-%d') for record in dates if record['Day']])
+
+
+async def get_pool_stats(request):
+    return FlaskJSONResponse(async_db.stats())
+
+
+routes = [
+    Route('/city', get_all_cities),
+    Route('/housing', get_housing),
+    Route('/airports', get_airports),
+    Route('/hospitals', get_hospitals),
+    Route('/job_postings', get_all_job_postings),
+    # before /performance/{Date} so "dates" isn't taken for a date
+    Route('/performance/dates', get_available_dates),
+    Route('/performance/{Date}', get_performance),
+    Route('/performance', get_performance_range),
+    Route('/db/pool', get_pool_stats),
+]
@@ -4,6 +4,7 @@ from flask import jsonify
 from flask import make_response
 from flask import current_app
 from backend.db_connection import db
+from backend.cache import cache
 #Creates a new blueprint to collect the routes
 employer = Blueprint('Employer', __name__)
 
@@ -72,6 +73,7 @@ def delete_job_posting(post_id):
     ''', (post_id,))
     
     db.get_db().commit()  # Commit the transaction
+    cache.invalidate('JobPosting')
     if cursor.rowcount > 0:
         return make_response(jsonify({'message': 'Job posting deleted successfully'}), 200)
     else:
@@ -117,6 +119,7 @@ def update_job_posting(post_id):
     cursor.execute(update_query, tuple(params))
     
     db.get_db().commit()  # Commit the transaction
+    cache.invalidate('JobPosting')
     if cursor.rowcount > 0:
         return make_response(jsonify({'message': 'Job posting updated successfully'}), 200)
     else:
@@ -142,6 +145,7 @@ def get_student_population_by_zip(city_name):
 
 # Get all zip codes
 @employer.route('/zipcodes', methods=['GET'])
+@cache.cached(ttl=3600, tables=['Location'])
 def get_all_zipcodes():
     cursor = db.get_db().cursor()
     cursor.execute('SELECT Zip FROM Location')
@@ -238,8 +242,257 @@ def create_job_posting():
     ''', (title, bio, compensation, location_id, user_id))  # Assuming Location_ID is optional or can be set later
 
     db.get_db().commit()  # Commit the transaction
+    cache.invalidate('JobPosting')
     return make_response(jsonify({'message': 'Job posting created successfully'}), 201)
 
+JOB_POSTINGS_BULK_MAX = 5000
+JOB_POSTINGS_BULK_CHUNK = 1000
+
+# request key -> JobPosting column for bulk updates
+JOB_POSTING_UPDATE_FIELDS = {
+    'title': 'Title',
+    'bio': 'Bio',
+    'compensation': 'Compensation',
+    'location_id': 'Location_ID',
+}
+
+# column limits checked per item, so one bad value fails its own item
+# rather than the whole batch's transaction
+JOB_POSTING_TITLE_MAX = 75   # varchar(75)
+JOB_POSTING_BIO_MAX = 65535  # bytes in a TEXT column
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def int_field(value):
+    # an integer (or integer string) that fits a signed INT column, else None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        try:
+            value = int(value.strip())
+        except ValueError:
+            return None
+    if not isinstance(value, int) or not INT_MIN <= value <= INT_MAX:
+        return None
+    return value
+
+
+def clean_job_posting(posting, fields):
+    """
+    The posting's values for `fields` (JOB_POSTING_UPDATE_FIELDS keys),
+    checked against the JobPosting columns. Returns (values, error).
+    """
+    values = {}
+    for field in fields:
+        value = posting.get(field)
+        if field == 'title':
+            if not isinstance(value, str) or len(value) > JOB_POSTING_TITLE_MAX:
+                return None, f'title must be a string of at most {JOB_POSTING_TITLE_MAX} characters'
+        elif field == 'bio':
+            if not isinstance(value, str) or len(value.encode('utf-8')) > JOB_POSTING_BIO_MAX:
+                return None, f'bio must be a string of at most {JOB_POSTING_BIO_MAX} bytes'
+        else:
+            value = int_field(value)
+            if value is None:
+                return None, f'{field} must be an integer between {INT_MIN} and {INT_MAX}'
+        values[field] = value
+    return values, None
+
+
+def fetch_existing(cursor, query, values):
+    # run an "... IN (...)" lookup for a batch of values in one query
+    values = list(set(values))
+    if not values:
+        return []
+    cursor.execute(query.format(', '.join(['%s'] * len(values))), values)
+    return cursor.fetchall()
+
+
+def bulk_items(key):
+    # a bulk body is either a JSON list or an object holding the list under `key`
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None, make_response(jsonify({'error': f'Expected a non-empty list of {key}'}), 400)
+    if len(items) > JOB_POSTINGS_BULK_MAX:
+        return None, make_response(jsonify({'error': f'At most {JOB_POSTINGS_BULK_MAX} items per request'}), 413)
+    return items, None
+
+
+# Create many job postings in one transaction
+@employer.route('/job_postings/bulk', methods=['POST'])
+def create_job_postings_bulk():
+    """
+    Body: {"user_email": ..., "postings": [{title, bio, compensation, location_id}, ...]}
+    A posting may carry its own user_email to override the top-level one.
+    Invalid postings are reported per item and the rest are inserted.
+    """
+    postings, error = bulk_items('postings')
+    if error:
+        return error
+    data = request.get_json()
+    default_email = data.get('user_email') if isinstance(data, dict) else None
+
+    results = [None] * len(postings)
+    candidates = []
+    for index, posting in enumerate(postings):
+        if not isinstance(posting, dict):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Posting must be an object'}
+            continue
+        email = posting.get('user_email', default_email)
+        if not posting.get('title') or not posting.get('bio') or posting.get('compensation') is None or not email:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Missing required fields'}
+            continue
+        if not isinstance(email, str):
+            results[index] = {'index': index, 'status': 'error', 'error': 'user_email must be a string'}
+            continue
+        fields = [k for k in JOB_POSTING_UPDATE_FIELDS if posting.get(k) is not None]
+        values, problem = clean_job_posting(posting, fields)
+        if problem:
+            results[index] = {'index': index, 'status': 'error', 'error': problem}
+            continue
+        values.setdefault('location_id', None)
+        candidates.append((index, email, values))
+
+    cursor = db.get_db().cursor()
+    # MySQL matches the emails case-insensitively, so look them up the same way
+    user_ids = {r['email'].casefold(): r['UserID'] for r in fetch_existing(
+        cursor, 'SELECT UserID, email FROM User WHERE email IN ({})',
+        [email for _, email, _ in candidates])}
+    known_zips = {r['Zip'] for r in fetch_existing(
+        cursor, 'SELECT Zip FROM Location WHERE Zip IN ({})',
+        [p['location_id'] for _, _, p in candidates if p['location_id'] is not None])}
+
+    rows = []
+    for index, email, posting in candidates:
+        if email.casefold() not in user_ids:
+            results[index] = {'index': index, 'status': 'error', 'error': 'User not found'}
+        elif posting['location_id'] not in known_zips:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Location not found'}
+        else:
+            rows.append((posting['title'], posting['bio'], posting['compensation'],
+                         posting['location_id'], user_ids[email.casefold()]))
+            results[index] = {'index': index, 'status': 'created'}
+
+    if rows:
+        try:
+            for start in range(0, len(rows), JOB_POSTINGS_BULK_CHUNK):
+                cursor.executemany('''
+                    INSERT INTO JobPosting (Title, Bio, Compensation, Location_ID, User_ID)
+                    VALUES (%s, %s, %s, %s, %s)
+                ''', rows[start:start + JOB_POSTINGS_BULK_CHUNK])
+            db.get_db().commit()
+            cache.invalidate('JobPosting')
+        except Exception as e:
+            db.get_db().rollback()
+            return make_response(jsonify({'error': f'Database error: {str(e)}'}), 500)
+
+    status = 201 if rows else 400
+    return make_response(jsonify({'created': len(rows), 'results': results}), status)
+
+
+# Update many job postings in one transaction
+@employer.route('/job_postings/bulk', methods=['PUT'])
+def update_job_postings_bulk():
+    """
+    Body: {"postings": [{post_id, title?, bio?, compensation?, location_id?}, ...]}
+    Postings that change the same set of fields are updated together
+    with one executemany.
+    """
+    postings, error = bulk_items('postings')
+    if error:
+        return error
+
+    results = [None] * len(postings)
+    candidates = []
+    for index, posting in enumerate(postings):
+        if not isinstance(posting, dict) or posting.get('post_id') is None:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Missing post_id'}
+            continue
+        post_id = int_field(posting['post_id'])
+        if post_id is None:
+            results[index] = {'index': index, 'status': 'error', 'error': 'post_id must be an integer'}
+            continue
+        fields = tuple(k for k in JOB_POSTING_UPDATE_FIELDS if posting.get(k) is not None)
+        if not fields:
+            results[index] = {'index': index, 'status': 'error', 'error': 'No fields to update'}
+            continue
+        values, problem = clean_job_posting(posting, fields)
+        if problem:
+            results[index] = {'index': index, 'status': 'error', 'error': problem}
+            continue
+        values['post_id'] = post_id
+        candidates.append((index, fields, values))
+
+    cursor = db.get_db().cursor()
+    existing = {r['Post_ID'] for r in fetch_existing(
+        cursor, 'SELECT Post_ID FROM JobPosting WHERE Post_ID IN ({})',
+        [p['post_id'] for _, _, p in candidates])}
+    known_zips = {r['Zip'] for r in fetch_existing(
+        cursor, 'SELECT Zip FROM Location WHERE Zip IN ({})',
+        [p['location_id'] for _, f, p in candidates if 'location_id' in f])}
+
+    groups = {}
+    for index, fields, posting in candidates:
+        if posting['post_id'] not in existing:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Job posting not found'}
+        elif 'location_id' in fields and posting['location_id'] not in known_zips:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Location not found'}
+        else:
+            groups.setdefault(fields, []).append(
+                tuple(posting[k] for k in fields) + (posting['post_id'],))
+            results[index] = {'index': index, 'status': 'updated'}
+
+    try:
+        for fields, rows in groups.items():
+            assignments = ', '.join(f'{JOB_POSTING_UPDATE_FIELDS[k]} = %s' for k in fields)
+            for start in range(0, len(rows), JOB_POSTINGS_BULK_CHUNK):
+                cursor.executemany(f'''
+                    UPDATE JobPosting
+                    SET {assignments}
+                    WHERE Post_ID = %s
+                ''', rows[start:start + JOB_POSTINGS_BULK_CHUNK])
+        db.get_db().commit()
+        cache.invalidate('JobPosting')
+    except Exception as e:
+        db.get_db().rollback()
+        return make_response(jsonify({'error': f'Database error: {str(e)}'}), 500)
+
+    updated = sum(len(rows) for rows in groups.values())
+    return make_response(jsonify({'updated': updated, 'results': results}), 200 if updated else 400)
+
+
+# Delete many job postings in one statement
+@employer.route('/job_postings/bulk', methods=['DELETE'])
+def delete_job_postings_bulk():
+    """
+    Body: {"post_ids": [1, 2, ...]}
+    """
+    post_ids, error = bulk_items('post_ids')
+    if error:
+        return error
+    post_ids = [int_field(p) for p in post_ids]
+    if None in post_ids:
+        return make_response(jsonify({'error': f'post_ids must be integers between {INT_MIN} and {INT_MAX}'}), 400)
+
+    cursor = db.get_db().cursor()
+    existing = {r['Post_ID'] for r in fetch_existing(
+        cursor, 'SELECT Post_ID FROM JobPosting WHERE Post_ID IN ({})', post_ids)}
+
+    try:
+        if existing:
+            ids = list(existing)
+            cursor.execute(
+                f"DELETE FROM JobPosting WHERE Post_ID IN ({', '.join(['%s'] * len(ids))})", ids)
+        db.get_db().commit()
+        cache.invalidate('JobPosting')
+    except Exception as e:
+        db.get_db().rollback()
+        return make_response(jsonify({'error': f'Database error: {str(e)}'}), 500)
+
+    results = [{'post_id': p, 'status': 'deleted' if p in existing else 'not_found'} for p in post_ids]
+    return make_response(jsonify({'deleted': len(existing), 'results': results}), 200 if existing else 404)
+
 # Get average wage and proportion of hybrid workers for a specific city
 @employer.route('/cities/<string:city_name>/wage_hybrid', methods=['GET'])
 def get_average_wage_and_hybrid(city_name):
@@ -265,7 +518,22 @@ def get_average_wage_and_hybrid(city_name):
     else:
         return make_response(jsonify({'error': 'City not found'}), 404)
     
+def format_city(city):
+    return {
+        'city_id': city['City_ID'],
+        'avg_cost_of_living': city['Avg_Cost_Of_Living'],
+        'avg_rent': city['Avg_Rent'],
+        'avg_wage': city['Avg_Wage'],
+        'name': city['Name'],
+        'population': city['Population'],
+        'prop_hybrid_workers': float(city['Prop_Hybrid_Workers']) if city['Prop_Hybrid_Workers'] else None,
+        'latitude': city['Latitude'],
+        'longitude': city['Longitude']
+    }
+
+
 @employer.route('/city', methods=['GET'])
+@cache.cached(ttl=300, tables=['City'])
 def get_all_cities():
     try:
         cursor = db.get_db().cursor()
@@ -273,17 +541,7 @@ def get_all_cities():
         cities_data = cursor.fetchall()
         cursor.close()
 
-        cities_list = []
-        for city in cities_data:
-            cities_list.append({
-                'city_id': city['City_ID'],
-                'avg_cost_of_living': city['Avg_Cost_Of_Living'],
-                'avg_rent': city['Avg_Rent'],
-                'avg_wage': city['Avg_Wage'],
-                'name': city['Name'],
-                'population': city['Population'],
-                'prop_hybrid_workers': float(city['Prop_Hybrid_Workers']) if city['Prop_Hybrid_Workers'] else None
-            })
+        cities_list = [format_city(city) for city in cities_data]
 
         return jsonify(cities_list), 200
 
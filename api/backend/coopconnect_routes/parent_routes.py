@@ -1,11 +1,22 @@
-from flask import Blueprint, request, jsonify, make_response
+import csv
+import io
+import math
+from flask import Blueprint, current_app, request, jsonify, make_response
 from backend.db_connection import db
+from backend.cache import cache
+from backend.columnar import columnar_response, COLUMNAR_FORMATS
+from backend.geo import bounding_box
+from backend.similarity import city_similarity, CITY_FEATURES
 
 # Create a new blueprint for parent-related routes
 parent = Blueprint('Parent', __name__)
 
 @parent.route('/housing', methods=['GET'])
+@cache.cached(ttl=60, tables=['Housing'])
 def get_housing():
+    # ?format=arrow or ?format=parquet for analytics clients
+    if request.args.get('format') in COLUMNAR_FORMATS:
+        return columnar_response('SELECT * FROM Housing', fmt=request.args['format'])
     cursor = db.get_db().cursor()
     cursor.execute('SELECT * FROM Housing')
     housing_data = cursor.fetchall()
@@ -39,11 +50,163 @@ def insert_housing():
     try:
         cursor.execute(query, args)
         db.get_db().commit()
+        # the Housing triggers also change City.Avg_Rent
+        cache.invalidate('City', 'Housing')
         return jsonify({"success": True, "message": "Housing added successfully"}), 201
     except Exception as e:
         db.get_db().rollback()
         return jsonify({"error": "Database error", "message": str(e)}), 500
 
+HOUSING_BULK_MAX_ROWS = 10000
+HOUSING_BULK_CHUNK = 1000
+
+
+def parse_bulk_housing_rows():
+    """
+    Read listings from the request body: a JSON list (or {"listings": [...]}),
+    a text/csv body, or a CSV file uploaded as the 'file' form field.
+    CSV files use the same column names as the JSON keys.
+    """
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(text)))
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('listings')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON list of listings or a CSV body')
+    return data
+
+
+def fold(text):
+    """Comparison key matching MySQL's case-insensitive collation for names and addresses."""
+    return text.strip().casefold()
+
+
+@parent.route('/housing/bulk', methods=['POST'])
+def insert_housing_bulk():
+    """
+    Insert many housing listings in one transaction.
+
+    Each row needs the same keys as POST /housing. Rows that fail
+    validation (unknown city or zip code, duplicate address, bad numbers)
+    are skipped and reported by their position in the input; the rest are
+    inserted. The per-row Avg_Rent triggers are switched off for the load
+    and each affected city's average is updated once at the end.
+    """
+    try:
+        rows = parse_bulk_housing_rows()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"error": str(e)}), 400
+    if not rows:
+        return jsonify({"error": "No listings provided"}), 400
+    if len(rows) > HOUSING_BULK_MAX_ROWS:
+        return jsonify({"error": f"At most {HOUSING_BULK_MAX_ROWS} listings per request"}), 413
+
+    required_keys = ['City_Name', 'zipID', 'Address', 'Rent', 'Sq_Ft']
+    errors = []
+    candidates = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict) or not all(row.get(key) not in (None, '') for key in required_keys):
+            errors.append({'row': index, 'error': 'Missing data'})
+            continue
+        try:
+            candidates.append((index, {
+                'City_Name': str(row['City_Name']).strip(),
+                'zipID': int(row['zipID']),
+                'Address': str(row['Address']).strip(),
+                'Rent': int(row['Rent']),
+                'Sq_Ft': int(row['Sq_Ft']),
+            }))
+        except (TypeError, ValueError):
+            errors.append({'row': index, 'error': 'zipID, Rent and Sq_Ft must be integers'})
+
+    cursor = db.get_db().cursor()
+
+    # resolve every lookup the rows need with one query each instead of one per row
+    def lookup(query, values):
+        values = list(set(values))
+        if not values:
+            return []
+        placeholders = ', '.join(['%s'] * len(values))
+        cursor.execute(query.format(placeholders), values)
+        return cursor.fetchall()
+
+    # MySQL matched these case-insensitively, so compare the same way here
+    city_ids = {fold(r['Name']): r['City_ID'] for r in lookup(
+        'SELECT City_ID, Name FROM City WHERE Name IN ({})',
+        [listing['City_Name'] for _, listing in candidates])}
+    known_zips = {r['Zip'] for r in lookup(
+        'SELECT Zip FROM Location WHERE Zip IN ({})',
+        [listing['zipID'] for _, listing in candidates])}
+    taken_addresses = {fold(r['Address']) for r in lookup(
+        'SELECT Address FROM Housing WHERE Address IN ({})',
+        [listing['Address'] for _, listing in candidates])}
+
+    to_insert = []
+    for index, listing in candidates:
+        city_key = fold(listing['City_Name'])
+        # also catches repeats within this batch, e.g. "1 Main St" and "1 main st"
+        address_key = fold(listing['Address'])
+        if city_key not in city_ids:
+            errors.append({'row': index, 'error': 'City not found'})
+        elif listing['zipID'] not in known_zips:
+            errors.append({'row': index, 'error': 'Zip code not found'})
+        elif address_key in taken_addresses:
+            errors.append({'row': index, 'error': 'Address already listed'})
+        else:
+            taken_addresses.add(address_key)
+            to_insert.append((city_ids[city_key], listing['zipID'],
+                              listing['Address'], listing['Rent'], listing['Sq_Ft']))
+    errors.sort(key=lambda e: e['row'])
+
+    if not to_insert:
+        return jsonify({"inserted": 0, "errors": errors}), 400
+
+    # per-city rent deltas, applied once after the insert
+    rent_totals = {}
+    for city_id, _, _, rent, _ in to_insert:
+        total = rent_totals.setdefault(city_id, [0, 0])
+        total[0] += rent
+        total[1] += 1
+
+    query = '''
+    INSERT INTO Housing (City_ID, zipID, Address, Rent, Sq_Ft)
+    VALUES (%s, %s, %s, %s, %s)
+    '''
+    try:
+        cursor.execute('SET @skip_city_avg_triggers = 1')
+        for start in range(0, len(to_insert), HOUSING_BULK_CHUNK):
+            cursor.executemany(query, to_insert[start:start + HOUSING_BULK_CHUNK])
+
+        for city_id, (rent_sum, rent_count) in rent_totals.items():
+            cursor.execute('''
+                INSERT INTO CityRentStats (City_ID, Rent_Sum, Rent_Count)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    Rent_Sum = Rent_Sum + %s,
+                    Rent_Count = Rent_Count + %s
+            ''', (city_id, rent_sum, rent_count, rent_sum, rent_count))
+            cursor.callproc('refresh_city_avg_rent', (city_id,))
+        db.get_db().commit()
+    except Exception as e:
+        db.get_db().rollback()
+        return jsonify({"error": "Database error", "message": str(e)}), 500
+    finally:
+        # the connection goes back to the pool, so never leave the triggers off.
+        # If this fails the connection is broken, the pool's rollback on release
+        # fails too and it gets closed; don't hide the original error behind it
+        try:
+            cursor.execute('SET @skip_city_avg_triggers = NULL')
+        except Exception:
+            pass
+
+    cache.invalidate('City', 'Housing')
+    return jsonify({"inserted": len(to_insert), "errors": errors}), 201
+
 @parent.route('/housing/<int:housing_id>', methods=['PUT'])
 def update_housing(housing_id):
     data = request.get_json()
@@ -75,6 +238,7 @@ def update_housing(housing_id):
         db.get_db().commit()
         if cursor.rowcount == 0:
             return jsonify({"error": "Housing not found"}), 404
+        cache.invalidate('City', 'Housing')
         return jsonify({"success": True, "message": "Housing updated successfully"}), 200
     except Exception as e:
         db.get_db().rollback()
@@ -93,11 +257,84 @@ def delete_housing_post(housing_id):
     db.get_db().commit()  # Commit the transaction
     
     if cursor.rowcount > 0:
+        cache.invalidate('City', 'Housing')
         return make_response(jsonify({'message': 'Housing deleted successfully'}), 200)
     else:
         return make_response(jsonify({'error': 'Housing listing not found'}), 404)
     
+NEARBY_QUERIES = {
+    'hospital': '''
+        SELECT 'hospital' AS type, HO.HospitalID AS id, HO.Name AS name, HO.Zip AS zip,
+               HO.Latitude AS latitude, HO.Longitude AS longitude,
+               ST_Distance_Sphere(HO.Geo, POINT(%s, %s)) / 1000 AS distance_km
+        FROM Hospital HO
+        WHERE MBRContains(ST_MakeEnvelope(POINT(%s, %s), POINT(%s, %s)), HO.Geo) AND HO.Latitude IS NOT NULL
+    ''',
+    'airport': '''
+        SELECT 'airport', A.Air_ID, A.Name, A.Zip, A.Latitude, A.Longitude,
+               ST_Distance_Sphere(A.Geo, POINT(%s, %s)) / 1000
+        FROM Airport A
+        WHERE MBRContains(ST_MakeEnvelope(POINT(%s, %s), POINT(%s, %s)), A.Geo) AND A.Latitude IS NOT NULL
+    ''',
+}
+NEARBY_DEFAULT_RADIUS_KM = 25
+NEARBY_MAX_RADIUS_KM = 500
+NEARBY_DEFAULT_LIMIT = 10
+NEARBY_MAX_LIMIT = 100
+
+
+#Returns the hospitals and/or airports closest to a housing listing
+#query params: type (hospital, airport or both, comma separated), radius_km, limit
+@parent.route('/housing/<int:housing_id>/nearby', methods=['GET'])
+@cache.cached(ttl=3600, tables=['Housing', 'Hospital', 'Airport'])
+def get_nearby_facilities(housing_id):
+    types = [t.strip() for t in request.args.get('type', ','.join(NEARBY_QUERIES)).split(',') if t.strip()]
+    if not types or any(t not in NEARBY_QUERIES for t in types):
+        return make_response(jsonify({"error": f"type must be from {', '.join(NEARBY_QUERIES)}"}), 400)
+    try:
+        radius_km = float(request.args.get('radius_km', NEARBY_DEFAULT_RADIUS_KM))
+        limit = int(request.args.get('limit', NEARBY_DEFAULT_LIMIT))
+    except ValueError:
+        return make_response(jsonify({"error": "radius_km must be a number and limit an integer"}), 400)
+    if not 0 < radius_km <= NEARBY_MAX_RADIUS_KM:
+        return make_response(jsonify({"error": f"radius_km must be between 0 and {NEARBY_MAX_RADIUS_KM}"}), 400)
+    if not 1 <= limit <= NEARBY_MAX_LIMIT:
+        return make_response(jsonify({"error": f"limit must be between 1 and {NEARBY_MAX_LIMIT}"}), 400)
+
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute('SELECT Latitude, Longitude FROM Housing WHERE Housing_ID = %s', (housing_id,))
+        housing = cursor.fetchone()
+        if not housing:
+            return make_response(jsonify({"error": "Housing listing not found"}), 404)
+        if housing['Latitude'] is None:
+            return make_response(jsonify({"error": "Housing listing has no coordinates yet"}), 409)
+
+        # the spatial index narrows candidates to a box around the listing,
+        # then the exact distance drops the box's corners
+        origin = (housing['Longitude'], housing['Latitude'])
+        params = origin + bounding_box(housing['Latitude'], housing['Longitude'], radius_km)
+        query = f'''
+            SELECT * FROM ({'UNION ALL'.join(NEARBY_QUERIES[t] for t in types)}) N
+            WHERE N.distance_km <= %s
+            ORDER BY N.distance_km
+            LIMIT %s
+        '''
+        cursor.execute(query, params * len(types) + (radius_km, limit))
+        nearby = cursor.fetchall()
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+    return make_response(jsonify({
+        'housing_id': housing_id,
+        'latitude': housing['Latitude'],
+        'longitude': housing['Longitude'],
+        'radius_km': radius_km,
+        'nearby': nearby,
+    }), 200)
+
 @parent.route('/hospitals/<string:city_name>', methods=['GET'])
+@cache.cached(ttl=3600, tables=['Hospital', 'City'])
 def get_hospitals_by_city(city_name):
     try:
         # First, get the City_ID based on the city name
@@ -149,6 +386,7 @@ def get_safety_rating_by_zip(city_name):
         return "No zipcodes for selected city", 404
     
 @parent.route('/airports', methods=['GET'])
+@cache.cached(ttl=3600, tables=['Airport'])
 def get_airports():
     cursor = db.get_db().cursor()
     cursor.execute('SELECT * FROM Airport')
@@ -156,6 +394,7 @@ def get_airports():
     return jsonify(airport_data), 200
 
 @parent.route('/hospitals', methods=['GET'])
+@cache.cached(ttl=3600, tables=['Hospital'])
 def get_hospitals():
     cursor = db.get_db().cursor()
     cursor.execute('SELECT * FROM Hospital')
@@ -163,17 +402,49 @@ def get_hospitals():
     return jsonify(hospital_data), 200
 
 
+COST_BUCKET = 50
+COST_ANALYSIS_LIMIT = 5
+
+
+def cost_bucket(Avg_Cost_Of_Living, **kwargs):
+    """The target cost rounded to the nearest COST_BUCKET dollars, or None if it isn't a finite number."""
+    try:
+        return int(round(float(Avg_Cost_Of_Living) / COST_BUCKET)) * COST_BUCKET
+    except (ValueError, OverflowError):
+        # 'nan' raises ValueError, 'inf' OverflowError
+        return None
+
+
+def optional_float(value):
+    return float(value) if value is not None else None
+
+
+#how far a city's value is above (or below) the national average, in percent;
+#None when either side is missing, like a city with no listings or jobs yet
+def percent_of(value, national):
+    if value is None or not national:
+        return None
+    return float(value / national * 100) - 100
+
+
 #returns the cost analysis of a specific city
+#targets are rounded to the nearest $50 so nearby targets share a cached result
 @parent.route('/city/<CityID>/<Avg_Cost_Of_Living>', methods=['GET'])
+@cache.cached(ttl=300, tables=['City'], key=cost_bucket)
 def get_city_cost_analysis(CityID, Avg_Cost_Of_Living):
+    target_cost = cost_bucket(Avg_Cost_Of_Living)
+    if target_cost is None:
+        return jsonify({'error': 'Cost of living must be a number'}), 400
     try:
         cursor = db.get_db().cursor()
-        target_cost = int(Avg_Cost_Of_Living)
         
         margin = target_cost * 0.2  # Increased to 40% range for more results
         min_cost = target_cost - margin
         max_cost = target_cost + margin
         
+        # the closest cities are among the 5 just below and the 5 just above
+        # the target, and each half is a short range scan on idx_city_col.
+        # The national averages come from the one NationalCityStats row
         query = """
             SELECT c1.Name, 
                     c1.Avg_Cost_Of_Living,
@@ -181,16 +452,30 @@ def get_city_cost_analysis(CityID, Avg_Cost_Of_Living):
                     c1.Avg_Wage,
                     c1.Avg_Cost_Of_Living / c1.Avg_Wage as cost_to_wage_ratio,
                     c1.Avg_Rent / c1.Avg_Wage as rent_to_wage_ratio,
-                    (SELECT AVG(Avg_Cost_Of_Living) FROM City) as avg_national_col,
-                    (SELECT AVG(Avg_Rent) FROM City) as avg_national_rent,
-                    (SELECT AVG(Avg_Wage) FROM City) as avg_national_wage
-            FROM City c1
-            WHERE c1.Avg_Cost_Of_Living BETWEEN %s AND %s
+                    n.Cost_Sum / n.Cost_Count as avg_national_col,
+                    n.Rent_Sum / n.Rent_Count as avg_national_rent,
+                    n.Wage_Sum / n.Wage_Count as avg_national_wage
+            FROM (
+                (SELECT Name, Avg_Cost_Of_Living, Avg_Rent, Avg_Wage
+                 FROM City
+                 WHERE Avg_Cost_Of_Living BETWEEN %s AND %s
+                 ORDER BY Avg_Cost_Of_Living DESC
+                 LIMIT %s)
+                UNION ALL
+                (SELECT Name, Avg_Cost_Of_Living, Avg_Rent, Avg_Wage
+                 FROM City
+                 WHERE Avg_Cost_Of_Living > %s AND Avg_Cost_Of_Living <= %s
+                 ORDER BY Avg_Cost_Of_Living ASC
+                 LIMIT %s)
+            ) c1
+            JOIN NationalCityStats n ON n.Stats_ID = 1
             ORDER BY ABS(c1.Avg_Cost_Of_Living - %s)
-            LIMIT 5
+            LIMIT %s
         """
         
-        cursor.execute(query, (min_cost, max_cost, target_cost))
+        cursor.execute(query, (min_cost, target_cost, COST_ANALYSIS_LIMIT,
+                               target_cost, max_cost, COST_ANALYSIS_LIMIT,
+                               target_cost, COST_ANALYSIS_LIMIT))
         cities_data = cursor.fetchall()
         cursor.close()
 
@@ -201,16 +486,17 @@ def get_city_cost_analysis(CityID, Avg_Cost_Of_Living):
         for city_data in cities_data:
             cost_analysis = {
                 'name': city_data['Name'],
-                'cost_of_living': float(city_data['Avg_Cost_Of_Living']),
-                'avg_rent': float(city_data['Avg_Rent']),
-                'avg_wage': float(city_data['Avg_Wage']),
+                'cost_of_living': optional_float(city_data['Avg_Cost_Of_Living']),
+                'avg_rent': optional_float(city_data['Avg_Rent']),
+                'avg_wage': optional_float(city_data['Avg_Wage']),
                 'cost_metrics': {
-                    'cost_to_wage_ratio': float(city_data['cost_to_wage_ratio']),
-                    'rent_to_wage_ratio': float(city_data['rent_to_wage_ratio']),
+                    # SQL already gives NULL ratios for a city without a wage
+                    'cost_to_wage_ratio': optional_float(city_data['cost_to_wage_ratio']),
+                    'rent_to_wage_ratio': optional_float(city_data['rent_to_wage_ratio']),
                     'cost_vs_national_avg': {
-                        'cost_of_living_percent': (city_data['Avg_Cost_Of_Living'] / city_data['avg_national_col'] * 100) - 100,
-                        'rent_percent': (city_data['Avg_Rent'] / city_data['avg_national_rent'] * 100) - 100,
-                        'wage_percent': (city_data['Avg_Wage'] / city_data['avg_national_wage'] * 100) - 100
+                        'cost_of_living_percent': percent_of(city_data['Avg_Cost_Of_Living'], city_data['avg_national_col']),
+                        'rent_percent': percent_of(city_data['Avg_Rent'], city_data['avg_national_rent']),
+                        'wage_percent': percent_of(city_data['Avg_Wage'], city_data['avg_national_wage'])
                     }
                 }
             }
@@ -219,5 +505,46 @@ def get_city_cost_analysis(CityID, Avg_Cost_Of_Living):
         return jsonify(cities_analysis), 200
 
     except Exception as e:
-        print(f"Error in get_city_cost_analysis: {str(e)}")
+        current_app.logger.exception('get_city_cost_analysis failed')
         return jsonify({'error': str(e)}), 500
+
+
+SIMILAR_CITIES_DEFAULT_K = 5
+SIMILAR_CITIES_MAX_K = 50
+
+
+#returns the cities most like the given one
+#query params: k, weights (e.g. weights=cost_of_living:2,rent:1,safety:0 -
+#features left out weigh 1; see CITY_FEATURES for the names)
+@parent.route('/cities/<int:city_id>/similar', methods=['GET'])
+def get_similar_cities(city_id):
+    try:
+        k = int(request.args.get('k', SIMILAR_CITIES_DEFAULT_K))
+        weights = {}
+        for pair in filter(None, request.args.get('weights', '').split(',')):
+            name, _, value = pair.partition(':')
+            weights[name.strip()] = float(value)
+    except ValueError:
+        return jsonify({'error': 'k must be an integer and weights look like name:number,...'}), 400
+    unknown = [name for name in weights if name not in CITY_FEATURES]
+    if unknown:
+        return jsonify({'error': f"Unknown features {', '.join(unknown)}; use {', '.join(CITY_FEATURES)}"}), 400
+    # a NaN or infinite weight would turn every score into NaN
+    if not all(math.isfinite(w) for w in weights.values()):
+        return jsonify({'error': 'Weights must be finite numbers'}), 400
+    if any(w < 0 for w in weights.values()):
+        return jsonify({'error': 'Weights must not be negative'}), 400
+    k = max(1, min(k, SIMILAR_CITIES_MAX_K))
+
+    try:
+        similar = city_similarity.similar(db.get_db().cursor(), city_id, k, weights)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if similar is None:
+        return jsonify({'error': 'City not found'}), 404
+
+    return jsonify({
+        'city_id': city_id,
+        'weights': {name: weights.get(name, 1.0) for name in CITY_FEATURES},
+        'similar': similar,
+    }), 200
@@ -4,35 +4,130 @@ from flask import jsonify
 from flask import make_response
 from flask import current_app
 from datetime import datetime
+import re
 from flask import abort
+from flask import Response
+from pymysql.err import IntegrityError
 from backend.db_connection import db
+from backend.cache import cache
+from backend.columnar import columnar_response, COLUMNAR_FORMATS
 
 student = Blueprint('student_routes', __name__)
 
 @student.route('/students/<int:student_id>/jobs', methods=['GET'])
 def get_available_jobs(student_id):
     """
-    Retrieve a list of job postings available for the student.
+    Retrieve a page of job postings the student hasn't applied to yet.
+
+    Query parameters (all optional):
+      after  - only return postings with Post_ID greater than this (keyset cursor)
+      limit  - page size, default 50, max 500
+      fields - comma separated columns to return
     """
+    try:
+        columns = requested_job_posting_columns()
+        after = int(request.args.get('after', 0))
+        limit = int(request.args.get('limit', JOB_POSTINGS_DEFAULT_LIMIT))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+    if not 1 <= limit <= JOB_POSTINGS_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {JOB_POSTINGS_MAX_LIMIT}'}), 400
+
     try:
         cursor = db.get_db().cursor()
-        cursor.execute("""
-            SELECT * FROM JobPosting 
-            WHERE job_posting_id NOT IN (
-                SELECT job_posting_id 
-                FROM Application 
-                WHERE student_id = %s
+        # NOT EXISTS probes the (Student_ID, Post_ID) primary key of
+        # Application once per posting, and unlike NOT IN it isn't
+        # tripped up by NULLs
+        select_list = ', '.join(f'JP.{c}' for c in columns)
+        cursor.execute(f"""
+            SELECT {select_list}
+            FROM JobPosting JP
+            WHERE JP.Post_ID > %s
+              AND NOT EXISTS (
+                SELECT 1
+                FROM Application A
+                WHERE A.Student_ID = %s AND A.Post_ID = JP.Post_ID
             )
-        """, (student_id,))
+            ORDER BY JP.Post_ID
+            LIMIT %s
+        """, (after, student_id, limit + 1))
         jobs = cursor.fetchall()
-        
-        if not jobs:
-            return jsonify({'message': 'No available jobs found'}), 404
-        
-        return jsonify(jobs), 200
+
+        page = jobs[:limit]
+        next_after = page[-1]['Post_ID'] if len(jobs) > limit else None
+        return jsonify({'job_postings': page, 'next_after': next_after}), 200
     except Exception as e:
         return jsonify({'error': f'Failed to retrieve jobs: {str(e)}'}), 500
-    
+
+
+@student.route('/students/<int:student_id>/applications', methods=['GET'])
+def get_applications(student_id):
+    """
+    Retrieve the job postings a student has applied to, newest first.
+    """
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute("""
+            SELECT A.Post_ID, A.Date_Applied, JP.Title, JP.Compensation, JP.Location_ID
+            FROM Application A
+            JOIN JobPosting JP ON JP.Post_ID = A.Post_ID
+            WHERE A.Student_ID = %s
+            ORDER BY A.Date_Applied DESC
+        """, (student_id,))
+        return jsonify(cursor.fetchall()), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to retrieve applications: {str(e)}'}), 500
+
+
+@student.route('/students/<int:student_id>/applications', methods=['POST'])
+def create_application(student_id):
+    """
+    Record that a student applied to a job posting.
+    """
+    data = request.get_json()
+    if not data or data.get('Post_ID') is None:
+        return jsonify({'error': 'Missing required field: Post_ID'}), 400
+
+    try:
+        cursor = db.get_db().cursor()
+        # applying twice is a no-op rather than an error
+        cursor.execute("""
+            INSERT INTO Application (Student_ID, Post_ID)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE Date_Applied = Date_Applied
+        """, (student_id, data['Post_ID']))
+        db.get_db().commit()
+
+        if cursor.rowcount == 0:
+            return jsonify({'message': 'Already applied to this job posting'}), 200
+        return jsonify({'message': 'Application submitted successfully'}), 201
+    except IntegrityError:
+        db.get_db().rollback()
+        return jsonify({'error': 'Student or job posting not found'}), 404
+    except Exception as e:
+        db.get_db().rollback()
+        return jsonify({'error': f'Failed to submit application: {str(e)}'}), 500
+
+
+@student.route('/students/<int:student_id>/applications/<int:post_id>', methods=['DELETE'])
+def delete_application(student_id, post_id):
+    """
+    Withdraw a student's application to a job posting.
+    """
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute("""
+            DELETE FROM Application
+            WHERE Student_ID = %s AND Post_ID = %s
+        """, (student_id, post_id))
+        db.get_db().commit()
+
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Application not found'}), 404
+        return jsonify({'message': 'Application withdrawn successfully'}), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to withdraw application: {str(e)}'}), 500
+
 
 @student.route('/students/<int:student_id>', methods=['PUT'])
 def update_student_profile(student_id):
@@ -54,6 +149,7 @@ def update_student_profile(student_id):
             student_id
         ))
         db.get_db().commit()
+        cache.invalidate('User')
         
         return jsonify({'message': 'Profile updated successfully'}), 200
     except Exception as e:
@@ -192,16 +288,271 @@ def get_sublets_for_user(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
+# Columns a client may ask for with ?fields=. Post_ID is always returned
+# because it is the pagination cursor.
+JOB_POSTING_COLUMNS = ['Post_ID', 'Title', 'Compensation', 'Location_ID', 'User_ID', 'Bio']
+JOB_POSTINGS_DEFAULT_LIMIT = 50
+JOB_POSTINGS_MAX_LIMIT = 500
+
+
+def requested_job_posting_columns(args=None):
+    """
+    Columns named by ?fields= in `args` (default: this request's query
+    string), or every column. Raises ValueError on unknown names.
+    """
+    fields = (request.args if args is None else args).get('fields')
+    if not fields:
+        return JOB_POSTING_COLUMNS
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in JOB_POSTING_COLUMNS]
+    if unknown:
+        raise ValueError(f'unknown fields {", ".join(unknown)}')
+    return ['Post_ID'] + [c for c in JOB_POSTING_COLUMNS if c in requested and c != 'Post_ID']
+
+
 @student.route('/job_postings', methods=['GET'])
+@cache.cached(ttl=60, tables=['JobPosting'])
 def get_all_job_postings():
+    """
+    List job postings.
+
+    Query parameters (all optional):
+      after  - only return postings with Post_ID greater than this (keyset cursor)
+      limit  - page size, default 50, max 500
+      fields - comma separated columns to return, e.g. fields=Title,Compensation
+               to leave out the Bio text
+      format - 'ndjson' streams one JSON object per line straight from an
+               unbuffered server-side cursor; 'arrow' (IPC stream) or
+               'parquet' returns the columns in that format
+
+    Without after/limit/format the whole table is returned as a JSON list,
+    as before. With after or limit the response is
+    {"job_postings": [...], "next_after": <Post_ID or null>}.
+    """
+    try:
+        columns = requested_job_posting_columns()
+        after = int(request.args['after']) if 'after' in request.args else None
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError as e:
+        return make_response(jsonify({'error': f'Invalid query parameter: {e}'}), 400)
+    if limit is not None and not 1 <= limit <= JOB_POSTINGS_MAX_LIMIT:
+        return make_response(jsonify({'error': f'limit must be between 1 and {JOB_POSTINGS_MAX_LIMIT}'}), 400)
+
+    conditions = []
+    params = []
+    if after is not None:
+        conditions.append('Post_ID > %s')
+        params.append(after)
+
+    query = f"SELECT {', '.join(columns)} FROM JobPosting"
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY Post_ID'
+
+    # the streamed and columnar formats take after/limit as a plain
+    # range, without the paging envelope
+    fmt = request.args.get('format')
+    if fmt == 'ndjson' or fmt in COLUMNAR_FORMATS:
+        if limit is not None:
+            query += ' LIMIT %s'
+            params.append(limit)
+        if fmt in COLUMNAR_FORMATS:
+            return columnar_response(query, tuple(params), fmt)
+        json_provider = current_app.json
+
+        def generate():
+            for row in db.stream(query, tuple(params)):
+                yield json_provider.dumps(row) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    if after is None and limit is None:
+        cursor = db.get_db().cursor()
+        cursor.execute(query, tuple(params))
+        theData = cursor.fetchall()
+
+        the_response = make_response(jsonify(theData))
+        the_response.status_code = 200
+        return the_response
+
+    if limit is None:
+        limit = JOB_POSTINGS_DEFAULT_LIMIT
+
+    # fetch one extra row to find out whether there is another page
+    query += ' LIMIT %s'
+    params.append(limit + 1)
     cursor = db.get_db().cursor()
-    query = "SELECT * FROM JobPosting"
-    cursor.execute(query)
-    theData = cursor.fetchall()
+    cursor.execute(query, tuple(params))
+    rows = cursor.fetchall()
+
+    page = rows[:limit]
+    next_after = page[-1]['Post_ID'] if len(rows) > limit else None
+    return make_response(jsonify({'job_postings': page, 'next_after': next_after}), 200)
+
 
-    the_response = make_response(jsonify(theData))
-    the_response.status_code = 200
-    return the_response
+# ?sort= values for the job search and the ORDER BY each one maps to.
+# Post_ID breaks ties so pages are stable.
+JOB_SEARCH_SORTS = {
+    'newest': 'JP.Post_ID DESC',
+    'compensation_asc': 'JP.Compensation ASC, JP.Post_ID ASC',
+    'compensation_desc': 'JP.Compensation DESC, JP.Post_ID DESC',
+}
+
+
+@student.route('/job_postings/search', methods=['GET'])
+def search_job_postings():
+    """
+    Filtered, sorted and paged job postings.
+
+    Query parameters (all optional):
+      min_compensation, max_compensation - compensation range (inclusive)
+      zip      - Location_ID of the posting
+      city     - city name, matched through Location.City_ID
+      title    - text the title must contain
+      sort     - newest (default), compensation_asc or compensation_desc
+      page     - 1-based page number, default 1
+      limit    - page size, default 50, max 500
+      fields   - comma separated columns to return
+
+    Returns the requested page, the total number of matches and
+    compensation stats over all matches.
+    """
+    args = request.args
+    try:
+        columns = requested_job_posting_columns()
+        min_comp = int(args['min_compensation']) if args.get('min_compensation') else None
+        max_comp = int(args['max_compensation']) if args.get('max_compensation') else None
+        zip_code = int(args['zip']) if args.get('zip') else None
+        page = int(args.get('page', 1))
+        limit = int(args.get('limit', JOB_POSTINGS_DEFAULT_LIMIT))
+    except ValueError as e:
+        return make_response(jsonify({'error': f'Invalid query parameter: {e}'}), 400)
+
+    sort = args.get('sort', 'newest')
+    if sort not in JOB_SEARCH_SORTS:
+        return make_response(jsonify({'error': f'sort must be one of {", ".join(JOB_SEARCH_SORTS)}'}), 400)
+    if page < 1 or not 1 <= limit <= JOB_POSTINGS_MAX_LIMIT:
+        return make_response(jsonify({'error': f'page must be >= 1 and limit between 1 and {JOB_POSTINGS_MAX_LIMIT}'}), 400)
+
+    conditions = []
+    params = []
+    if min_comp is not None:
+        conditions.append('JP.Compensation >= %s')
+        params.append(min_comp)
+    if max_comp is not None:
+        conditions.append('JP.Compensation <= %s')
+        params.append(max_comp)
+    if zip_code is not None:
+        conditions.append('JP.Location_ID = %s')
+        params.append(zip_code)
+    if args.get('city'):
+        conditions.append('''JP.Location_ID IN (
+            SELECT L.Zip FROM Location L
+            WHERE L.City_ID = (SELECT City_ID FROM City WHERE Name = %s))''')
+        params.append(args['city'])
+    if args.get('title'):
+        # escape LIKE wildcards so the text is matched literally
+        title = args['title'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append('JP.Title LIKE %s')
+        params.append(f'%{title}%')
+
+    where = (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute(f'''
+            SELECT COUNT(*) AS total,
+                   AVG(JP.Compensation) AS avg_compensation,
+                   MIN(JP.Compensation) AS min_compensation,
+                   MAX(JP.Compensation) AS max_compensation
+            FROM JobPosting JP{where}
+        ''', tuple(params))
+        stats = cursor.fetchone()
+
+        select_list = ', '.join(f'JP.{c}' for c in columns)
+        cursor.execute(f'''
+            SELECT {select_list}
+            FROM JobPosting JP{where}
+            ORDER BY {JOB_SEARCH_SORTS[sort]}
+            LIMIT %s OFFSET %s
+        ''', tuple(params) + (limit, (page - 1) * limit))
+        postings = cursor.fetchall()
+    except Exception as e:
+        return make_response(jsonify({'error': f'Failed to search job postings: {str(e)}'}), 500)
+
+    return make_response(jsonify({
+        'job_postings': postings,
+        'total': stats['total'],
+        'page': page,
+        'limit': limit,
+        'stats': {
+            'avg_compensation': float(stats['avg_compensation']) if stats['avg_compensation'] is not None else None,
+            'min_compensation': stats['min_compensation'],
+            'max_compensation': stats['max_compensation'],
+        },
+    }), 200)
+
+# InnoDB only indexes words of at least innodb_ft_min_token_size (3) characters
+FULLTEXT_MIN_WORD = 3
+
+
+def fulltext_boolean_query(text, prefix=True):
+    """
+    Turn free text into a BOOLEAN MODE search string. Operator characters are
+    dropped so user input can't change the query's meaning; with `prefix`
+    every word also matches longer words ("dev" finds "developer").
+    """
+    words = [w for w in re.findall(r'\w+', text) if len(w) >= FULLTEXT_MIN_WORD]
+    suffix = '*' if prefix else ''
+    return ' '.join(w + suffix for w in words)
+
+
+@student.route('/job_postings/fulltext', methods=['GET'])
+def fulltext_search_job_postings():
+    """
+    Ranked keyword search over job posting titles and descriptions.
+
+    Query parameters:
+      q      - keywords (required)
+      prefix - 'false' to match whole words only, default true
+      limit  - max results, default 50, max 500
+      fields - comma separated columns to return
+
+    Matches in the title weigh twice as much as matches in the description.
+    """
+    try:
+        columns = requested_job_posting_columns()
+        limit = int(request.args.get('limit', JOB_POSTINGS_DEFAULT_LIMIT))
+    except ValueError as e:
+        return make_response(jsonify({'error': f'Invalid query parameter: {e}'}), 400)
+    if not 1 <= limit <= JOB_POSTINGS_MAX_LIMIT:
+        return make_response(jsonify({'error': f'limit must be between 1 and {JOB_POSTINGS_MAX_LIMIT}'}), 400)
+
+    prefix = request.args.get('prefix', 'true').lower() != 'false'
+    search = fulltext_boolean_query(request.args.get('q', ''), prefix)
+    if not search:
+        return make_response(jsonify({'error': f'q must contain a word of at least {FULLTEXT_MIN_WORD} characters'}), 400)
+
+    select_list = ', '.join(f'JP.{c}' for c in columns)
+    query = f'''
+        SELECT {select_list},
+               2 * MATCH(JP.Title) AGAINST (%s IN BOOLEAN MODE)
+                 + MATCH(JP.Title, JP.Bio) AGAINST (%s IN BOOLEAN MODE) AS relevance
+        FROM JobPosting JP
+        WHERE MATCH(JP.Title, JP.Bio) AGAINST (%s IN BOOLEAN MODE)
+        ORDER BY relevance DESC, JP.Post_ID DESC
+        LIMIT %s
+    '''
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute(query, (search, search, search, limit))
+        results = cursor.fetchall()
+    except Exception as e:
+        return make_response(jsonify({'error': f'Failed to search job postings: {str(e)}'}), 500)
+
+    for row in results:
+        row['relevance'] = float(row['relevance'])
+    return make_response(jsonify(results), 200)
 
 @student.route('/users/email/<string:email>', methods=['GET'])
 def get_user_by_email(email):
@@ -255,7 +606,129 @@ def update_user(UserID):
         cursor = db.get_db().cursor()
         cursor.execute(query, (category_id, name, email, phone_number, UserID))
         db.get_db().commit()
+        cache.invalidate('User')
 
         return make_response(jsonify({"message": "User updated successfully!"}), 200)
     except Exception as e:
-        return make_response(jsonify({"error": str(e)}), 500)
\ No newline at end of file
+        return make_response(jsonify({"error": str(e)}), 500)
+
+
+@student.route('/cities/<int:city_id>/map', methods=['GET'])
+@cache.cached(ttl=60, tables=['City', 'Housing', 'Airport', 'Hospital'])
+def get_city_map(city_id):
+    """
+    Everything the student map shows for one city, in one query: the city
+    itself, its housing listings, airports and hospitals, projected down to
+    the columns the map uses.
+    """
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute('''
+            SELECT 'city' AS kind, C.City_ID AS id, C.Name AS name, NULL AS zip, NULL AS rent, NULL AS sqft,
+                   C.Latitude AS lat, C.Longitude AS lon
+            FROM City C WHERE C.City_ID = %s
+            UNION ALL
+            SELECT 'housing', H.Housing_ID, H.Address, H.zipID, H.Rent, H.Sq_Ft, H.Latitude, H.Longitude
+            FROM Housing H WHERE H.City_ID = %s
+            UNION ALL
+            SELECT 'airport', A.Air_ID, A.Name, A.Zip, NULL, NULL, A.Latitude, A.Longitude
+            FROM Airport A WHERE A.City_ID = %s
+            UNION ALL
+            SELECT 'hospital', HO.HospitalID, HO.Name, HO.Zip, NULL, NULL, HO.Latitude, HO.Longitude
+            FROM Hospital HO WHERE HO.City_ID = %s
+        ''', (city_id, city_id, city_id, city_id))
+        rows = cursor.fetchall()
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+    city = next((row for row in rows if row['kind'] == 'city'), None)
+    if city is None:
+        return make_response(jsonify({"error": "City not found"}), 404)
+
+    return make_response(jsonify({
+        'city': {'city_id': city['id'], 'name': city['name'], 'latitude': city['lat'], 'longitude': city['lon']},
+        **map_features(rows),
+    }), 200)
+
+
+def map_features(rows):
+    """Group rows of (kind, id, name, zip, rent, sqft, lat, lon) into map layers."""
+    return {
+        'housing': [
+            {'housing_id': r['id'], 'address': r['name'], 'zipcode': r['zip'], 'rent': r['rent'],
+             'sqft': r['sqft'], 'latitude': r['lat'], 'longitude': r['lon']}
+            for r in rows if r['kind'] == 'housing'
+        ],
+        'airports': [
+            {'air_id': r['id'], 'name': r['name'], 'zip': r['zip'], 'latitude': r['lat'], 'longitude': r['lon']}
+            for r in rows if r['kind'] == 'airport'
+        ],
+        'hospitals': [
+            {'hospital_id': r['id'], 'name': r['name'], 'zip': r['zip'], 'latitude': r['lat'], 'longitude': r['lon']}
+            for r in rows if r['kind'] == 'hospital'
+        ],
+    }
+
+
+MAP_BBOX_QUERIES = {
+    'housing': '''
+        SELECT 'housing' AS kind, H.Housing_ID AS id, H.Address AS name, H.zipID AS zip,
+               H.Rent AS rent, H.Sq_Ft AS sqft, H.Latitude AS lat, H.Longitude AS lon
+        FROM Housing H
+        WHERE MBRContains(ST_MakeEnvelope(POINT(%s, %s), POINT(%s, %s)), H.Geo) AND H.Latitude IS NOT NULL
+    ''',
+    'airport': '''
+        SELECT 'airport', A.Air_ID, A.Name, A.Zip, NULL, NULL, A.Latitude, A.Longitude
+        FROM Airport A
+        WHERE MBRContains(ST_MakeEnvelope(POINT(%s, %s), POINT(%s, %s)), A.Geo) AND A.Latitude IS NOT NULL
+    ''',
+    'hospital': '''
+        SELECT 'hospital', HO.HospitalID, HO.Name, HO.Zip, NULL, NULL, HO.Latitude, HO.Longitude
+        FROM Hospital HO
+        WHERE MBRContains(ST_MakeEnvelope(POINT(%s, %s), POINT(%s, %s)), HO.Geo) AND HO.Latitude IS NOT NULL
+    ''',
+}
+MAP_BBOX_DEFAULT_LIMIT = 500
+MAP_BBOX_MAX_LIMIT = 2000
+
+
+@student.route('/map/bbox', methods=['GET'])
+def get_map_bbox():
+    """
+    Housing, airports and hospitals inside a lat/lon bounding box, for
+    panning the map. Uses the spatial indexes on the Geo columns.
+
+    Query params: min_lat, min_lon, max_lat, max_lon (required),
+    types (comma separated, default all of housing,airport,hospital), limit
+    """
+    try:
+        min_lat, min_lon, max_lat, max_lon = (float(request.args[k]) for k in ('min_lat', 'min_lon', 'max_lat', 'max_lon'))
+        limit = int(request.args.get('limit', MAP_BBOX_DEFAULT_LIMIT))
+    except KeyError as e:
+        return make_response(jsonify({"error": f"{e.args[0]} is required"}), 400)
+    except ValueError:
+        return make_response(jsonify({"error": "Bounds must be numbers and limit an integer"}), 400)
+    if min_lat > max_lat or min_lon > max_lon:
+        return make_response(jsonify({"error": "min_lat/min_lon must not exceed max_lat/max_lon"}), 400)
+    if not 1 <= limit <= MAP_BBOX_MAX_LIMIT:
+        return make_response(jsonify({"error": f"limit must be between 1 and {MAP_BBOX_MAX_LIMIT}"}), 400)
+
+    types = [t.strip() for t in request.args.get('types', ','.join(MAP_BBOX_QUERIES)).split(',') if t.strip()]
+    unknown = [t for t in types if t not in MAP_BBOX_QUERIES]
+    if unknown or not types:
+        return make_response(jsonify({"error": f"types must be from {', '.join(MAP_BBOX_QUERIES)}"}), 400)
+
+    # points are stored as POINT(longitude, latitude)
+    corners = (min_lon, min_lat, max_lon, max_lat)
+    query = 'UNION ALL'.join(MAP_BBOX_QUERIES[t] for t in types) + ' LIMIT %s'
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute(query, corners * len(types) + (limit + 1,))
+        rows = cursor.fetchall()
+    except Exception as e:
+        return make_response(jsonify({"error": str(e)}), 500)
+
+    return make_response(jsonify({
+        **map_features(rows[:limit]),
+        'truncated': len(rows) > limit,
+    }), 200)
@@ -3,55 +3,256 @@ from flask import request
 from flask import jsonify
 from flask import make_response
 from flask import current_app
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
+from statistics import median
+from pymysql.err import DataError, IntegrityError
 from backend.db_connection import db
+from backend.cache import cache
+from backend.columnar import columnar_response, COLUMNAR_FORMATS
+from backend.compression import compressor
+from backend.ingest import BatchWriter
+from backend.metrics import api_metrics, new_timing, merge_timing, summarize
 
 system_admin = Blueprint('system_admin_routes', __name__)
 
+def day_range(day):
+    """
+    The [start, next day) datetimes for a 'YYYY-MM-DD' string, or None if it
+    isn't one. Filtering on this range instead of date(`Date`) = day lets
+    MySQL use idx_perf_date.
+    """
+    try:
+        start = datetime.strptime(day, '%Y-%m-%d')
+    except ValueError:
+        return None
+    return start, start + timedelta(days=1)
+
+
+def format_performance(record):
+    return {
+        'PID': record['PID'],
+        'CPU_Usage': float(record['Avg_Speed']) if record['Avg_Speed'] is not None else 0,
+        'Memory_Usage': float(record['Median_Speed']) if record['Median_Speed'] is not None else 0,
+        'Network_Usage': float(record['Top_Speed']) if record['Top_Speed'] is not None else 0,
+        'Disk_Usage': float(record['Low_Speed']) if record['Low_Speed'] is not None else 0,
+        'Date': record['Date']
+    }
+
+
+def performance_columns_query(day):
+    """A day's samples with the names and values format_performance gives them, for the columnar formats."""
+    metrics = ', '.join(f'CAST(COALESCE({column}, 0) AS DOUBLE) AS {key}' for key, column in PERFORMANCE_METRICS)
+    return (f'SELECT PID, {metrics}, `Date` FROM Performance '
+            'WHERE `Date` >= %s AND `Date` < %s ORDER BY `Date`'), day
+
+
 #Get all performance info from the system on a given day
 @system_admin.route('/performance/<Date>', methods=['GET'])
 def get_performance(Date):
+    day = day_range(Date)
+    if day is None:
+        return jsonify({"error": "Date must be YYYY-MM-DD"}), 400
+    if request.args.get('format') in COLUMNAR_FORMATS:
+        return columnar_response(*performance_columns_query(day), fmt=request.args['format'])
     cursor = db.get_db().cursor()
-    cursor.execute('SELECT * FROM Performance WHERE date(`Date`) = %s', (Date,))
+    cursor.execute('SELECT * FROM Performance WHERE `Date` >= %s AND `Date` < %s ORDER BY `Date`', day)
     performance_data = cursor.fetchall()
     cursor.close()
 
     # Convert the data to a list of dictionaries
-    formatted_data = []
-    for record in performance_data:
-        formatted_data.append({
-            'PID': record['PID'],
-            'CPU_Usage': float(record['Avg_Speed']) if record['Avg_Speed'] is not None else 0,
-            'Memory_Usage': float(record['Median_Speed']) if record['Median_Speed'] is not None else 0,
-            'Network_Usage': float(record['Top_Speed']) if record['Top_Speed'] is not None else 0,
-            'Disk_Usage': float(record['Low_Speed']) if record['Low_Speed'] is not None else 0,
-            'Date': record['Date']
-        })
+    formatted_data = [format_performance(record) for record in performance_data]
 
     return jsonify(formatted_data), 200
 
 
+# rollup resolutions and their widths in seconds, finest first
+PERFORMANCE_BUCKETS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+# (response key, Performance column) for each metric
+PERFORMANCE_METRICS = (
+    ('CPU_Usage', 'Avg_Speed'),
+    ('Memory_Usage', 'Median_Speed'),
+    ('Network_Usage', 'Top_Speed'),
+    ('Disk_Usage', 'Low_Speed'),
+)
+PERFORMANCE_DEFAULT_POINTS = 500
+# most rows (samples, or rollup rows before merging) one response reads;
+# an explicit bucket over a long range stops here and says so with truncated
+PERFORMANCE_RAW_LIMIT = 10000
+
+
+def parse_time_bound(value, end=False):
+    """
+    A datetime from an ISO date or date-time string. A bare date as the end
+    of a range means the whole of that day. Raises ValueError, also for a
+    time with a UTC offset: Performance and ApiMetric store the server's
+    local time, which can't be compared with an aware datetime.
+    """
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        raise ValueError(f"{value} has a UTC offset")
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+
+def pick_performance_bucket(start, end, points):
+    """
+    The coarsest rollup no wider than (end - start) / points, so the chart
+    keeps the resolution it asked for, and how many of its buckets to merge
+    into each point. ('raw', 1) when even minutes are too coarse.
+    """
+    resolution = (end - start).total_seconds() / points
+    fitting = [name for name, width in PERFORMANCE_BUCKETS.items() if width <= resolution]
+    if not fitting:
+        return 'raw', 1
+    bucket = fitting[-1]
+    return bucket, max(1, int(resolution // PERFORMANCE_BUCKETS[bucket]))
+
+
+def merge_rollups(rows, start, width):
+    """
+    Combine consecutive rollup rows into points `width` seconds wide, counted
+    from `start`. Averages combine exactly; p50 is the median of the p50s.
+    """
+    points = []
+    for row in rows:
+        index = int((row['Bucket'] - start).total_seconds() // width)
+        if not points or points[-1]['index'] != index:
+            points.append({'index': index, 'rows': []})
+        points[-1]['rows'].append(row)
+
+    merged = []
+    for point in points:
+        rows = point['rows']
+        out = {
+            'Date': start + timedelta(seconds=point['index'] * width),
+            'Samples': sum(r['Samples'] for r in rows),
+            'stats': {},
+        }
+        for key, column in PERFORMANCE_METRICS:
+            total = sum(r[f'{column}_Sum'] or 0 for r in rows)
+            count = sum(r[f'{column}_Count'] or 0 for r in rows)
+            mins = [r[f'{column}_Min'] for r in rows if r[f'{column}_Min'] is not None]
+            maxes = [r[f'{column}_Max'] for r in rows if r[f'{column}_Max'] is not None]
+            p50s = [r[f'{column}_P50'] for r in rows if r[f'{column}_P50'] is not None]
+            avg = total / count if count else None
+            out[key] = float(avg) if avg is not None else 0
+            out['stats'][key] = {
+                'avg': avg,
+                'min': min(mins) if mins else None,
+                'max': max(maxes) if maxes else None,
+                'p50': float(median(p50s)) if p50s else None,
+            }
+        merged.append(out)
+    return merged
+
+
+def parse_performance_range(args):
+    """
+    (start, end, bucket, merge) for a GET /performance query string, where
+    each point merges `merge` buckets. For rollups, start is moved back to
+    the beginning of its bucket. Raises ValueError with a message for the
+    client.
+    """
+    bucket = args.get('bucket', 'auto')
+    if bucket not in ('auto', 'raw') and bucket not in PERFORMANCE_BUCKETS:
+        raise ValueError(f"bucket must be auto, raw or one of {', '.join(PERFORMANCE_BUCKETS)}")
+    try:
+        start = parse_time_bound(args['from'])
+        end = parse_time_bound(args['to'], end=True)
+        points = int(args.get('points', PERFORMANCE_DEFAULT_POINTS))
+    except KeyError as e:
+        raise ValueError(f"{e.args[0]} is required")
+    except ValueError:
+        raise ValueError("from and to must be ISO dates or date-times without a UTC offset and points an integer")
+    if start >= end:
+        raise ValueError("from must be before to")
+    if points < 1:
+        raise ValueError("points must be positive")
+
+    merge = 1
+    if bucket == 'auto':
+        bucket, merge = pick_performance_bucket(start, end, points)
+    if bucket != 'raw':
+        # bucket boundaries are aligned to the clock, so widen the range to
+        # the whole buckets it touches
+        width = PERFORMANCE_BUCKETS[bucket]
+        start -= timedelta(seconds=(start - datetime(1970, 1, 1)).total_seconds() % width)
+    return start, end, bucket, merge
+
+
+def performance_range_query(start, end, bucket):
+    """The (query, args) that reads the rows for a GET /performance response."""
+    if bucket == 'raw':
+        return '''
+            SELECT * FROM Performance
+            WHERE `Date` >= %s AND `Date` < %s
+            ORDER BY `Date`
+            LIMIT %s
+        ''', (start, end, PERFORMANCE_RAW_LIMIT + 1)
+    return '''
+        SELECT * FROM PerformanceRollup
+        WHERE Resolution = %s AND Bucket >= %s AND Bucket < %s
+        ORDER BY Bucket
+        LIMIT %s
+    ''', (bucket, start, end, PERFORMANCE_RAW_LIMIT + 1)
+
+
+def performance_range_result(rows, start, bucket, merge):
+    """The GET /performance response body for the rows its query returned."""
+    if bucket == 'raw':
+        return {
+            'bucket': bucket,
+            'points': [format_performance(row) for row in rows[:PERFORMANCE_RAW_LIMIT]],
+            'truncated': len(rows) > PERFORMANCE_RAW_LIMIT,
+        }
+    width = PERFORMANCE_BUCKETS[bucket] * merge
+    return {
+        'bucket': bucket,
+        'bucket_seconds': width,
+        'points': merge_rollups(rows[:PERFORMANCE_RAW_LIMIT], start, width),
+        'truncated': len(rows) > PERFORMANCE_RAW_LIMIT,
+    }
+
+
+#Get performance samples between two times, from the raw rows or the rollups
+#query params: from, to (YYYY-MM-DD or YYYY-MM-DDTHH:MM[:SS]; to is exclusive
+#unless it's a bare date), bucket (auto, raw, minute, hour or day; default
+#auto), points (for auto: about how many points to return, default 500)
+@system_admin.route('/performance', methods=['GET'])
+def get_performance_range():
+    try:
+        start, end, bucket, merge = parse_performance_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute(*performance_range_query(start, end, bucket))
+        rows = cursor.fetchall()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify(performance_range_result(rows, start, bucket, merge)), 200
+
+
 #Get the available dates from the system
 @system_admin.route('/performance/dates', methods=['GET'])
 def get_available_dates():
     try:
         cursor = db.get_db().cursor()
-        cursor.execute('''SELECT DISTINCT `Date` FROM Performance ORDER BY `Date` DESC''')
+        # one entry per day, read from idx_perf_date rather than the table
+        cursor.execute('''SELECT DISTINCT DATE(`Date`) AS Day FROM Performance ORDER BY Day DESC''')
         dates = cursor.fetchall()
         cursor.close()
         
         # Format dates as YYYY-MM-DD strings
-        date_list = []
-        for date_record in dates:
-            if isinstance(date_record, dict):
-                date_str = date_record['Date']
-            else:
-                date_str = date_record[0]
-                
-            # Parse the date string and reformat it
-            date_obj = datetime.strptime(str(date_str), '%Y-%m-%d %H:%M:%S')
-            formatted_date = date_obj.strftime('%Y-%m-%d')
-            date_list.append(formatted_date)
+        date_list = [date_record['Day'].strftime('%Y-%m-%d') for date_record in dates if date_record['Day']]
             
         return jsonify(date_list), 200
         
@@ -79,6 +280,7 @@ def add_performance():
             data['network_usage'],
             data['disk_usage']
         ))
+        cursor.execute('CALL refresh_performance_rollups(%s, %s + INTERVAL 1 SECOND)', (data['date'], data['date']))
         
         db.get_db().commit()
         cursor.close()
@@ -87,9 +289,137 @@ def add_performance():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+PERFORMANCE_BATCH_MAX_SAMPLES = 50000
+# seconds ?flush=true waits for the writer thread before answering with what is still buffered
+PERFORMANCE_FLUSH_TIMEOUT = 30
+PERFORMANCE_INSERT_CHUNK = 1000
+PERFORMANCE_SAMPLE_FIELDS = ('cpu_usage', 'memory_usage', 'network_usage', 'disk_usage')
+# the metric columns are signed INTs and `Date` a DATETIME
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+DATETIME_MIN_YEAR = 1000
+
+
+def minute_ranges(times, gap=timedelta(hours=1)):
+    """
+    [start, end) ranges covering the minutes of `times`, merging runs less
+    than `gap` apart so a batch refreshes its rollups in a few calls.
+    """
+    minutes = sorted({t.replace(second=0, microsecond=0) for t in times})
+    ranges = []
+    for minute in minutes:
+        if ranges and minute - ranges[-1][1] < gap:
+            ranges[-1][1] = minute + timedelta(minutes=1)
+        else:
+            ranges.append([minute, minute + timedelta(minutes=1)])
+    return ranges
+
+
+def write_performance_samples(rows):
+    """Insert (date, avg, median, top, low) rows with multi-row INSERTs and refresh their rollups."""
+    conn = db.get_db()
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), PERFORMANCE_INSERT_CHUNK):
+            cursor.executemany('''
+                INSERT INTO Performance (`Date`, Avg_Speed, Median_Speed, Top_Speed, Low_Speed)
+                VALUES (%s, %s, %s, %s, %s)
+            ''', rows[start:start + PERFORMANCE_INSERT_CHUNK])
+        for start, end in minute_ranges(row[0] for row in rows):
+            cursor.callproc('refresh_performance_rollups', (start, end))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# a row MySQL refuses on its own (out of range, bad value) is dropped
+# rather than kept for a retry with its whole batch
+performance_writer = BatchWriter(write_performance_samples,
+                                 bad_row_errors=(DataError, IntegrityError))
+
+
+def parse_performance_samples():
+    """
+    Read samples from the request body: a JSON list (or {"samples": [...]}),
+    or NDJSON with one sample object per line.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('samples')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON list of samples or an NDJSON body')
+    return data
+
+
+def performance_sample_row(sample, now):
+    """The (date, avg, median, top, low) row for one sample; raises ValueError if it's malformed."""
+    if not isinstance(sample, dict):
+        raise ValueError('Sample must be an object')
+    missing = [f for f in PERFORMANCE_SAMPLE_FIELDS if sample.get(f) is None]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    date = datetime.fromisoformat(sample['date']) if sample.get('date') else now
+    if date.tzinfo is not None:
+        raise ValueError('date must not have a UTC offset')
+    if date.year < DATETIME_MIN_YEAR:
+        raise ValueError(f'date must be in year {DATETIME_MIN_YEAR} or later')
+    values = []
+    for field in PERFORMANCE_SAMPLE_FIELDS:
+        try:
+            value = int(sample[field])
+        except OverflowError:
+            raise ValueError(f'{field} must be a finite number')
+        if not INT_MIN <= value <= INT_MAX:
+            raise ValueError(f'{field} must be between {INT_MIN} and {INT_MAX}')
+        values.append(value)
+    return (date,) + tuple(values)
+
+
+# Add many performance samples at once. They are buffered and written in
+# batches shared across requests; ?flush=true writes them before responding
+@system_admin.route('/performance/batch', methods=['POST'])
+def add_performance_batch():
+    try:
+        samples = parse_performance_samples()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if len(samples) > PERFORMANCE_BATCH_MAX_SAMPLES:
+        return jsonify({"error": f"At most {PERFORMANCE_BATCH_MAX_SAMPLES} samples per request"}), 413
+
+    now = datetime.now().replace(microsecond=0)
+    rows = []
+    errors = []
+    for index, sample in enumerate(samples):
+        try:
+            rows.append(performance_sample_row(sample, now))
+        except (TypeError, ValueError) as e:
+            errors.append({'index': index, 'error': str(e)})
+
+    if rows:
+        performance_writer.add(rows)
+    if request.args.get('flush', '').lower() in ('1', 'true'):
+        # the writer thread does the write; a flush() here would take a
+        # second pooled connection while this request holds one
+        performance_writer.wait_for_flush(PERFORMANCE_FLUSH_TIMEOUT)
+
+    return jsonify({
+        'accepted': len(rows),
+        'rejected': len(errors),
+        'errors': errors,
+        'buffered': performance_writer.stats()['buffered'],
+    }), 202 if rows else 400
+
+
 # Update existing performance entry
 @system_admin.route('/performance/update/<date>', methods=['PUT'])
 def update_performance(date):
+    day = day_range(date)
+    if day is None:
+        return jsonify({"error": "Date must be YYYY-MM-DD"}), 400
     try:
         data = request.json
         cursor = db.get_db().cursor()
@@ -100,7 +430,7 @@ def update_performance(date):
             Median_Speed = %s, 
             Top_Speed = %s, 
             Low_Speed = %s
-        WHERE date(`Date`) = %s
+        WHERE `Date` >= %s AND `Date` < %s
         '''
         
         cursor.execute(query, (
@@ -108,8 +438,9 @@ def update_performance(date):
             data['memory_usage'],
             data['network_usage'],
             data['disk_usage'],
-            date
+            *day
         ))
+        cursor.callproc('refresh_performance_rollups', day)
         
         db.get_db().commit()
         cursor.close()
@@ -121,10 +452,14 @@ def update_performance(date):
 # Delete performance entry
 @system_admin.route('/performance/delete/<date>', methods=['DELETE'])
 def delete_performance(date):
+    day = day_range(date)
+    if day is None:
+        return jsonify({"error": "Date must be YYYY-MM-DD"}), 400
     try:
         cursor = db.get_db().cursor()
-        query = 'DELETE FROM Performance WHERE date(`Date`) = %s'
-        cursor.execute(query, (date,))
+        query = 'DELETE FROM Performance WHERE `Date` >= %s AND `Date` < %s'
+        cursor.execute(query, day)
+        cursor.callproc('refresh_performance_rollups', day)
         
         db.get_db().commit()
         cursor.close()
@@ -135,14 +470,117 @@ def delete_performance(date):
     
 #Return a list of all users with their respective information
 @system_admin.route('/user', methods=['GET'])
+@cache.cached(ttl=60, tables=['User', 'Category'])
 def get_users():
+    query = 'SELECT * FROM User JOIN Category ON User.CategoryID = Category.CategoryID'
+    if request.args.get('format') in COLUMNAR_FORMATS:
+        return columnar_response(query, fmt=request.args['format'])
 
     cursor = db.get_db().cursor()
-    cursor.execute('SELECT * FROM User JOIN Category ON User.CategoryID = Category.CategoryID')
+    cursor.execute(query)
                    
     
     theData = cursor.fetchall()
     
     the_response = make_response(jsonify(theData))
     the_response.status_code = 200
-    return the_response
\ No newline at end of file
+    return the_response
+
+
+#Return connection pool usage and exhaustion counters
+@system_admin.route('/db/pool', methods=['GET'])
+def get_pool_stats():
+    return jsonify(db.pool.stats()), 200
+
+
+#Return the performance batch writer's counters
+@system_admin.route('/performance/batch/stats', methods=['GET'])
+def get_performance_batch_stats():
+    return jsonify(performance_writer.stats()), 200
+
+
+# kind -> key of the list in the response
+API_METRIC_KINDS = {'endpoint': 'endpoints', 'query': 'queries'}
+API_METRIC_DEFAULT_HOURS = 24
+API_METRIC_DEFAULT_LIMIT = 50
+
+
+#Request and query timings the API recorded about itself between from and to
+#(the last day by default), slowest first, merged across workers
+@system_admin.route('/api-metrics', methods=['GET'])
+def get_api_metrics():
+    kind = request.args.get('kind', 'endpoint')
+    if kind not in API_METRIC_KINDS:
+        return jsonify({"error": f"kind must be one of {', '.join(API_METRIC_KINDS)}"}), 400
+    try:
+        end = parse_time_bound(request.args['to'], end=True) if 'to' in request.args else datetime.now()
+        start = (parse_time_bound(request.args['from']) if 'from' in request.args
+                 else end - timedelta(hours=API_METRIC_DEFAULT_HOURS))
+        limit = int(request.args.get('limit', API_METRIC_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "from and to must be ISO dates or date-times without a UTC offset and limit an integer"}), 400
+
+    try:
+        cursor = db.get_db().cursor()
+        cursor.execute('''
+            SELECT Name, Calls, Errors, Total_Ms, Max_Ms, Db_Ms, Db_Queries, Rows_Returned, Histogram
+            FROM ApiMetric
+            WHERE Kind = %s AND Recorded_At >= %s AND Recorded_At < %s
+        ''', (kind, start, end))
+        timings = {}
+        for row in cursor.fetchall():
+            timing = timings.setdefault(row['Name'], new_timing())
+            merge_timing(timing, {
+                'calls': row['Calls'], 'errors': row['Errors'],
+                'total_ms': row['Total_Ms'], 'max_ms': row['Max_Ms'],
+                'db_ms': row['Db_Ms'], 'db_queries': row['Db_Queries'], 'rows': row['Rows_Returned'],
+                'histogram': json.loads(row['Histogram']),
+            })
+        summaries = sorted((summarize(name, timing) for name, timing in timings.items()),
+                           key=lambda s: s['avg_ms'] * s['calls'], reverse=True)
+        return jsonify({
+            'kind': kind,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            API_METRIC_KINDS[kind]: summaries[:limit],
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+#The current interval's timings in the worker that handles this request,
+#before they are written to ApiMetric
+@system_admin.route('/api-metrics/live', methods=['GET'])
+def get_live_api_metrics():
+    return jsonify(api_metrics.current()), 200
+
+
+#Return response cache hit/miss counters and how much compression saved
+@system_admin.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    stats = cache.stats()
+    stats['compression'] = compressor.stats()
+    return jsonify(stats), 200
+
+
+def rebuild_city_averages():
+    """Recompute the per-city rent and wage totals, City.Avg_Rent/Avg_Wage and the national totals from scratch."""
+    cursor = db.get_db().cursor()
+    cursor.callproc('rebuild_city_avg_rent')
+    cursor.callproc('rebuild_city_avg_wage')
+    cursor.callproc('rebuild_national_city_stats')
+    db.get_db().commit()
+    cursor.close()
+    cache.invalidate('City')
+
+
+#Rebuild the running totals behind City.Avg_Rent and City.Avg_Wage,
+#e.g. after bulk loading data or if they ever drift
+@system_admin.route('/city_stats/rebuild', methods=['POST'])
+def rebuild_city_stats():
+    try:
+        rebuild_city_averages()
+        return jsonify({"message": "City averages rebuilt successfully"}), 200
+    except Exception as e:
+        db.get_db().rollback()
+        return jsonify({"error": str(e)}), 500
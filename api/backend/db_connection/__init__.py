@@ -1,10 +1,192 @@
 #------------------------------------------------------------
 # This file creates a shared DB connection resource
 #------------------------------------------------------------
-from flaskext.mysql import MySQL
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g
 from pymysql import cursors
 
+from backend.db_connection.pool import ConnectionPool, PoolExhausted
+
+
+# statements run while inside db.record_queries(), if anyone is listening
+_recorded_queries = ContextVar('recorded_queries', default=None)
+
+# callables registered with db.on_query()
+_query_listeners = []
+
+logger = logging.getLogger(__name__)
+
+# what pymysql reports as the row count of an unbuffered result
+UNKNOWN_ROWCOUNT = 2 ** 64 - 1
+
+
+class InstrumentedCursorMixin:
+    """
+    Hands each statement to db.record_queries() and reports how long it
+    took to db.on_query() listeners.
+    """
+
+    _statement = None
+
+    def execute(self, query, args=None):
+        recorded = _recorded_queries.get()
+        if recorded is not None:
+            recorded.append(self.mogrify(query, args))
+        if not _query_listeners:
+            return super().execute(query, args)
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, args)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            # executemany() runs the multi-row INSERT it builds through here;
+            # report it under the statement the caller wrote
+            statement = self._statement or query
+            # an unbuffered result's row count isn't known until it's read
+            rows = self.rowcount if 0 <= self.rowcount < UNKNOWN_ROWCOUNT else 0
+            for listener in _query_listeners:
+                # a broken listener mustn't fail the query, or replace the
+                # error of one that already failed
+                try:
+                    listener(statement, elapsed, rows, failed)
+                except Exception:
+                    logger.exception('Query listener %r failed', listener)
+
+    def executemany(self, query, args):
+        self._statement = query
+        try:
+            return super().executemany(query, args)
+        finally:
+            self._statement = None
+
+
+class DictCursor(InstrumentedCursorMixin, cursors.DictCursor):
+    """Rows as dicts, the cursor every route gets from db.get_db().cursor()."""
+
+
+class SSCursor(InstrumentedCursorMixin, cursors.SSCursor):
+    """
+    Unbuffered cursor returning plain tuples, for reading big results a
+    batch at a time without building a dict per row.
+    """
+
+
+class PooledMySQL:
+    """
+    Drop-in replacement for flaskext.mysql.MySQL that borrows
+    connections from a ConnectionPool instead of opening a new one
+    for every request.
+
+    Routes keep calling db.get_db().cursor(); the connection is
+    checked out on first use in an app context and handed back to
+    the pool when the app context is torn down.
+    """
+
+    def __init__(self, cursorclass=None):
+        self.cursorclass = cursorclass
+        self.pool = None
+
+    def init_app(self, app):
+        config = app.config
+        connect_kwargs = {
+            'host': config.get('MYSQL_DATABASE_HOST', 'localhost'),
+            'port': config.get('MYSQL_DATABASE_PORT', 3306),
+            'user': config.get('MYSQL_DATABASE_USER'),
+            'password': config.get('MYSQL_DATABASE_PASSWORD'),
+            'database': config.get('MYSQL_DATABASE_DB'),
+            'charset': config.get('MYSQL_DATABASE_CHARSET', 'utf8mb4'),
+        }
+        if self.cursorclass is not None:
+            connect_kwargs['cursorclass'] = self.cursorclass
+
+        self.pool = ConnectionPool(
+            connect_kwargs,
+            min_size=config.get('MYSQL_POOL_MIN_SIZE', 1),
+            max_size=config.get('MYSQL_POOL_MAX_SIZE', 10),
+            idle_timeout=config.get('MYSQL_POOL_IDLE_TIMEOUT', 300),
+            checkout_timeout=config.get('MYSQL_POOL_CHECKOUT_TIMEOUT', 10),
+            ping_interval=config.get('MYSQL_POOL_PING_INTERVAL', 5),
+        )
+        app.teardown_appcontext(self.teardown)
+
+    def connect(self):
+        return self.pool.acquire()
+
+    def get_db(self):
+        if 'mysql_db' not in g:
+            try:
+                g.mysql_db = self.connect()
+            except PoolExhausted as e:
+                # routes answer their own `except Exception` with a 500; note
+                # the timeout so the app can still send its 503 (see rest_entry)
+                g.pool_exhausted = e
+                raise
+        return g.mysql_db
+
+    def stream(self, query, args=None, cursorclass=cursors.SSDictCursor):
+        """
+        Yield rows from `query` through an unbuffered server-side cursor.
+
+        The rows are pulled from MySQL as the caller iterates, so memory
+        stays flat however big the result is. The generator uses its own
+        pooled connection because it usually outlives the request's app
+        context (e.g. inside a streamed response).
+        """
+        conn = self.pool.acquire()
+        finished = False
+        try:
+            cursor = conn.cursor(cursorclass)
+            cursor.execute(query, args)
+            for row in cursor:
+                yield row
+            cursor.close()
+            finished = True
+        finally:
+            # an unbuffered result that was abandoned half way leaves the
+            # connection unusable until drained, so just drop it
+            self.pool.release(conn, discard=not finished)
+
+    @contextmanager
+    def record_queries(self):
+        """
+        Collect the SQL (with arguments filled in) of every statement run
+        through a db cursor in this context, e.g. while a test client
+        request is handled.
+        """
+        recorded = []
+        token = _recorded_queries.set(recorded)
+        try:
+            yield recorded
+        finally:
+            _recorded_queries.reset(token)
+
+    def on_query(self, listener):
+        """
+        Call `listener(statement, seconds, rows, failed)` after every statement
+        run through a db cursor, with the SQL as written (placeholders, not
+        arguments) so repeated calls of one query share a statement.
+        Registering the same listener again (e.g. from a second create_app)
+        does nothing.
+        """
+        if listener not in _query_listeners:
+            _query_listeners.append(listener)
+
+    def teardown(self, exception):
+        conn = g.pop('mysql_db', None)
+        if conn is not None:
+            # a connection whose request blew up mid-query may be in an
+            # unknown protocol state, so don't hand it to anyone else
+            self.pool.release(conn, discard=exception is not None)
+
 
-# the parameter instructs the connection to return data 
-# as a dictionary object. 
-db = MySQL(cursorclass=cursors.DictCursor)
\ No newline at end of file
+# the parameter instructs the connection to return data
+# as a dictionary object.
+db = PooledMySQL(cursorclass=DictCursor)
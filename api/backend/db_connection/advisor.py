@@ -0,0 +1,140 @@
+#------------------------------------------------------------
+# Index advisor: requests every GET route, EXPLAINs the SQL
+# each one runs and reports the table scans an index could fix.
+#------------------------------------------------------------
+import re
+
+from werkzeug.routing import IntegerConverter
+
+from backend.cache import cache
+from backend.db_connection import db
+
+# values for URL arguments that an id of 1 can't stand in for; each query
+# returns one real value from the seed data
+SAMPLE_ARGUMENT_QUERIES = {
+    'city_name': 'SELECT Name AS value FROM City ORDER BY City_ID LIMIT 1',
+    'email': 'SELECT email AS value FROM User ORDER BY UserID LIMIT 1',
+    'user_email': 'SELECT email AS value FROM User ORDER BY UserID LIMIT 1',
+    'Date': 'SELECT DATE_FORMAT(`Date`, "%Y-%m-%d") AS value FROM Performance ORDER BY PID LIMIT 1',
+}
+SAMPLE_ARGUMENTS = {
+    'Avg_Cost_Of_Living': '2000',
+}
+
+# query strings for routes whose filters only run when asked for
+SAMPLE_QUERY_STRINGS = {
+    'student_routes.search_job_postings': 'min_compensation=1000&city={city_name}&sort=compensation_desc',
+    'student_routes.fulltext_search_job_postings': 'q=engineer',
+    'student_routes.get_map_bbox': 'min_lat=25&min_lon=-125&max_lat=49&max_lon=-66',
+}
+
+# EXPLAIN access types that read a whole table or a whole index
+FULL_SCAN_TYPES = ('ALL', 'index')
+
+# one <converter(options):name> placeholder in a rule string
+RULE_ARGUMENT = re.compile(r'<(?:(?P<converter>\w+)(?:\([^)]*\))?:)?(?P<name>\w+)>')
+
+
+def sample_arguments(cursor):
+    values = dict(SAMPLE_ARGUMENTS)
+    for name, query in SAMPLE_ARGUMENT_QUERIES.items():
+        cursor.execute(query)
+        row = cursor.fetchone()
+        if row is not None:
+            values[name] = str(row['value'])
+    return values
+
+
+def sample_url(rule, values):
+    """`rule` with its arguments filled in, or None if one has no sample value."""
+    converters = {match['name']: rule.map.converters[match['converter'] or 'default']
+                  for match in RULE_ARGUMENT.finditer(rule.rule)}
+    args = {}
+    for name in rule.arguments:
+        if name in values:
+            args[name] = values[name]
+        elif issubclass(converters[name], IntegerConverter) or name.lower().endswith('id'):
+            args[name] = 1
+        else:
+            return None
+    url = rule.build(args, append_unknown=False)[1]
+    query_string = SAMPLE_QUERY_STRINGS.get(rule.endpoint)
+    if query_string:
+        url += '?' + query_string.format(**values)
+    return url
+
+
+def explain(cursor, sql):
+    """EXPLAIN rows for one SELECT, each marked with whether it needs a look."""
+    cursor.execute('EXPLAIN ' + sql)
+    rows = cursor.fetchall()
+    for row in rows:
+        # a scan that throws rows away (or feeds a join) is what an index
+        # fixes; one that returns the whole table (e.g. GET /city) is working
+        # as intended, and <derived> tables have no indexes to use
+        extra = row.get('Extra') or ''
+        row['flagged'] = (row.get('type') in FULL_SCAN_TYPES
+                          and not str(row.get('table')).startswith('<')
+                          and ('Using where' in extra or 'Using join buffer' in extra))
+    return rows
+
+
+def advise(app):
+    """
+    Run every GET route once through a test client, EXPLAIN each distinct
+    SELECT it issued and return [{'endpoint', 'url', 'sql', 'plan'}].
+    Only GET routes are requested, so nothing is written. Call it outside
+    an app context so each request gets its own, like in production.
+    """
+    with app.app_context():
+        values = sample_arguments(db.get_db().cursor())
+
+    # a cached response wouldn't run any SQL
+    cache_enabled, cache.enabled = cache.enabled, False
+    client = app.test_client()
+    routes = []
+    try:
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            if 'GET' not in rule.methods or rule.endpoint == 'static':
+                continue
+            url = sample_url(rule, values)
+            queries = []
+            if url is not None:
+                with db.record_queries() as queries:
+                    client.get(url)
+            routes.append((rule, url, queries))
+    finally:
+        cache.enabled = cache_enabled
+
+    report = []
+    with app.app_context():
+        cursor = db.get_db().cursor()
+        for rule, url, queries in routes:
+            if url is None:
+                report.append({'endpoint': rule.endpoint, 'url': rule.rule, 'sql': None, 'plan': []})
+                continue
+            seen = set()
+            for sql in queries:
+                if not sql.lstrip().upper().startswith('SELECT') or sql in seen:
+                    continue
+                seen.add(sql)
+                report.append({'endpoint': rule.endpoint, 'url': url, 'sql': sql, 'plan': explain(cursor, sql)})
+    return report
+
+
+def format_report(report):
+    """Human readable lines for the `flask explain-routes` command."""
+    lines = []
+    for entry in report:
+        if entry['sql'] is None:
+            lines.append(f"SKIP {entry['endpoint']} {entry['url']}: no sample value for its arguments")
+            continue
+        flagged = [row for row in entry['plan'] if row['flagged']]
+        status = 'SCAN' if flagged else 'ok  '
+        lines.append(f"{status} {entry['endpoint']} {entry['url']}")
+        for row in flagged:
+            lines.append(f"       full {'table' if row['type'] == 'ALL' else 'index'} scan of {row['table']} "
+                         f"(~{row['rows']} rows, possible keys: {row['possible_keys'] or 'none'})")
+        if flagged:
+            lines.append('       ' + ' '.join(entry['sql'].split()))
+    return lines
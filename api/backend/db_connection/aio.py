@@ -0,0 +1,83 @@
+#------------------------------------------------------------
+# asyncio counterpart of PooledMySQL for the ASGI app
+# (backend/asgi_entry.py), on aiomysql. A query waiting on MySQL
+# yields the event loop instead of holding a thread.
+#------------------------------------------------------------
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiomysql
+
+from backend.db_connection.pool import PoolExhausted
+
+
+class AsyncPooledMySQL:
+    """
+    aiomysql pool configured from the same MYSQL_* settings as PooledMySQL.
+
+    Connections run in autocommit mode, so every query sees the latest
+    committed data, the way the sync pool's rollback on release does.
+    """
+
+    def __init__(self):
+        self.config = None
+        self.pool = None
+
+    def init_app(self, config):
+        self.config = config
+
+    async def open(self):
+        config = self.config
+        self.checkout_timeout = config.get('MYSQL_POOL_CHECKOUT_TIMEOUT', 10)
+        self.pool = await aiomysql.create_pool(
+            host=config.get('MYSQL_DATABASE_HOST', 'localhost'),
+            port=config.get('MYSQL_DATABASE_PORT', 3306),
+            user=config.get('MYSQL_DATABASE_USER'),
+            password=config.get('MYSQL_DATABASE_PASSWORD'),
+            db=config.get('MYSQL_DATABASE_DB'),
+            charset=config.get('MYSQL_DATABASE_CHARSET', 'utf8mb4'),
+            minsize=config.get('MYSQL_POOL_MIN_SIZE', 1),
+            maxsize=config.get('MYSQL_POOL_MAX_SIZE', 10),
+            # reconnect rather than reuse a connection MySQL may have dropped
+            pool_recycle=int(config.get('MYSQL_POOL_IDLE_TIMEOUT', 300)),
+            cursorclass=aiomysql.DictCursor,
+            autocommit=True,
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection, waiting up to the checkout timeout like the sync pool."""
+        try:
+            conn = await asyncio.wait_for(self.pool.acquire(), self.checkout_timeout)
+        except asyncio.TimeoutError:
+            raise PoolExhausted(
+                f'no database connection available after {self.checkout_timeout}s '
+                f'(max_size={self.pool.maxsize})')
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
+
+    async def fetchall(self, query, args=None):
+        async with self.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, args)
+                return await cursor.fetchall()
+
+    def stats(self):
+        return {
+            'size': self.pool.size,
+            'free': self.pool.freesize,
+            'in_use': self.pool.size - self.pool.freesize,
+            'min_size': self.pool.minsize,
+            'max_size': self.pool.maxsize,
+        }
+
+
+async_db = AsyncPooledMySQL()
@@ -0,0 +1,186 @@
+#------------------------------------------------------------
+# A small, thread-safe pool of PyMySQL connections.
+#
+# Opening a connection costs a TCP connect plus the MySQL auth
+# handshake, so instead of doing that on every request we keep
+# a bounded set of connections around and hand them out.
+#------------------------------------------------------------
+import threading
+import time
+
+import pymysql
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection frees up within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of PyMySQL connections.
+
+    - never holds more than `max_size` connections (idle + in use)
+    - keeps at least `min_size` connections open once they have been made
+    - closes idle connections above `min_size` after `idle_timeout` seconds
+    - pings a connection on checkout if it sat idle longer than
+      `ping_interval` seconds and replaces it if the ping fails
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10,
+                 idle_timeout=300, checkout_timeout=10, ping_interval=5):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1')
+
+        self.connect_kwargs = dict(connect_kwargs)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+
+        self._lock = threading.Condition()
+        # idle connections as (connection, time it was returned), newest last
+        self._idle = []
+        self._in_use = 0
+
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'exhausted': 0,
+            'evicted_idle': 0,
+            'failed_health_checks': 0,
+            'peak_in_use': 0,
+        }
+
+    # -- connection lifecycle -------------------------------------------
+
+    def _connect(self):
+        conn = pymysql.connect(**self.connect_kwargs)
+        with self._lock:
+            self._stats['created'] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._stats['closed'] += 1
+
+    def _healthy(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._lock:
+                self._stats['failed_health_checks'] += 1
+            return False
+
+    # -- checkout / release ---------------------------------------------
+
+    def acquire(self):
+        """Check out a healthy connection, waiting up to `checkout_timeout`."""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._lock:
+                self._evict_idle_locked()
+                candidate = None
+                if self._idle:
+                    candidate, idle_since = self._idle.pop()
+                elif self._in_use >= self.max_size:
+                    self._stats['waits'] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._lock.wait(remaining):
+                        if not self._idle and self._in_use >= self.max_size:
+                            self._stats['exhausted'] += 1
+                            raise PoolExhausted(
+                                f'no database connection available after {self.checkout_timeout}s '
+                                f'(max_size={self.max_size})')
+                    continue
+                # reserve the slot before doing any network I/O
+                self._in_use += 1
+                self._stats['checkouts'] += 1
+                self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._in_use)
+
+            if candidate is not None:
+                if self._healthy(candidate, idle_since):
+                    return candidate
+                self._close(candidate)
+
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                    self._lock.notify()
+                raise
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if `discard` is set."""
+        if not discard:
+            try:
+                # end whatever transaction the request left open so the
+                # next borrower does not read from a stale snapshot
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard:
+            self._close(conn)
+
+        with self._lock:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def _evict_idle_locked(self):
+        # the oldest idle connections sit at the front of the list
+        now = time.monotonic()
+        expired = []
+        while (self._idle
+               and len(self._idle) + self._in_use > self.min_size
+               and now - self._idle[0][1] > self.idle_timeout):
+            expired.append(self._idle.pop(0)[0])
+        self._stats['evicted_idle'] += len(expired)
+        for conn in expired:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._stats['closed'] += len(expired)
+
+    def close_all(self):
+        """Close every idle connection; in-use connections close on release."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def after_fork(self):
+        """
+        Forget the connections inherited from a parent process. Their sockets
+        are still the parent's, so they're dropped without being closed
+        (closing would send MySQL a QUIT on the parent's behalf).
+        """
+        self._lock = threading.Condition()
+        self._idle = []
+        self._in_use = 0
+
+    # -- metrics --------------------------------------------------------
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        return stats
@@ -0,0 +1,206 @@
+#------------------------------------------------------------
+# Offline geocoding import. Fills in the coordinates of cities,
+# zip codes and facilities (housing, airports, hospitals) from
+# local CSV files so the map never has to make them up.
+#------------------------------------------------------------
+import csv
+import math
+import os
+import threading
+import time
+import zlib
+
+from backend.cache import cache
+from backend.db_connection import db
+
+CITY_CENTERS_CSV = os.path.join(os.path.dirname(__file__), 'data', 'city_centers.csv')
+
+# accepted header names, compared case-insensitively. The zip names cover
+# the Census ZCTA gazetteer file (GEOID, INTPTLAT, INTPTLONG).
+ZIP_COLUMNS = ('zip', 'zipcode', 'zip_code', 'geoid', 'zcta5')
+LAT_COLUMNS = ('latitude', 'lat', 'intptlat')
+LON_COLUMNS = ('longitude', 'lon', 'lng', 'long', 'intptlong')
+
+# table -> (primary key, zip column) for every table with a Geo column
+FACILITY_TABLES = {
+    'housing': ('Housing', 'Housing_ID', 'zipID'),
+    'airport': ('Airport', 'Air_ID', 'Zip'),
+    'hospital': ('Hospital', 'HospitalID', 'Zip'),
+}
+
+
+def _column(header, candidates, path):
+    for name in header:
+        if name.strip().lower() in candidates:
+            return name
+    raise ValueError(f'{path}: no column named any of {", ".join(candidates)}')
+
+
+def read_coordinates(path, key_candidates):
+    """
+    Read a CSV/TSV file of coordinates into {key: (latitude, longitude)}.
+    The key column is the first header matching one of `key_candidates`.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=',\t;|')
+        reader = csv.DictReader(f, dialect=dialect)
+        key_col = _column(reader.fieldnames, key_candidates, path)
+        lat_col = _column(reader.fieldnames, LAT_COLUMNS, path)
+        lon_col = _column(reader.fieldnames, LON_COLUMNS, path)
+
+        coordinates = {}
+        for row in reader:
+            try:
+                coordinates[row[key_col].strip()] = (float(row[lat_col]), float(row[lon_col]))
+            except (TypeError, ValueError):
+                continue
+    return coordinates
+
+
+def near(lat, lon, key, spread=0.02):
+    """
+    A stable point within `spread` degrees of (lat, lon), derived from `key`.
+    Used when the dataset has no entry for a zip code so it still lands
+    inside its city, in the same place every time.
+    """
+    h = zlib.crc32(str(key).encode())
+    return (lat + ((h & 0xffff) / 0xffff - 0.5) * 2 * spread,
+            lon + ((h >> 16) / 0xffff - 0.5) * 2 * spread)
+
+
+# MySQL named lock held while one process fills in coordinates
+GEOCODE_LOCK = 'coopconnect_geocodes'
+
+KM_PER_DEGREE_LAT = 111.045
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    (min_lon, min_lat, max_lon, max_lat) of a box that contains every point
+    within `radius_km` of (lat, lon), for a MBRContains pre-filter.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(lat))
+    dlon = 180 if cos_lat < 1e-6 else min(180, radius_km / (KM_PER_DEGREE_LAT * cos_lat))
+    return (lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+
+
+def import_geocodes(cursor, zips_path=None, facilities_path=None, cities_path=CITY_CENTERS_CSV):
+    """
+    Fill in Latitude/Longitude (and the Geo point) for every table that has them.
+
+    - City gets the coordinates of its center from `cities_path`
+    - Location gets its zip centroid from `zips_path`; zips missing from
+      the file are placed near their city's center
+    - Housing, Airport and Hospital get their own coordinates from
+      `facilities_path` (columns: type, id, latitude, longitude). Every
+      other row still marked Approximate is placed again close to its
+      zip's (possibly new) centroid; exact ones from an earlier import stay
+
+    Returns counts of what was updated. The caller commits.
+    """
+    summary = {}
+
+    city_centers = read_coordinates(cities_path, ('name', 'city'))
+    cursor.executemany(
+        'UPDATE City SET Latitude = %s, Longitude = %s WHERE Name = %s',
+        [(lat, lon, name) for name, (lat, lon) in city_centers.items()])
+    summary['cities'] = len(city_centers)
+
+    zip_centroids = read_coordinates(zips_path, ZIP_COLUMNS) if zips_path else {}
+    cursor.execute('''
+        SELECT L.Zip, C.Latitude, C.Longitude
+        FROM Location L
+        JOIN City C ON C.City_ID = L.City_ID
+    ''')
+    zip_rows = []
+    approximated = 0
+    for row in cursor.fetchall():
+        # zips are stored as ints, so 02115 is 2115
+        coords = zip_centroids.get(str(row['Zip']).zfill(5)) or zip_centroids.get(str(row['Zip']))
+        if coords is None and row['Latitude'] is not None:
+            coords = near(row['Latitude'], row['Longitude'], row['Zip'])
+            approximated += 1
+        if coords is not None:
+            zip_rows.append((coords[0], coords[1], row['Zip']))
+    cursor.executemany('UPDATE Location SET Latitude = %s, Longitude = %s WHERE Zip = %s', zip_rows)
+    summary['zips'] = len(zip_rows)
+    summary['zips_approximated'] = approximated
+
+    if facilities_path:
+        # keyed on (type, id) rather than one column, so read it directly
+        facilities = {}
+        with open(facilities_path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                kind = (row.get('type') or row.get('kind') or '').strip().lower()
+                if kind in FACILITY_TABLES:
+                    try:
+                        facilities.setdefault(kind, []).append(
+                            (float(row['latitude']), float(row['longitude']), int(row['id'])))
+                    except (KeyError, TypeError, ValueError):
+                        continue
+        for kind, rows in facilities.items():
+            table, pk, _ = FACILITY_TABLES[kind]
+            cursor.executemany(
+                f'UPDATE {table} SET Latitude = %s, Longitude = %s, Approximate = FALSE WHERE {pk} = %s', rows)
+            summary[f'{kind}_exact'] = len(rows)
+
+    for kind, (table, pk, zip_col) in FACILITY_TABLES.items():
+        # spread facilities that share a zip a little so they don't stack
+        cursor.execute(f'''
+            UPDATE {table} T
+            JOIN Location L ON L.Zip = T.{zip_col}
+            SET T.Latitude = L.Latitude + ((CRC32(T.{pk}) % 201) - 100) / 100000,
+                T.Longitude = L.Longitude + ((CRC32(T.{pk} * 7) % 201) - 100) / 100000
+            WHERE T.Approximate AND L.Latitude IS NOT NULL
+        ''')
+        summary[f'{kind}_from_zip'] = cursor.rowcount
+
+    for table in ('Location', 'Housing', 'Airport', 'Hospital'):
+        cursor.execute(f'''
+            UPDATE {table}
+            SET Geo = POINT(Longitude, Latitude)
+            WHERE Latitude IS NOT NULL
+        ''')
+
+    return summary
+
+
+def geocode_fresh_database(app, attempts=60, delay=2.0):
+    """
+    In a background thread, run import_geocodes with the bundled city centers
+    if no city has coordinates yet, i.e. on a freshly bootstrapped database,
+    so the map has points without anyone running `flask import-geocodes`.
+
+    MySQL may still be loading the SQL files when the API starts, so it keeps
+    retrying for a while. A named lock keeps gunicorn's workers from all
+    doing the import at once; whoever gets it second finds it done.
+    """
+    def run():
+        for attempt in range(attempts):
+            try:
+                with app.app_context():
+                    conn = db.get_db()
+                    cursor = conn.cursor()
+                    cursor.execute('SELECT GET_LOCK(%s, 30) AS locked', (GEOCODE_LOCK,))
+                    if not cursor.fetchone()['locked']:
+                        return
+                    try:
+                        cursor.execute('SELECT 1 FROM City WHERE Latitude IS NOT NULL LIMIT 1')
+                        if cursor.fetchone() is None:
+                            summary = import_geocodes(cursor)
+                            conn.commit()
+                            cache.invalidate('City', 'Location', 'Housing', 'Airport', 'Hospital')
+                            app.logger.info('Filled in coordinates for a fresh database: %s', summary)
+                    finally:
+                        cursor.execute('DO RELEASE_LOCK(%s)', (GEOCODE_LOCK,))
+                return
+            except Exception:
+                if attempt == attempts - 1:
+                    app.logger.exception('Could not fill in coordinates; run `flask import-geocodes`')
+                    return
+                time.sleep(delay)
+
+    threading.Thread(target=run, name='geocode-fresh-database', daemon=True).start()
@@ -0,0 +1,163 @@
+#------------------------------------------------------------
+# In-memory write buffer for high-rate ingestion. Rows are
+# collected from many requests and written together, so the
+# database sees one multi-row INSERT and one commit per batch
+# instead of one per row.
+#------------------------------------------------------------
+import atexit
+import threading
+import time
+
+
+class BatchWriter:
+    """
+    Buffers rows and hands them to `write(rows)` in batches, inside an app
+    context, when `max_rows` are waiting or the oldest has waited
+    `max_delay` seconds, whichever is first.
+
+    Batches are written by one background thread, never by the request
+    that filled them: flush() in a request thread would push a second app
+    context and check out a second pooled connection while the request
+    still holds its own.
+
+    Buffered rows live in this process only: they are written at exit,
+    but a crash loses up to one batch. A request that needs its rows
+    stored before it responds can wait_for_flush().
+
+    A batch that fails with one of `bad_row_errors` is written again in
+    halves until the rows that fail on their own are found; those are
+    dropped and the rest written. Any other error keeps the unwritten
+    rows buffered for a retry.
+    """
+
+    def __init__(self, write, max_rows=1000, max_delay=1.0, max_pending=100000, bad_row_errors=()):
+        self.write = write
+        self.bad_row_errors = bad_row_errors
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        # rows kept for a retry when a write fails, beyond which the oldest go
+        self.max_pending = max_pending
+        self.app = None
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        # one write at a time, so batches reach the database in order
+        self._write_lock = threading.Lock()
+        self._thread = None
+        # set to have the writer thread look at the buffer before its next tick
+        self._wake = threading.Event()
+        # events of callers waiting in wait_for_flush(), set after the next flush
+        self._waiters = []
+        self._atexit_registered = False
+        self._stats = {'written': 0, 'batches': 0, 'failed_batches': 0, 'dropped': 0, 'rejected': 0}
+
+    def init_app(self, app, prefix):
+        self.app = app
+        self.max_rows = app.config.get(f'{prefix}_MAX_ROWS', self.max_rows)
+        self.max_delay = app.config.get(f'{prefix}_MAX_DELAY', self.max_delay)
+        if not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+
+    def add(self, rows):
+        """Queue `rows`; returns True if they filled a batch for the writer thread."""
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            full = len(self._rows) >= self.max_rows
+            self._start_thread()
+        if full:
+            self._wake.set()
+        return full
+
+    def wait_for_flush(self, timeout=None):
+        """
+        Have the writer thread write everything buffered so far and wait
+        for it. Returns False if `timeout` seconds passed first.
+        """
+        done = threading.Event()
+        with self._lock:
+            self._waiters.append(done)
+            self._start_thread()
+        self._wake.set()
+        return done.wait(timeout)
+
+    def _start_thread(self):
+        # called with _lock held. Started on first use so CLI commands and
+        # forked workers don't inherit a timer thread they never use
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='batch-writer', daemon=True)
+            self._thread.start()
+
+    def flush(self):
+        """Write everything buffered so far. Returns how many rows were written."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._rows, self._oldest = self._rows, [], None
+            if not rows:
+                return 0
+            written, rejected, unwritten = self._write_rows(rows)
+            with self._lock:
+                self._stats['written'] += written
+                self._stats['rejected'] += rejected
+                if written:
+                    self._stats['batches'] += 1
+                if unwritten:
+                    self._rows[:0] = unwritten
+                    overflow = len(self._rows) - self.max_pending
+                    if overflow > 0:
+                        del self._rows[:overflow]
+                        self._stats['dropped'] += overflow
+                    self._oldest = self._oldest or time.monotonic()
+                    self._stats['failed_batches'] += 1
+            return written
+
+    def _write_rows(self, rows):
+        """
+        Write `rows`, splitting chunks that fail with a bad_row_errors error.
+        Returns (rows written, rows rejected, rows left for a retry).
+        """
+        written = rejected = 0
+        # a stack of chunks still to write, the next one last
+        chunks = [rows]
+        while chunks:
+            chunk = chunks.pop()
+            try:
+                with self.app.app_context():
+                    self.write(chunk)
+            except self.bad_row_errors as e:
+                if len(chunk) == 1:
+                    self.app.logger.warning('Dropping a row the database refused: %r (%s)', chunk[0], e)
+                    rejected += 1
+                else:
+                    half = len(chunk) // 2
+                    chunks += [chunk[half:], chunk[:half]]
+                continue
+            except Exception:
+                unwritten = chunk + [row for rest in reversed(chunks) for row in rest]
+                self.app.logger.exception('Batch write of %d rows failed; keeping them for a retry', len(unwritten))
+                return written, rejected, unwritten
+            written += len(chunk)
+        return written, rejected, []
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.max_delay / 4)
+            self._wake.clear()
+            with self._lock:
+                waiters, self._waiters = self._waiters, []
+                due = (waiters or len(self._rows) >= self.max_rows
+                       or self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay)
+            if due:
+                self.flush()
+            for done in waiters:
+                done.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['buffered'] = len(self._rows)
+            stats['max_rows'] = self.max_rows
+            stats['max_delay'] = self.max_delay
+        return stats
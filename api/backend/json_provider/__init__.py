@@ -0,0 +1,67 @@
+#------------------------------------------------------------
+# orjson-backed JSON for every response. orjson encodes dicts,
+# lists, numbers, strings and datetimes in C, so serializing a
+# big fetchall() costs a fraction of the stdlib encoder; only
+# Decimal values still call back into Python.
+#------------------------------------------------------------
+import datetime
+import decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+
+def _default(value):
+    # Decimals stay strings, as Flask's encoder wrote them
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    # only reached with http_dates, which passes datetimes through to here
+    if isinstance(value, datetime.date):
+        return http_date(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumpb(obj, sort_keys=True, http_dates=False, indent=False):
+    """
+    `obj` as JSON bytes. Datetimes are ISO 8601 (2024-01-31T09:30:00)
+    unless `http_dates` asks for Flask's old 'Wed, 31 Jan 2024 09:30:00 GMT'.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if http_dates:
+        option |= orjson.OPT_PASSTHROUGH_DATETIME
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Drop-in replacement for Flask's DefaultJSONProvider: jsonify(),
+    request.get_json() and app.json.dumps() all go through orjson.
+    Like the default provider it sorts keys and indents in debug mode.
+    """
+
+    sort_keys = True
+    compact = None
+    http_dates = False
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return self.dumpb(obj, **kwargs).decode('utf-8')
+
+    def dumpb(self, obj, indent=None, **kwargs):
+        # stdlib options like separators don't apply to orjson's fixed output
+        return dumpb(obj, sort_keys=self.sort_keys, http_dates=self.http_dates, indent=bool(indent))
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumpb(obj, indent=indent) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,300 @@
+#------------------------------------------------------------
+# Self-instrumentation. Every request and every query the API
+# runs is timed and aggregated in this process; once per
+# interval the totals go to ApiMetric, and a CPU / memory /
+# pool / disk sample goes to Performance, so the admin
+# dashboard charts what the API is actually doing.
+#------------------------------------------------------------
+import atexit
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from flask import g, has_request_context, request
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+from backend.db_connection import db
+
+# upper bounds (ms) of the latency histogram buckets; one more bucket
+# after the last holds everything slower
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# statements tracked per interval; more distinct SQL than this is lumped together
+MAX_STATEMENTS = 200
+STATEMENT_NAME_LENGTH = 255
+OTHER_STATEMENTS = '(other statements)'
+
+
+def new_timing():
+    return {
+        'calls': 0,
+        'errors': 0,
+        'total_ms': 0.0,
+        'max_ms': 0.0,
+        'db_ms': 0.0,
+        'db_queries': 0,
+        'rows': 0,
+        'histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    }
+
+
+def observe(timing, ms, error=False, db_ms=0.0, db_queries=0, rows=0):
+    timing['calls'] += 1
+    timing['errors'] += bool(error)
+    timing['total_ms'] += ms
+    timing['max_ms'] = max(timing['max_ms'], ms)
+    timing['db_ms'] += db_ms
+    timing['db_queries'] += db_queries
+    timing['rows'] += rows
+    timing['histogram'][bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+
+def merge_timing(into, timing):
+    for key in ('calls', 'errors', 'total_ms', 'db_ms', 'db_queries', 'rows'):
+        into[key] += timing[key] or 0
+    into['max_ms'] = max(into['max_ms'], timing['max_ms'])
+    into['histogram'] = [a + b for a, b in zip(into['histogram'], timing['histogram'])]
+
+
+def percentile(timing, fraction):
+    """
+    Latency below which `fraction` of the calls finished, to the resolution
+    of the histogram buckets (and never above the slowest call).
+    """
+    rank = fraction * timing['calls']
+    seen = 0
+    for i, count in enumerate(timing['histogram']):
+        seen += count
+        if count and seen >= rank:
+            bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else timing['max_ms']
+            return float(min(bound, timing['max_ms']))
+    return None
+
+
+def summarize(name, timing):
+    """JSON-friendly view of one timing with its averages and percentiles."""
+    calls = timing['calls']
+    return {
+        'name': name,
+        'calls': calls,
+        'errors': timing['errors'],
+        'avg_ms': timing['total_ms'] / calls if calls else None,
+        'max_ms': timing['max_ms'],
+        'p50_ms': percentile(timing, 0.50),
+        'p95_ms': percentile(timing, 0.95),
+        'p99_ms': percentile(timing, 0.99),
+        'avg_db_ms': timing['db_ms'] / calls if calls else None,
+        'avg_db_queries': timing['db_queries'] / calls if calls else None,
+        'rows': timing['rows'],
+    }
+
+
+def rss_bytes():
+    """Resident memory of this process, or its peak where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return None
+        # kilobytes on Linux, which is the only place this fallback matters
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def physical_memory_bytes():
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ApiMetrics:
+    """
+    Per-process request and query timings.
+
+    Each interval writes one ApiMetric row per endpoint and per SQL
+    statement seen, tagged with this worker, and hands one sample to the
+    Performance batch writer:
+
+    - CPU_Usage: this process's CPU time as a share of the machine's cores
+    - Memory_Usage: its resident memory as a share of physical memory
+    - Network_Usage: the most database connections in use at once, as a
+      share of the pool size
+    - Disk_Usage: how full the disk holding the app is
+
+    Rows older than `retention_days` are deleted as new ones are written.
+    Metrics are best effort: an interval that can't be written is logged
+    and dropped rather than retried.
+    """
+
+    def __init__(self, interval=60, retention_days=30):
+        self.interval = interval
+        self.retention_days = retention_days
+        self.enabled = True
+        self.app = None
+        self.performance_writer = None
+        self.disk_path = '/'
+        self._lock = threading.Lock()
+        self._thread = None
+        self._reset_locked()
+
+    def init_app(self, app, performance_writer=None):
+        self.app = app
+        self.enabled = app.config.get('API_METRICS_ENABLED', True)
+        self.interval = app.config.get('API_METRICS_INTERVAL', self.interval)
+        self.retention_days = app.config.get('API_METRICS_RETENTION_DAYS', self.retention_days)
+        self.disk_path = app.root_path
+        self.performance_writer = performance_writer
+        if not self.enabled:
+            return
+        db.on_query(self._observe_query)
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        atexit.register(self.flush)
+
+    def _reset_locked(self):
+        self._endpoints = {}
+        self._statements = {}
+        self._peak_in_use = 0
+        self._started = time.monotonic()
+        self._started_cpu = time.process_time()
+
+    # -- collection -----------------------------------------------------
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_ms = 0.0
+        g.metrics_db_queries = 0
+        if self._thread is None:
+            # started on first use, like the batch writer, so CLI commands
+            # and forked workers don't inherit a timer thread
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='api-metrics', daemon=True)
+                    self._thread.start()
+
+    def _end_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        ms = (time.perf_counter() - start) * 1000
+        rule = request.url_rule
+        name = f'{request.method} {rule.rule if rule is not None else "(no route)"}'
+        in_use = db.pool.stats()['in_use'] if db.pool is not None else 0
+        with self._lock:
+            timing = self._endpoints.get(name)
+            if timing is None:
+                timing = self._endpoints[name] = new_timing()
+            observe(timing, ms, error=response.status_code >= 500,
+                    db_ms=g.metrics_db_ms, db_queries=g.metrics_db_queries)
+            self._peak_in_use = max(self._peak_in_use, in_use)
+        return response
+
+    def _observe_query(self, statement, seconds, rows, failed):
+        ms = seconds * 1000
+        if has_request_context() and 'metrics_db_ms' in g:
+            g.metrics_db_ms += ms
+            g.metrics_db_queries += 1
+        name = ' '.join(statement.split())[:STATEMENT_NAME_LENGTH]
+        with self._lock:
+            timing = self._statements.get(name)
+            if timing is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    name = OTHER_STATEMENTS
+                timing = self._statements.setdefault(name, new_timing())
+            observe(timing, ms, error=failed, rows=rows)
+
+    # -- reporting ------------------------------------------------------
+
+    def current(self):
+        """This interval's numbers so far, without resetting them."""
+        with self._lock:
+            endpoints = {name: dict(t, histogram=list(t['histogram'])) for name, t in self._endpoints.items()}
+            statements = {name: dict(t, histogram=list(t['histogram'])) for name, t in self._statements.items()}
+            seconds = time.monotonic() - self._started
+        return {
+            'worker': self.worker(),
+            'interval_seconds': seconds,
+            'endpoints': sorted((summarize(n, t) for n, t in endpoints.items()),
+                                key=lambda e: e['calls'], reverse=True),
+            'statements': sorted((summarize(n, t) for n, t in statements.items()),
+                                 key=lambda e: e['avg_ms'] * e['calls'], reverse=True),
+        }
+
+    @staticmethod
+    def worker():
+        # read each time: gunicorn forks workers after the app is created
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def _process_sample(self, seconds, cpu_seconds, peak_in_use):
+        """(CPU, memory, pool, disk) percentages for one Performance row."""
+        cpu = cpu_seconds / max(seconds, 1e-9) / (os.cpu_count() or 1) * 100
+        rss, physical = rss_bytes(), physical_memory_bytes()
+        memory = rss / physical * 100 if rss and physical else None
+        pool = peak_in_use / db.pool.max_size * 100 if db.pool is not None else None
+        try:
+            usage = shutil.disk_usage(self.disk_path)
+            disk = usage.used / usage.total * 100
+        except OSError:
+            disk = None
+        return tuple(None if value is None else round(value) for value in (cpu, memory, pool, disk))
+
+    def flush(self):
+        """Write this interval's numbers and start a new one."""
+        if self.app is None or not self.enabled:
+            return
+        with self._lock:
+            endpoints, statements, peak_in_use = self._endpoints, self._statements, self._peak_in_use
+            seconds = time.monotonic() - self._started
+            cpu_seconds = time.process_time() - self._started_cpu
+            self._reset_locked()
+
+        now = datetime.now().replace(microsecond=0)
+        worker = self.worker()
+        rows = [
+            (now, round(seconds), worker, kind, name, t['calls'], t['errors'], t['total_ms'], t['max_ms'],
+             t['db_ms'] if kind == 'endpoint' else None,
+             t['db_queries'] if kind == 'endpoint' else None,
+             t['rows'] if kind == 'query' else None,
+             json.dumps(t['histogram']))
+            for kind, timings in (('endpoint', endpoints), ('query', statements))
+            for name, t in timings.items()
+        ]
+        try:
+            if rows:
+                with self.app.app_context():
+                    conn = db.get_db()
+                    cursor = conn.cursor()
+                    cursor.executemany('''
+                        INSERT INTO ApiMetric (Recorded_At, Interval_Seconds, Worker, Kind, Name, Calls, Errors,
+                                               Total_Ms, Max_Ms, Db_Ms, Db_Queries, Rows_Returned, Histogram)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ''', rows)
+                    # listing the kinds lets this use idx_apimetric_kind_time
+                    cursor.execute('''
+                        DELETE FROM ApiMetric
+                        WHERE Kind IN ('endpoint', 'query') AND Recorded_At < %s
+                    ''', (now - timedelta(days=self.retention_days),))
+                    conn.commit()
+                    cursor.close()
+            if self.performance_writer is not None:
+                self.performance_writer.add([(now,) + self._process_sample(seconds, cpu_seconds, peak_in_use)])
+        except Exception:
+            self.app.logger.exception('Could not write API metrics for the last %d seconds', seconds)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+api_metrics = ApiMetrics()
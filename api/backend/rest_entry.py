@@ -1,13 +1,42 @@
-from flask import Flask
+import click
+from flask import Flask, g, jsonify, make_response
 
-from backend.db_connection import db
+from backend.db_connection import db, PoolExhausted
+from backend.db_connection.advisor import advise, format_report
+from backend.cache import cache
+from backend.compression import compressor
+from backend.geo import import_geocodes, geocode_fresh_database
+from backend.json_provider import OrjsonProvider
+from backend.metrics import api_metrics
 from backend.coopconnect_routes.employer import employer
 from backend.coopconnect_routes.parent_routes import parent
 from backend.coopconnect_routes.student_route import student
-from backend.coopconnect_routes.system_admin_routes import system_admin
+from backend.coopconnect_routes.system_admin_routes import system_admin, rebuild_city_averages, performance_writer
 import os
 from dotenv import load_dotenv
 
+def load_database_config(config):
+    """
+    The MySQL and connection pool settings from the environment, shared
+    by this app and the async one in asgi_entry.py.
+    """
+    # # these are for the DB object to be able to connect to MySQL. 
+    # config['MYSQL_DATABASE_USER'] = 'root'
+    config['MYSQL_DATABASE_USER'] = os.getenv('DB_USER').strip()
+    config['MYSQL_DATABASE_PASSWORD'] = os.getenv('MYSQL_ROOT_PASSWORD').strip()
+    config['MYSQL_DATABASE_HOST'] = os.getenv('DB_HOST').strip()
+    config['MYSQL_DATABASE_PORT'] = int(os.getenv('DB_PORT').strip())
+    config['MYSQL_DATABASE_DB'] = 'coopConnect'  # Change this to your DB name
+
+    # connection pool settings. Every request borrows a connection
+    # from the pool instead of opening a new one.
+    config['MYSQL_POOL_MIN_SIZE'] = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+    config['MYSQL_POOL_MAX_SIZE'] = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    config['MYSQL_POOL_IDLE_TIMEOUT'] = float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))
+    config['MYSQL_POOL_CHECKOUT_TIMEOUT'] = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', '10'))
+    config['MYSQL_POOL_PING_INTERVAL'] = float(os.getenv('DB_POOL_PING_INTERVAL', '5'))
+
+
 def create_app():
     app = Flask(__name__)
 
@@ -24,19 +53,65 @@ def create_app():
     # app.config['SECRET_KEY'] = 'someCrazyS3cR3T!Key.!'
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 
-    # # these are for the DB object to be able to connect to MySQL. 
-    # app.config['MYSQL_DATABASE_USER'] = 'root'
-    app.config['MYSQL_DATABASE_USER'] = os.getenv('DB_USER').strip()
-    app.config['MYSQL_DATABASE_PASSWORD'] = os.getenv('MYSQL_ROOT_PASSWORD').strip()
-    app.config['MYSQL_DATABASE_HOST'] = os.getenv('DB_HOST').strip()
-    app.config['MYSQL_DATABASE_PORT'] = int(os.getenv('DB_PORT').strip())
-    app.config['MYSQL_DATABASE_DB'] = 'coopConnect'  # Change this to your DB name
+    load_database_config(app.config)
+
+    # encode every JSON response with orjson. Datetimes come out as ISO 8601;
+    # API_JSON_DATES=http brings back Flask's 'Mon, 01 Jan 2024 00:00:00 GMT'
+    app.json = OrjsonProvider(app)
+    app.json.http_dates = os.getenv('API_JSON_DATES', 'iso').lower() == 'http'
 
     # Initialize the database object with the settings above. 
     app.logger.info('current_app(): starting the database connection')
     db.init_app(app)
 
 
+    # in-process cache for the reference-data endpoints
+    app.config['API_CACHE_ENABLED'] = os.getenv('API_CACHE_ENABLED', 'true').lower() == 'true'
+    app.config['API_CACHE_MAX_ENTRIES'] = int(os.getenv('API_CACHE_MAX_ENTRIES', '256'))
+    cache.init_app(app)
+
+    # compress responses of at least API_COMPRESSION_MIN_SIZE bytes with
+    # brotli or gzip, whichever the client accepts
+    app.config['API_COMPRESSION_ENABLED'] = os.getenv('API_COMPRESSION_ENABLED', 'true').lower() == 'true'
+    app.config['API_COMPRESSION_MIN_SIZE'] = int(os.getenv('API_COMPRESSION_MIN_SIZE', '1024'))
+    app.config['API_COMPRESSION_LEVEL'] = int(os.getenv('API_COMPRESSION_LEVEL', '6'))
+    compressor.init_app(app)
+
+    # POST /performance/batch buffers samples and writes them in batches of
+    # up to this many rows, or once the oldest has waited this many seconds
+    app.config['PERFORMANCE_BATCH_MAX_ROWS'] = int(os.getenv('PERFORMANCE_BATCH_MAX_ROWS', '1000'))
+    app.config['PERFORMANCE_BATCH_MAX_DELAY'] = float(os.getenv('PERFORMANCE_BATCH_MAX_DELAY', '1.0'))
+    performance_writer.init_app(app, 'PERFORMANCE_BATCH')
+
+    # time every request and query; each interval the totals are written to
+    # ApiMetric and a resource usage sample to Performance
+    app.config['API_METRICS_ENABLED'] = os.getenv('API_METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['API_METRICS_INTERVAL'] = float(os.getenv('API_METRICS_INTERVAL', '60'))
+    app.config['API_METRICS_RETENTION_DAYS'] = int(os.getenv('API_METRICS_RETENTION_DAYS', '30'))
+    api_metrics.init_app(app, performance_writer)
+
+    # give a freshly bootstrapped database coordinates from the bundled city
+    # centers; `flask import-geocodes` refines them with real zip centroids
+    # and moves the facilities that were only placed near their zip
+    app.config['API_GEOCODE_ON_START'] = os.getenv('API_GEOCODE_ON_START', 'true').lower() == 'true'
+    if app.config['API_GEOCODE_ON_START']:
+        geocode_fresh_database(app)
+
+    # if every pooled connection is busy for longer than the checkout
+    # timeout, tell the client to back off instead of hanging
+    @app.errorhandler(PoolExhausted)
+    def handle_pool_exhausted(e):
+        return jsonify({'error': str(e)}), 503
+
+    # most routes catch Exception and answer 500 themselves, which would
+    # swallow the PoolExhausted above; db.get_db() notes it in g instead
+    @app.after_request
+    def pool_exhausted_response(response):
+        error = g.pop('pool_exhausted', None)
+        if error is not None and response.status_code == 500:
+            return make_response(handle_pool_exhausted(error))
+        return response
+
     # Register the routes from each Blueprint with the app object
     # and give a url prefix to each
     app.logger.info('current_app(): registering blueprints with Flask app object.')
@@ -44,6 +119,40 @@ def create_app():
     app.register_blueprint(employer)
     app.register_blueprint(parent)
     app.register_blueprint(student)
+
+    # `flask --app backend.rest_entry:create_app rebuild-city-stats`
+    # recomputes the per-city rent and wage averages from scratch
+    @app.cli.command('rebuild-city-stats')
+    def rebuild_city_stats_command():
+        rebuild_city_averages()
+        click.echo('City averages rebuilt')
+
+    # `flask --app backend.rest_entry:create_app import-geocodes --zips zcta.txt`
+    # fills in coordinates and spatial points for cities, zips and facilities
+    @app.cli.command('import-geocodes')
+    @click.option('--zips', type=click.Path(exists=True, dir_okay=False),
+                  help='CSV/TSV of zip centroids, e.g. the Census ZCTA gazetteer file')
+    @click.option('--facilities', type=click.Path(exists=True, dir_okay=False),
+                  help='CSV of type,id,latitude,longitude for housing/airport/hospital rows')
+    def import_geocodes_command(zips, facilities):
+        conn = db.get_db()
+        summary = import_geocodes(conn.cursor(), zips_path=zips, facilities_path=facilities)
+        conn.commit()
+        cache.invalidate('City', 'Location', 'Housing', 'Airport', 'Hospital')
+        for name, count in summary.items():
+            click.echo(f'{name}: {count}')
+
+    # `flask --app backend.rest_entry:create_app explain-routes` requests
+    # every GET route, EXPLAINs the queries it runs and exits with status 1
+    # if any of them scans a whole table to filter it
+    @app.cli.command('explain-routes', with_appcontext=False)
+    def explain_routes_command():
+        report = advise(app)
+        for line in format_report(report):
+            click.echo(line)
+        if any(row['flagged'] for entry in report for row in entry['plan']):
+            raise click.exceptions.Exit(1)
+
     # Don't forget to return the app object
     return app
 
@@ -0,0 +1,149 @@
+#------------------------------------------------------------
+# In-memory city feature matrix for "cities like mine"
+# recommendations. Scoring a query is one vectorized distance
+# computation over every city.
+#------------------------------------------------------------
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from backend.cache import cache
+
+# name -> description, in matrix column order
+CITY_FEATURES = {
+    'cost_of_living': 'average monthly cost of living',
+    'rent': 'average rent',
+    'wage': 'average wage',
+    'population': 'population (log scale)',
+    'hybrid_share': 'share of hybrid workers',
+    'safety': 'average zip code safety rating',
+    'student_pop': 'student population (log scale)',
+}
+
+CITY_FEATURES_QUERY = '''
+    SELECT C.City_ID, C.Name, C.Avg_Cost_Of_Living, C.Avg_Rent, C.Avg_Wage,
+           C.Population, C.Prop_Hybrid_Workers,
+           L.Safety, L.Student_Pop
+    FROM City C
+    LEFT JOIN (
+        SELECT City_ID, AVG(Safety_Rating) AS Safety, SUM(Student_pop) AS Student_Pop
+        FROM Location
+        GROUP BY City_ID
+    ) L ON L.City_ID = C.City_ID
+'''
+
+
+def _number(value):
+    return np.nan if value is None else float(value)
+
+
+class CitySimilarityIndex:
+    """
+    Z-score normalized feature matrix over every city.
+
+    The matrix is rebuilt on the first query after a write route
+    invalidates City or Location in the response cache, or after
+    `max_age` seconds so other worker processes' writes are picked up.
+    Missing values are filled with the column mean, i.e. 0 once
+    normalized, so they neither help nor hurt a match.
+    """
+
+    tables = ('City', 'Location')
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _load(self, cursor):
+        # read before the query, so a write that lands during it makes
+        # this snapshot stale rather than being missed
+        versions = cache.table_versions(self.tables)
+        cursor.execute(CITY_FEATURES_QUERY)
+        rows = cursor.fetchall()
+
+        ids = np.array([row['City_ID'] for row in rows], dtype=np.int64)
+        raw = np.array([
+            [_number(row['Avg_Cost_Of_Living']), _number(row['Avg_Rent']), _number(row['Avg_Wage']),
+             _number(row['Population']), _number(row['Prop_Hybrid_Workers']),
+             _number(row['Safety']), _number(row['Student_Pop'])]
+            for row in rows
+        ], dtype=np.float64).reshape(len(rows), len(CITY_FEATURES))
+
+        # sizes span orders of magnitude, so compare them on a log scale
+        features = raw.copy()
+        for col in (3, 6):
+            features[:, col] = np.log10(np.clip(features[:, col], 1, None))
+
+        with warnings.catch_warnings():
+            # a feature no city has a value for is all NaN; it becomes 0 below
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(features, axis=0)
+            std = np.nanstd(features, axis=0)
+        mean = np.nan_to_num(mean)
+        std = np.where(np.nan_to_num(std) > 0, std, 1.0)
+        matrix = np.nan_to_num((features - mean) / std)
+
+        return {
+            'ids': ids,
+            'row_of': {int(city_id): i for i, city_id in enumerate(ids)},
+            'names': [row['Name'] for row in rows],
+            'raw': raw,
+            'matrix': matrix,
+            'versions': versions,
+            'loaded_at': time.monotonic(),
+        }
+
+    def snapshot(self, cursor):
+        """The current matrix, rebuilt first if a write made it stale."""
+        snap = self._snapshot
+        if (snap is None or snap['versions'] != cache.table_versions(self.tables)
+                or time.monotonic() - snap['loaded_at'] > self.max_age):
+            with self._lock:
+                snap = self._snapshot
+                if (snap is None or snap['versions'] != cache.table_versions(self.tables)
+                        or time.monotonic() - snap['loaded_at'] > self.max_age):
+                    snap = self._snapshot = self._load(cursor)
+        return snap
+
+    def similar(self, cursor, city_id, k=5, weights=None):
+        """
+        The `k` cities closest to `city_id` by weighted Euclidean distance
+        over the normalized features, nearest first. `weights` maps
+        feature names to non-negative weights; unnamed features weigh 1.
+        Returns None if the city doesn't exist.
+        """
+        snap = self.snapshot(cursor)
+        row = snap['row_of'].get(city_id)
+        if row is None:
+            return None
+
+        w = np.array([(weights or {}).get(name, 1.0) for name in CITY_FEATURES])
+        diff = snap['matrix'] - snap['matrix'][row]
+        distances = np.sqrt((diff * diff) @ w)
+        distances[row] = np.inf
+
+        k = min(k, len(distances) - 1)
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+
+        return [
+            {
+                'city_id': int(snap['ids'][i]),
+                'name': snap['names'][i],
+                'distance': float(distances[i]),
+                'similarity': float(1 / (1 + distances[i])),
+                'features': {
+                    name: (None if np.isnan(value) else float(value))
+                    for name, value in zip(CITY_FEATURES, snap['raw'][i])
+                },
+            }
+            for i in nearest
+        ]
+
+
+city_similarity = CitySimilarityIndex()
@@ -6,11 +6,12 @@
 # that lives in src/__init__.py
 from backend.rest_entry import create_app
 
-# create the app object
+# create the app object. gunicorn serves this in production
+# (`gunicorn -c gunicorn.conf.py backend_app:app`)
 app = create_app()
 
 if __name__ == '__main__':
-    # we want to run in debug mode (for hot reloading) 
+    # for development: we want to run in debug mode (for hot reloading) 
     # this app will be bound to port 4000. 
     # Take a look at the docker-compose.yml to see 
     # what port this might be mapped to... 
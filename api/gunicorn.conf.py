@@ -0,0 +1,65 @@
+###
+# Production server settings: `gunicorn -c gunicorn.conf.py backend_app:app`
+#
+# gunicorn forks WEB_CONCURRENCY worker processes, each running
+# GUNICORN_THREADS request threads. Every worker imports the app
+# itself, so each one has its own DB connection pool, response
+# cache and metrics. `kill -HUP <master pid>` (or
+# `docker compose kill -s HUP api`) starts fresh workers with the
+# current code and settings, then lets the old ones finish their
+# requests before they exit, so no request is dropped.
+###
+import multiprocessing
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# DB_POOL_MAX_SIZE and friends live in api/.env with the app's other settings
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+bind = f"0.0.0.0:{os.getenv('API_PORT', '4000')}"
+
+# database connections all workers together may hold at once. MySQL allows
+# 151 by default; the rest is left for the async app and admin sessions
+db_connection_budget = int(os.getenv('DB_CONNECTION_BUDGET') or 100)
+db_pool_max_size = int(os.getenv('DB_POOL_MAX_SIZE') or 10)
+
+# the usual (2 x cores) + 1 processes, each with a few threads so requests
+# waiting on MySQL don't hold up a whole process, but no more than the
+# connection budget has full pools for
+workers = int(os.getenv('WEB_CONCURRENCY') or max(
+    1, min(multiprocessing.cpu_count() * 2 + 1, db_connection_budget // db_pool_max_size)))
+threads = int(os.getenv('GUNICORN_THREADS') or 4)
+worker_class = 'gthread'
+
+# how long a request may run, and how long old workers get to finish
+# theirs on a reload or shutdown
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# replace each worker after this many requests (0 = never), staggered so
+# they don't all restart at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = max_requests // 10
+
+# the app is loaded in each worker rather than in the master, so a reload
+# picks up code changes and no worker inherits another's pool
+preload_app = False
+
+# Docker's /tmp can be on a slow overlay filesystem; the worker heartbeat
+# file is touched constantly
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # only matters if preload_app is turned on and the master loaded the
+    # app: connections it opened would otherwise be shared by every worker
+    db_connection = sys.modules.get('backend.db_connection')
+    if db_connection is not None and db_connection.db.pool is not None:
+        db_connection.db.pool.after_fork()
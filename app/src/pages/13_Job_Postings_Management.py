@@ -93,19 +93,20 @@ if 'user_id' in st.session_state:
                         st.warning("Please provide a valid Job Posting ID and at least one field to update.")
 
             # Section for deleting job postings
-            st.header("Delete Job Posting")
-            delete_post_id = st.selectbox("Select Job Posting ID to Delete", options=[posting['Post_ID'] for posting in job_postings])
+            st.header("Delete Job Postings")
+            delete_post_ids = st.multiselect("Select Job Posting IDs to Delete", options=[posting['Post_ID'] for posting in job_postings])
 
-            if st.button("Delete Job Posting"):
-                if delete_post_id:
+            if st.button("Delete Job Postings"):
+                if delete_post_ids:
                     try:
-                        response = requests.delete(f'http://api:4000/job_postings/{delete_post_id}')
+                        # one request for the whole selection
+                        response = requests.delete('http://api:4000/job_postings/bulk', json={"post_ids": delete_post_ids})
                         response.raise_for_status()
-                        st.success("Job posting deleted successfully!")
+                        st.success(f"Deleted {response.json()['deleted']} job posting(s) successfully!")
                     except requests.exceptions.HTTPError as e:
-                        st.error(f"Error deleting job posting: {e}")
+                        st.error(f"Error deleting job postings: {e}")
                 else:
-                    st.warning("Please select a valid Job Posting ID.")
+                    st.warning("Please select at least one Job Posting ID.")
 
     except requests.exceptions.HTTPError:
         st.write("You have no postings for this ID.")
@@ -93,6 +93,48 @@ def display_cost_analysis():
             st.write("Debug info:")
             st.write(f"Target URL: {api_url}")
 
+def display_similar_cities():
+    st.title("Cities Like Mine")
+
+    try:
+        cities = {city['name']: city['city_id'] for city in requests.get("http://api:4000/city").json()}
+    except Exception as e:
+        st.error(f"Error fetching cities: {str(e)}")
+        return
+
+    city_name = st.selectbox("Find cities similar to:", list(cities))
+    st.write("How much each factor matters (0 = ignore):")
+    factors = {
+        'cost_of_living': "Cost of living",
+        'rent': "Rent",
+        'wage': "Wage",
+        'population': "Population",
+        'hybrid_share': "Hybrid workers",
+        'safety': "Safety",
+        'student_pop': "Student population",
+    }
+    columns = st.columns(len(factors))
+    weights = {}
+    for column, (feature, label) in zip(columns, factors.items()):
+        with column:
+            weights[feature] = st.slider(label, 0.0, 3.0, 1.0, 0.5)
+
+    if st.button("Find Similar Cities"):
+        response = requests.get(
+            f"http://api:4000/cities/{cities[city_name]}/similar",
+            params={'k': 5, 'weights': ','.join(f"{f}:{w}" for f, w in weights.items())}
+        )
+        if response.status_code == 200:
+            for match in response.json()['similar']:
+                features = match['features']
+                st.write(f"**{match['name']}** ({match['similarity']*100:.0f}% match) - "
+                         f"Cost of Living: ${features['cost_of_living'] or 0:,.0f}, "
+                         f"Rent: ${features['rent'] or 0:,.0f}, Wage: ${features['wage'] or 0:,.0f}")
+        else:
+            st.error(response.json().get('error', 'Could not find similar cities'))
+
 if __name__ == "__main__":
     setup_sidebar()
-    display_cost_analysis()
\ No newline at end of file
+    display_cost_analysis()
+    st.divider()
+    display_similar_cities()
\ No newline at end of file
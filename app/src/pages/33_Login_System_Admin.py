@@ -29,7 +29,7 @@ with st.sidebar:
 st.title('System Performance Dashboard')
 
 # Create tabs for different metrics
-tab1, tab2 = st.tabs(["Performance Metrics", "User Activity"])
+tab1, tab2, tab3 = st.tabs(["Performance Metrics", "User Activity", "API Requests"])
 
 with tab1:
     st.header("System Performance Over Time")
@@ -108,6 +108,40 @@ with tab1:
             st.error("Could not fetch available dates")
     except Exception as e:
         st.error(f"Error occurred: {str(e)}")
+
+    # Trends over longer periods come from the per-minute/hour/day rollups,
+    # so the API returns a few hundred points whatever the range
+    st.header("Performance Trends")
+    today = datetime.now().date()
+    col_from, col_to = st.columns(2)
+    with col_from:
+        range_from = st.date_input("From", value=today - timedelta(days=90))
+    with col_to:
+        range_to = st.date_input("To", value=today)
+
+    try:
+        trend_response = requests.get('http://api:4000/performance', params={
+            'from': range_from.isoformat(),
+            'to': range_to.isoformat(),
+            'points': 300,
+        })
+        if trend_response.status_code == 200:
+            trend = trend_response.json()
+            if trend['points']:
+                df_trend = pd.DataFrame(trend['points'])
+                df_trend['Date'] = pd.to_datetime(df_trend['Date'])
+                fig = px.line(df_trend,
+                              x='Date',
+                              y=['CPU_Usage', 'Memory_Usage', 'Network_Usage', 'Disk_Usage'],
+                              title=f"Average usage per {trend['bucket'] if trend['bucket'] == 'raw' else str(trend['bucket_seconds'] // 60) + ' min'}",
+                              labels={'value': 'Usage %', 'variable': 'Metric'})
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("No performance data in this range")
+        else:
+            st.error(trend_response.json().get('error', 'Could not fetch performance trends'))
+    except Exception as e:
+        st.error(f"Error occurred: {str(e)}")
             
    
 with tab2:
@@ -152,6 +186,46 @@ with tab2:
                                     (datetime.now() - timedelta(days=30))].shape[0]
             st.metric("New Users (Last 30 Days)", recent_users)
 
-    
-    
-            
\ No newline at end of file
+
+with tab3:
+    # timings the API records about itself, merged across its workers
+    st.header("API Request Latency")
+    hours = st.selectbox("Period", [1, 6, 24, 24 * 7], index=2,
+                         format_func=lambda h: f"Last {h} hours" if h < 48 else f"Last {h // 24} days")
+    since = (datetime.now() - timedelta(hours=hours)).isoformat(timespec='seconds')
+
+    try:
+        endpoints_response = requests.get('http://api:4000/api-metrics',
+                                          params={'kind': 'endpoint', 'from': since})
+        if endpoints_response.status_code == 200:
+            endpoints = endpoints_response.json()['endpoints']
+            if endpoints:
+                df_endpoints = pd.DataFrame(endpoints)
+                fig = px.bar(df_endpoints.head(15).sort_values('p95_ms'),
+                             x='p95_ms', y='name', orientation='h',
+                             title='Slowest endpoints (p95)',
+                             labels={'p95_ms': 'p95 latency (ms)', 'name': 'Endpoint'})
+                st.plotly_chart(fig, use_container_width=True)
+                st.dataframe(df_endpoints[['name', 'calls', 'errors', 'avg_ms', 'p50_ms', 'p95_ms', 'p99_ms',
+                                           'avg_db_ms', 'avg_db_queries']].round(1),
+                             use_container_width=True, hide_index=True)
+            else:
+                st.info("No requests recorded in this period")
+        else:
+            st.error(endpoints_response.json().get('error', 'Could not fetch endpoint timings'))
+
+        st.subheader("Queries by total database time")
+        queries_response = requests.get('http://api:4000/api-metrics',
+                                        params={'kind': 'query', 'from': since, 'limit': 20})
+        if queries_response.status_code == 200:
+            queries = queries_response.json()['queries']
+            if queries:
+                df_queries = pd.DataFrame(queries)
+                st.dataframe(df_queries[['name', 'calls', 'errors', 'avg_ms', 'p95_ms', 'max_ms', 'rows']].round(2),
+                             use_container_width=True, hide_index=True)
+            else:
+                st.info("No queries recorded in this period")
+        else:
+            st.error(queries_response.json().get('error', 'Could not fetch query timings'))
+    except Exception as e:
+        st.error(f"Error occurred: {str(e)}")
@@ -19,144 +19,105 @@ st.write(
     and housing information across different zipcodes."""
 )
 
-# Add this dictionary at the top of the file, after imports
-CITY_COORDINATES = {
-    'New York': {'lat': 40.7128, 'lon': -74.0060},
-    'Chicago': {'lat': 41.8781, 'lon': -87.6298},
-    'Los Angeles': {'lat': 34.0522, 'lon': -118.2437},
-    'Boston': {'lat': 42.3601, 'lon': -71.0589},
-    'San Francisco': {'lat': 37.7749, 'lon': -122.4194},
-    'Seattle': {'lat': 47.6062, 'lon': -122.3321},
-    'Miami': {'lat': 25.7617, 'lon': -80.1918},
-    'Detroit': {'lat': 42.3314, 'lon': -83.0458},
-    'Houston': {'lat': 29.7604, 'lon': -95.3698},
-    'Atlanta': {'lat': 33.7490, 'lon': -84.3880}
-}
-
-# Function to fetch cities
+# Function to fetch cities as a {name: city_id} mapping
 def fetch_cities():
     try:
         response = requests.get('http://api:4000/city')
         if response.status_code == 200:
-            return [city['name'] for city in response.json()]
-        return []
+            return {city['name']: city['city_id'] for city in response.json()}
+        return {}
     except Exception as e:
         st.error(f"Error fetching cities: {str(e)}")
-        return []
+        return {}
 
-# Function to fetch location data for a specific city
+# Function to fetch location data for a specific city. The API returns only
+# this city's housing, airports and hospitals in a single response, with the
+# coordinates stored in the database (see `flask import-geocodes`).
 @st.cache_data
-def get_location_data(selected_city):
+def get_location_data(selected_city, city_id):
+    empty = (pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None)
     try:
-        # Get city data
-        cities_response = requests.get('http://api:4000/city')
-        cities_data = cities_response.json()
-        
-        # Get housing data
-        housing_response = requests.get('http://api:4000/housing')
-        housing_data = housing_response.json()
-        
-        # Get airport data
-        airports_response = requests.get('http://api:4000/airports')
-        airports_data = airports_response.json()
-        
-        # Get hospital data
-        hospitals_response = requests.get('http://api:4000/hospitals')
-        hospitals_data = hospitals_response.json()
-        
-        # Find the city_id for the selected city
-        city_id = None
-        city_data = None
-        for city in cities_data:
-            if city['name'] == selected_city:
-                city_id = city['city_id']
-                city_data = city
-                break
-        
-        if not city_id:
-            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-        
+        response = requests.get(f'http://api:4000/cities/{city_id}/map')
+        if response.status_code != 200:
+            return empty
+        map_data = response.json()
+
+        city = map_data['city']
+        center = None
+        if city.get('latitude') is not None:
+            center = {'lat': city['latitude'], 'lon': city['longitude']}
+
         # Process housing data
         locations_data = []
-        city_housing = [h for h in housing_data if h['City_ID'] == city_id]
-        
-        for house in city_housing:
-            base_coords = CITY_COORDINATES.get(selected_city, {'lat': 0, 'lon': 0})
+        for house in map_data['housing']:
             locations_data.append({
                 'city': selected_city,
-                'zipcode': house['zipID'],
-                'address': house['Address'],
-                'rent': house['Rent'],
-                'sqft': house['Sq_Ft'],
-                'lat': base_coords['lat'] + (hash(str(house['zipID'])) % 10) / 1000,
-                'lon': base_coords['lon'] + (hash(str(house['Address'])) % 10) / 1000
+                'zipcode': house['zipcode'],
+                'address': house['address'],
+                'rent': house['rent'],
+                'sqft': house['sqft'],
+                'lat': house['latitude'],
+                'lon': house['longitude']
             })
-        
+
         # Process airport data
         airports_data_processed = []
-        city_airports = [a for a in airports_data if a['City_ID'] == city_id]
-        base_coords = CITY_COORDINATES.get(selected_city, {'lat': 0, 'lon': 0})
-        
-        for airport in city_airports:
+        for airport in map_data['airports']:
             airports_data_processed.append({
-                'name': airport['Name'],
-                'zip': airport['Zip'],
-                'lat': base_coords['lat'] + abs((hash(str(airport['Zip'])) % 5) / 1000),
-                'lon': base_coords['lon'] + ((hash(str(airport['Name'])) % 7) - 3) / 1000
+                'name': airport['name'],
+                'zip': airport['zip'],
+                'lat': airport['latitude'],
+                'lon': airport['longitude']
             })
-        
+
         # Process hospital data
         hospitals_data_processed = []
-        city_hospitals = [h for h in hospitals_data if h['City_ID'] == city_id]
-        
-        for hospital in city_hospitals:
+        for hospital in map_data['hospitals']:
             hospitals_data_processed.append({
-                'name': hospital['Name'],
-                'zip': hospital.get('Zip', ''),
-                'lat': base_coords['lat'] + abs((hash(str(hospital['Name'])) % 6) / 1000),
-                'lon': base_coords['lon'] + ((hash(str(hospital.get('Name', ''))) % 5) - 2) / 1000
+                'name': hospital['name'],
+                'zip': hospital.get('zip', ''),
+                'lat': hospital['latitude'],
+                'lon': hospital['longitude']
             })
-        
+
         # Create DataFrames
         df_housing = pd.DataFrame(locations_data)
         df_airports = pd.DataFrame(airports_data_processed)
         df_hospitals = pd.DataFrame(hospitals_data_processed)
-        
+
         # Add tooltips for airports and hospitals
         if not df_airports.empty:
             df_airports['tooltip'] = df_airports['name'].astype(str) + ' (Airport)'
         if not df_hospitals.empty:
             df_hospitals['tooltip'] = df_hospitals['name'].astype(str) + ' (Hospital)'
-        
-        # Debug logging
-        print("Airports Response:", airports_response.text)
-        print("Hospitals Response:", hospitals_response.text)
-        
-        # Get airport data
-        airports_response = requests.get('http://api:4000/airports')
-        airports_data = airports_response.json()
-        
-        return df_housing, df_airports, df_hospitals
-                
+
+        return df_housing, df_airports, df_hospitals, center
+
     except Exception as e:
         st.error(f"Error fetching data: {str(e)}")
         logger.error(f"Data fetch error: {str(e)}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return empty
+
+# Rows that haven't been geocoded yet still show up in the tables below,
+# just not on the map
+def mappable(df):
+    return df.dropna(subset=['lat', 'lon']) if not df.empty else df
 
 # Get list of cities and create selector
 cities = fetch_cities()
-selected_city = st.sidebar.selectbox("Select a City", cities)
+selected_city = st.sidebar.selectbox("Select a City", list(cities))
 
 # Get the data for selected city
 try:
-    df_housing, df_airports, df_hospitals = get_location_data(selected_city)
-    
-    if not df_housing.empty:
+    df_housing, df_airports, df_hospitals, city_center = get_location_data(selected_city, cities.get(selected_city))
+    map_housing = mappable(df_housing)
+
+    if not map_housing.empty:
         # Create layers for the map with adjusted parameters
         ALL_LAYERS = {
             "Housing Locations": pdk.Layer(
                 "ScatterplotLayer",
-                data=df_housing,
+                data=map_housing,
                 get_position=["lon", "lat"],
                 get_color=[200, 30, 0, 160],
                 get_radius=50,
@@ -166,7 +127,7 @@ try:
             ),
             "Rent Heatmap": pdk.Layer(
                 "HexagonLayer",
-                data=df_housing,
+                data=map_housing,
                 get_position=["lon", "lat"],
                 radius=100,
                 elevation_scale=2,
@@ -179,7 +140,7 @@ try:
             ),
             "Airports": pdk.Layer(
                 "ScatterplotLayer",
-                data=df_airports,
+                data=mappable(df_airports),
                 get_position=["lon", "lat"],
                 get_color=[0, 255, 0, 200],
                 get_radius=100,
@@ -189,7 +150,7 @@ try:
             ),
             "Hospitals": pdk.Layer(
                 "ScatterplotLayer",
-                data=df_hospitals,
+                data=mappable(df_hospitals),
                 get_position=["lon", "lat"],
                 get_color=[255, 0, 0, 200],
                 get_radius=100,
@@ -299,8 +260,8 @@ try:
             pdk.Deck(
                 map_style="mapbox://styles/mapbox/light-v9",
                 initial_view_state={
-                    "latitude": df_housing['lat'].mean(),
-                    "longitude": df_housing['lon'].mean(),
+                    "latitude": city_center['lat'] if city_center else map_housing['lat'].mean(),
+                    "longitude": city_center['lon'] if city_center else map_housing['lon'].mean(),
                     "zoom": 12,
                     "pitch": 50,
                 },
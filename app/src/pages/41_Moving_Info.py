@@ -38,4 +38,35 @@ try:
     else:
         st.error(f"Failed to retrieve airport data: {airport_response.status_code}")
 except Exception as e:
-    st.error(f"An error occurred while fetching airport information: {e}")
\ No newline at end of file
+    st.error(f"An error occurred while fetching airport information: {e}")
+
+# Section: What's close to a listing
+st.subheader('Nearby Hospitals and Airports')
+try:
+    if housing_response.status_code == 200 and housing_data:
+        listings = {row['Address']: row['Housing_ID'] for row in housing_data}
+        col1, col2, col3 = st.columns([3, 2, 1])
+        with col1:
+            address = st.selectbox("Housing listing", list(listings))
+        with col2:
+            facility = st.selectbox("Show", ["Hospitals and airports", "Hospitals", "Airports"])
+        with col3:
+            radius_km = st.number_input("Within (km)", min_value=1, max_value=500, value=25)
+
+        facility_type = {"Hospitals": "hospital", "Airports": "airport"}.get(facility, "hospital,airport")
+        nearby_response = requests.get(
+            f"http://api:4000/housing/{listings[address]}/nearby",
+            params={'type': facility_type, 'radius_km': radius_km}
+        )
+        if nearby_response.status_code == 200:
+            nearby = nearby_response.json()['nearby']
+            if nearby:
+                nearby_df = pd.DataFrame(nearby)[['type', 'name', 'zip', 'distance_km']]
+                nearby_df['distance_km'] = nearby_df['distance_km'].round(1)
+                st.dataframe(nearby_df, use_container_width=True, hide_index=True)
+            else:
+                st.write(f"Nothing found within {radius_km} km.")
+        else:
+            st.write(nearby_response.json().get('error', 'Nearby facilities unavailable.'))
+except Exception as e:
+    st.error(f"An error occurred while fetching nearby facilities: {e}")
@@ -23,8 +23,14 @@ Create table if not exists City
     Name varchar(25),
     Population int,
     Prop_Hybrid_Workers decimal(5,4),
+    Latitude double,
+    Longitude double,
     check (Prop_Hybrid_Workers >= 0 and Prop_Hybrid_Workers <=1),
-    PRIMARY KEY(City_ID)
+    PRIMARY KEY(City_ID),
+    # most city routes look the city up by name
+    Index idx_city_name (Name),
+    # lets the cost of living comparison range scan around a target cost
+    Index idx_city_col (Avg_Cost_Of_Living)
 );
 
 
@@ -66,7 +72,17 @@ CREATE table if not exists Location
     City_ID int not null,
     Student_pop int,
     Safety_Rating int,
+    # coordinates are filled in by the API on a fresh database and by
+    # `flask import-geocodes`. Geo mirrors
+    # (Longitude, Latitude) so bounding-box queries can use the spatial
+    # index; it is invisible so SELECT * doesn't return raw geometry
+    Latitude double,
+    Longitude double,
+    Geo point not null srid 0 default (point(0, 0)) invisible,
     PRIMARY KEY(Zip),
+    SPATIAL INDEX sp_loc_geo (Geo),
+    # covers the per-city zip listings (safety rating, student population)
+    Index idx_loc_city (City_ID, Safety_Rating, Student_pop),
     constraint loc_city
         FOREIGN KEY (City_ID) references City (City_ID)
 
@@ -80,8 +96,17 @@ Create table if not exists Housing
     Address varchar(75) not null,
     Rent int,
     Sq_Ft int not null,
+    Latitude double,
+    Longitude double,
+    Geo point not null srid 0 default (point(0, 0)) invisible,
+    # set while the coordinates are only their zip's, so a later
+    # `flask import-geocodes` moves the listing with its zip
+    Approximate boolean not null default true invisible,
     PRIMARY KEY (Housing_ID),
+    SPATIAL INDEX sp_housing_geo (Geo),
     Unique Index uq_idx_addy (Address),
+    # covers a city's listings and the per-city rent totals
+    Index idx_housing_city (City_ID, Rent),
     CONSTRAINT fk_03
         foreign key (City_ID) references City (City_ID),
     CONSTRAINT fk_04
@@ -96,6 +121,7 @@ CREATE table if not exists Sublet
     Start_Date datetime,
     End_Date datetime,
     PRIMARY KEY(Sublet_ID, Subleter_ID),
+    Index idx_sublet_subleter (Subleter_ID),
     CONSTRAINT fk_05
         foreign key (Housing_ID) references Housing (Housing_ID)
             ON UPDATE CASCADE
@@ -112,6 +138,8 @@ CREATE table if not exists Job
     Employment_Status varchar(30),
     start_date datetime,
     PRIMARY KEY(Job_ID),
+    # covers the per-user wage sums the Avg_Wage triggers run
+    Index idx_job_user (User_ID, Wage),
     CONSTRAINT fk_08
         foreign key (User_ID) references User (UserID)
 );
@@ -124,7 +152,8 @@ Create table if not exists Performance
     Median_Speed int,
     Top_Speed int,
     Low_Speed int,
-    PRIMARY KEY(PID)
+    PRIMARY KEY(PID),
+    Index idx_perf_date (`Date`)
 );
 
 CREATE table if not exists Airport
@@ -133,7 +162,13 @@ CREATE table if not exists Airport
     Name varchar(50) not null,
     City_ID int not null,
     Zip int not null,
+    Latitude double,
+    Longitude double,
+    Geo point not null srid 0 default (point(0, 0)) invisible,
+    Approximate boolean not null default true invisible,
     PRIMARY KEY(Air_ID),
+    SPATIAL INDEX sp_air_geo (Geo),
+    Index idx_air_city (City_ID),
     constraint fk_air_city
         foreign key (City_ID) references City (City_ID),
     constraint fk_air_zip
@@ -145,6 +180,12 @@ Create table if not exists Hospital (
     Name varchar(50) not null,
     City_ID int not null,
     Zip int not null,
+    Latitude double,
+    Longitude double,
+    Geo point not null srid 0 default (point(0, 0)) invisible,
+    Approximate boolean not null default true invisible,
+    SPATIAL INDEX sp_hosp_geo (Geo),
+    Index idx_hosp_city (City_ID),
     CONSTRAINT fk_07
         foreign key  (City_ID) references City (City_ID),
     CONSTRAINT fk_11
@@ -160,29 +201,341 @@ Create table if not exists JobPosting (
     Bio Text not null,
 
     Primary Key (Post_ID),
+    # job search filters and sorts on compensation, by zip or city
+    Index idx_jp_comp (Compensation, Post_ID),
+    Index idx_jp_location (Location_ID, Compensation),
+    # covers an employer's list of their own postings
+    Index idx_jp_user (User_ID, Compensation, Location_ID),
+    # ranked keyword search; the title-only index lets title hits score higher
+    Fulltext Index ft_jp_title (Title),
+    Fulltext Index ft_jp_title_bio (Title, Bio),
     Constraint jp_loc
         foreign key (Location_ID) references Location (Zip),
     Constraint jp_user
         foreign key (User_ID) references User (UserID)
 );
 
+# one row per student per job posting they applied to. The primary key
+# leads with Student_ID so "jobs I haven't applied to" is an index probe
+# per posting instead of a scan of every application
+Create table if not exists Application (
+    Student_ID int not null,
+    Post_ID int not null,
+    Date_Applied datetime not null default current_timestamp,
+
+    Primary Key (Student_ID, Post_ID),
+    Constraint app_student
+        foreign key (Student_ID) references User (UserID)
+            on update cascade
+            on delete cascade,
+    Constraint app_post
+        foreign key (Post_ID) references JobPosting (Post_ID)
+            on update cascade
+            on delete cascade
+);
+
+# running rent totals per city that the Housing triggers keep current;
+# City.Avg_Rent is Rent_Sum / Rent_Count
+Create table if not exists CityRentStats (
+    City_ID int not null,
+    Rent_Sum bigint not null default 0,
+    Rent_Count int not null default 0,
+
+    Primary Key (City_ID),
+    Constraint crs_city
+        foreign key (City_ID) references City (City_ID)
+            on update cascade
+            on delete cascade
+);
+
+# running wage totals per city that the Job triggers keep current;
+# City.Avg_Wage is Wage_Sum / Wage_Count
+Create table if not exists CityWageStats (
+    City_ID int not null,
+    Wage_Sum bigint not null default 0,
+    Wage_Count int not null default 0,
+
+    Primary Key (City_ID),
+    Constraint cws_city
+        foreign key (City_ID) references City (City_ID)
+            on update cascade
+            on delete cascade
+);
+
+# running totals over every city, kept current by the City triggers, so the
+# national averages are one primary key lookup instead of AVG() over City.
+# There is only ever the one row (Stats_ID = 1); sums and counts skip NULLs
+# like AVG() does
+Create table if not exists NationalCityStats (
+    Stats_ID tinyint not null default 1,
+    Cost_Sum double not null default 0,
+    Cost_Count int not null default 0,
+    Rent_Sum double not null default 0,
+    Rent_Count int not null default 0,
+    Wage_Sum double not null default 0,
+    Wage_Count int not null default 0,
+
+    check (Stats_ID = 1),
+    Primary Key (Stats_ID)
+);
+
+INSERT INTO NationalCityStats (Stats_ID) VALUES (1);
+
+# Performance samples rolled up per minute, hour and day so long-range charts
+# read a few hundred rows instead of every sample. Each metric keeps a sum and
+# count (so averages combine exactly), min, max and p50. Minute p50s are exact;
+# hour and day p50s are the median of the finer buckets' p50s.
+# refresh_performance_rollups() keeps it current (see the Performance routes)
+Create table if not exists PerformanceRollup (
+    Resolution enum('minute', 'hour', 'day') not null,
+    Bucket datetime not null,
+    Samples int not null,
+    Avg_Speed_Sum double, Avg_Speed_Count int, Avg_Speed_Min int, Avg_Speed_Max int, Avg_Speed_P50 double,
+    Median_Speed_Sum double, Median_Speed_Count int, Median_Speed_Min int, Median_Speed_Max int, Median_Speed_P50 double,
+    Top_Speed_Sum double, Top_Speed_Count int, Top_Speed_Min int, Top_Speed_Max int, Top_Speed_P50 double,
+    Low_Speed_Sum double, Low_Speed_Count int, Low_Speed_Min int, Low_Speed_Max int, Low_Speed_P50 double,
+
+    Primary Key (Resolution, Bucket)
+);
+
+# Request and query timings the API records about itself (backend/metrics),
+# one row per worker process, interval and endpoint or SQL statement. Histogram
+# is the JSON array of call counts per latency bucket, so percentiles can be
+# worked out over any range by adding histograms up
+Create table if not exists ApiMetric (
+    Metric_ID bigint auto_increment not null,
+    Recorded_At datetime not null,
+    Interval_Seconds int not null,
+    Worker varchar(100) not null,
+    Kind enum('endpoint', 'query') not null,
+    Name varchar(255) not null,
+    Calls int not null,
+    Errors int not null default 0,
+    Total_Ms double not null,
+    Max_Ms double not null,
+    Db_Ms double,
+    Db_Queries int,
+    Rows_Returned bigint,
+    Histogram json not null,
+
+    Primary Key (Metric_ID),
+    Index idx_apimetric_kind_time (Kind, Recorded_At)
+);
+
+# A counter per table, bumped by the API once per write it makes to the table
+# (cache.invalidate() in backend/cache). The API builds its response ETags
+# from these, so any worker can tell whether a response is still current with
+# one primary key lookup, whichever process made the change
+Create table if not exists TableVersion (
+    Table_Name varchar(64) not null,
+    Version bigint unsigned not null default 0,
+
+    Primary Key (Table_Name)
+);
+
+INSERT INTO TableVersion (Table_Name) VALUES
+('Category'),
+('City'),
+('User'),
+('Location'),
+('Housing'),
+('Airport'),
+('Hospital'),
+('JobPosting');
+
 #We set the delimiter to be a double // here since when we looked up how to do trigger statements
 #we found that they each contain a begin and end statement, but inside the trigger statement there are
 #semicolons, so if the delimiter was still a semicolon mysql would try end the trigger definition early
 #we change the delimiter back to semicolons after we define all our triggers
 DELIMITER //
+#Copies one city's running rent totals into City.Avg_Rent. A city with no
+#rents keeps the average it had (its seeded one, or its last listings')
+DROP PROCEDURE IF EXISTS refresh_city_avg_rent;
+CREATE PROCEDURE refresh_city_avg_rent(IN city INT)
+BEGIN
+    UPDATE City c
+    LEFT JOIN CityRentStats s ON s.City_ID = c.City_ID
+    SET c.Avg_Rent = IF(s.Rent_Count > 0, s.Rent_Sum / s.Rent_Count, c.Avg_Rent)
+    WHERE c.City_ID = city;
+END;//
+
+#Rebuilds CityRentStats and every city's Avg_Rent from the Housing table.
+#Use it after loading data with the triggers bypassed or to repair drift.
+DROP PROCEDURE IF EXISTS rebuild_city_avg_rent;
+CREATE PROCEDURE rebuild_city_avg_rent()
+BEGIN
+    DELETE FROM CityRentStats;
+    INSERT INTO CityRentStats (City_ID, Rent_Sum, Rent_Count)
+    SELECT City_ID, SUM(Rent), COUNT(Rent)
+    FROM Housing
+    GROUP BY City_ID;
+
+    #cities with no housing have no stats row and keep the average they had
+    UPDATE City c
+    LEFT JOIN CityRentStats s ON s.City_ID = c.City_ID
+    SET c.Avg_Rent = IF(s.Rent_Count > 0, s.Rent_Sum / s.Rent_Count, c.Avg_Rent);
+END;//
+
+#Copies one city's running wage totals into City.Avg_Wage. A city with no
+#wages keeps the average it had (its seeded one, or its last jobs')
+DROP PROCEDURE IF EXISTS refresh_city_avg_wage;
+CREATE PROCEDURE refresh_city_avg_wage(IN city INT)
+BEGIN
+    UPDATE City c
+    LEFT JOIN CityWageStats s ON s.City_ID = c.City_ID
+    SET c.Avg_Wage = IF(s.Wage_Count > 0, s.Wage_Sum / s.Wage_Count, c.Avg_Wage)
+    WHERE c.City_ID = city;
+END;//
+
+#Rebuilds CityWageStats and every city's Avg_Wage from the Job table
+DROP PROCEDURE IF EXISTS rebuild_city_avg_wage;
+CREATE PROCEDURE rebuild_city_avg_wage()
+BEGIN
+    DELETE FROM CityWageStats;
+    INSERT INTO CityWageStats (City_ID, Wage_Sum, Wage_Count)
+    SELECT u.Current_City_ID, SUM(j.Wage), COUNT(*)
+    FROM Job j
+    JOIN User u ON j.User_ID = u.UserID
+    GROUP BY u.Current_City_ID;
+
+    #cities with no jobs have no stats row and keep the average they had
+    UPDATE City c
+    LEFT JOIN CityWageStats s ON s.City_ID = c.City_ID
+    SET c.Avg_Wage = IF(s.Wage_Count > 0, s.Wage_Sum / s.Wage_Count, c.Avg_Wage);
+END;//
+
+#Rebuilds the national running totals from the City table
+DROP PROCEDURE IF EXISTS rebuild_national_city_stats;
+CREATE PROCEDURE rebuild_national_city_stats()
+BEGIN
+    REPLACE INTO NationalCityStats (Stats_ID, Cost_Sum, Cost_Count, Rent_Sum, Rent_Count, Wage_Sum, Wage_Count)
+    SELECT 1,
+           COALESCE(SUM(Avg_Cost_Of_Living), 0), COUNT(Avg_Cost_Of_Living),
+           COALESCE(SUM(Avg_Rent), 0), COUNT(Avg_Rent),
+           COALESCE(SUM(Avg_Wage), 0), COUNT(Avg_Wage)
+    FROM City;
+END;//
+
+#Recomputes one rollup level (hour or day) for buckets in [from_time, to_time)
+#from the level below it. Sums, counts, min and max combine exactly; p50 is
+#the median of the finer p50s. NULLs sort last so ROW_NUMBER counts values only
+DROP PROCEDURE IF EXISTS rollup_performance_level;
+CREATE PROCEDURE rollup_performance_level(IN from_res VARCHAR(10), IN to_res VARCHAR(10),
+                                          IN fmt VARCHAR(30), IN from_time DATETIME, IN to_time DATETIME)
+BEGIN
+    DELETE FROM PerformanceRollup
+    WHERE Resolution = to_res AND Bucket >= from_time AND Bucket < to_time;
+
+    INSERT INTO PerformanceRollup
+    SELECT to_res, Parent, SUM(Samples),
+           SUM(Avg_Speed_Sum), SUM(Avg_Speed_Count), MIN(Avg_Speed_Min), MAX(Avg_Speed_Max),
+           AVG(CASE WHEN a_rn IN (FLOOR((a_n + 1) / 2), CEIL((a_n + 1) / 2)) THEN Avg_Speed_P50 END),
+           SUM(Median_Speed_Sum), SUM(Median_Speed_Count), MIN(Median_Speed_Min), MAX(Median_Speed_Max),
+           AVG(CASE WHEN m_rn IN (FLOOR((m_n + 1) / 2), CEIL((m_n + 1) / 2)) THEN Median_Speed_P50 END),
+           SUM(Top_Speed_Sum), SUM(Top_Speed_Count), MIN(Top_Speed_Min), MAX(Top_Speed_Max),
+           AVG(CASE WHEN t_rn IN (FLOOR((t_n + 1) / 2), CEIL((t_n + 1) / 2)) THEN Top_Speed_P50 END),
+           SUM(Low_Speed_Sum), SUM(Low_Speed_Count), MIN(Low_Speed_Min), MAX(Low_Speed_Max),
+           AVG(CASE WHEN l_rn IN (FLOOR((l_n + 1) / 2), CEIL((l_n + 1) / 2)) THEN Low_Speed_P50 END)
+    FROM (
+        SELECT R.*, DATE_FORMAT(R.Bucket, fmt) AS Parent,
+               ROW_NUMBER() OVER (w ORDER BY R.Avg_Speed_P50 IS NULL, R.Avg_Speed_P50) AS a_rn,
+               COUNT(R.Avg_Speed_P50) OVER w AS a_n,
+               ROW_NUMBER() OVER (w ORDER BY R.Median_Speed_P50 IS NULL, R.Median_Speed_P50) AS m_rn,
+               COUNT(R.Median_Speed_P50) OVER w AS m_n,
+               ROW_NUMBER() OVER (w ORDER BY R.Top_Speed_P50 IS NULL, R.Top_Speed_P50) AS t_rn,
+               COUNT(R.Top_Speed_P50) OVER w AS t_n,
+               ROW_NUMBER() OVER (w ORDER BY R.Low_Speed_P50 IS NULL, R.Low_Speed_P50) AS l_rn,
+               COUNT(R.Low_Speed_P50) OVER w AS l_n
+        FROM PerformanceRollup R
+        WHERE R.Resolution = from_res AND R.Bucket >= from_time AND R.Bucket < to_time
+        WINDOW w AS (PARTITION BY DATE_FORMAT(R.Bucket, fmt))
+    ) ranked
+    GROUP BY Parent;
+END;//
+
+#Recomputes every rollup bucket that overlaps [from_time, to_time) from the
+#raw Performance rows. Call it after inserting, changing or deleting samples
+#in that range; it only reads the minutes, hours and days involved
+DROP PROCEDURE IF EXISTS refresh_performance_rollups;
+CREATE PROCEDURE refresh_performance_rollups(IN from_time DATETIME, IN to_time DATETIME)
+BEGIN
+    DECLARE last_time DATETIME DEFAULT to_time - INTERVAL 1 SECOND;
+    DECLARE minute_start DATETIME DEFAULT DATE_FORMAT(from_time, '%Y-%m-%d %H:%i:00');
+    DECLARE minute_end DATETIME DEFAULT DATE_FORMAT(last_time, '%Y-%m-%d %H:%i:00') + INTERVAL 1 MINUTE;
+    DECLARE hour_start DATETIME DEFAULT DATE_FORMAT(from_time, '%Y-%m-%d %H:00:00');
+    DECLARE hour_end DATETIME DEFAULT DATE_FORMAT(last_time, '%Y-%m-%d %H:00:00') + INTERVAL 1 HOUR;
+    DECLARE day_start DATETIME DEFAULT DATE(from_time);
+    DECLARE day_end DATETIME DEFAULT DATE(last_time) + INTERVAL 1 DAY;
+
+    DELETE FROM PerformanceRollup
+    WHERE Resolution = 'minute' AND Bucket >= minute_start AND Bucket < minute_end;
+
+    INSERT INTO PerformanceRollup
+    SELECT 'minute', Minute, COUNT(*),
+           SUM(Avg_Speed), COUNT(Avg_Speed), MIN(Avg_Speed), MAX(Avg_Speed),
+           AVG(CASE WHEN a_rn IN (FLOOR((a_n + 1) / 2), CEIL((a_n + 1) / 2)) THEN Avg_Speed END),
+           SUM(Median_Speed), COUNT(Median_Speed), MIN(Median_Speed), MAX(Median_Speed),
+           AVG(CASE WHEN m_rn IN (FLOOR((m_n + 1) / 2), CEIL((m_n + 1) / 2)) THEN Median_Speed END),
+           SUM(Top_Speed), COUNT(Top_Speed), MIN(Top_Speed), MAX(Top_Speed),
+           AVG(CASE WHEN t_rn IN (FLOOR((t_n + 1) / 2), CEIL((t_n + 1) / 2)) THEN Top_Speed END),
+           SUM(Low_Speed), COUNT(Low_Speed), MIN(Low_Speed), MAX(Low_Speed),
+           AVG(CASE WHEN l_rn IN (FLOOR((l_n + 1) / 2), CEIL((l_n + 1) / 2)) THEN Low_Speed END)
+    FROM (
+        SELECT P.Avg_Speed, P.Median_Speed, P.Top_Speed, P.Low_Speed,
+               DATE_FORMAT(P.`Date`, '%Y-%m-%d %H:%i:00') AS Minute,
+               ROW_NUMBER() OVER (w ORDER BY P.Avg_Speed IS NULL, P.Avg_Speed) AS a_rn,
+               COUNT(P.Avg_Speed) OVER w AS a_n,
+               ROW_NUMBER() OVER (w ORDER BY P.Median_Speed IS NULL, P.Median_Speed) AS m_rn,
+               COUNT(P.Median_Speed) OVER w AS m_n,
+               ROW_NUMBER() OVER (w ORDER BY P.Top_Speed IS NULL, P.Top_Speed) AS t_rn,
+               COUNT(P.Top_Speed) OVER w AS t_n,
+               ROW_NUMBER() OVER (w ORDER BY P.Low_Speed IS NULL, P.Low_Speed) AS l_rn,
+               COUNT(P.Low_Speed) OVER w AS l_n
+        FROM Performance P
+        WHERE P.`Date` >= minute_start AND P.`Date` < minute_end
+        WINDOW w AS (PARTITION BY DATE_FORMAT(P.`Date`, '%Y-%m-%d %H:%i:00'))
+    ) ranked
+    GROUP BY Minute;
+
+    CALL rollup_performance_level('minute', 'hour', '%Y-%m-%d %H:00:00', hour_start, hour_end);
+    CALL rollup_performance_level('hour', 'day', '%Y-%m-%d 00:00:00', day_start, day_end);
+END;//
+
+#Rebuilds every rollup from scratch, one day at a time
+DROP PROCEDURE IF EXISTS rebuild_performance_rollups;
+CREATE PROCEDURE rebuild_performance_rollups()
+BEGIN
+    DECLARE day_start DATETIME;
+    DECLARE last_day DATETIME;
+    DELETE FROM PerformanceRollup;
+    SELECT DATE(MIN(`Date`)), DATE(MAX(`Date`)) INTO day_start, last_day FROM Performance;
+    WHILE day_start <= last_day DO
+        CALL refresh_performance_rollups(day_start, day_start + INTERVAL 1 DAY);
+        SET day_start = day_start + INTERVAL 1 DAY;
+    END WHILE;
+END;//
+
+#Avg_Rent is kept up to date from a running sum and count of rents per city
+#(CityRentStats) so each Housing change costs a couple of primary key
+#lookups instead of re-averaging every listing in the city.
+#Rows with a NULL Rent are left out of the count, like AVG() does.
+#Bulk loads set @skip_city_avg_triggers for their session and apply the
+#per-city totals once themselves (see POST /housing/bulk).
 DROP TRIGGER IF EXISTS update_city_avg_rent_insert;
 CREATE TRIGGER update_city_avg_rent_insert
 AFTER INSERT ON Housing
 FOR EACH ROW
 BEGIN
-    UPDATE City
-    SET Avg_Rent = (
-        SELECT AVG(Rent)
-        FROM Housing
-        WHERE City_ID = NEW.City_ID
-    )
-    WHERE City_ID = NEW.City_ID;
+    IF @skip_city_avg_triggers IS NULL THEN
+        IF NEW.Rent IS NOT NULL THEN
+            INSERT INTO CityRentStats (City_ID, Rent_Sum, Rent_Count)
+            VALUES (NEW.City_ID, NEW.Rent, 1)
+            ON DUPLICATE KEY UPDATE
+                Rent_Sum = Rent_Sum + NEW.Rent,
+                Rent_Count = Rent_Count + 1;
+        END IF;
+        CALL refresh_city_avg_rent(NEW.City_ID);
+    END IF;
 END;//
 
 DROP TRIGGER IF EXISTS update_city_avg_rent_update;
@@ -190,13 +543,26 @@ CREATE TRIGGER update_city_avg_rent_update
 AFTER UPDATE ON Housing
 FOR EACH ROW
 BEGIN
-    UPDATE City
-    SET Avg_Rent = (
-        SELECT AVG(Rent)
-        FROM Housing
-        WHERE City_ID = NEW.City_ID
-    )
-    WHERE City_ID = NEW.City_ID;
+    IF @skip_city_avg_triggers IS NULL THEN
+        #take the old row out of its city and add the new row to its (maybe different) city
+        IF OLD.Rent IS NOT NULL THEN
+            UPDATE CityRentStats
+            SET Rent_Sum = Rent_Sum - OLD.Rent,
+                Rent_Count = Rent_Count - 1
+            WHERE City_ID = OLD.City_ID;
+        END IF;
+        IF NEW.Rent IS NOT NULL THEN
+            INSERT INTO CityRentStats (City_ID, Rent_Sum, Rent_Count)
+            VALUES (NEW.City_ID, NEW.Rent, 1)
+            ON DUPLICATE KEY UPDATE
+                Rent_Sum = Rent_Sum + NEW.Rent,
+                Rent_Count = Rent_Count + 1;
+        END IF;
+        CALL refresh_city_avg_rent(NEW.City_ID);
+        IF OLD.City_ID <> NEW.City_ID THEN
+            CALL refresh_city_avg_rent(OLD.City_ID);
+        END IF;
+    END IF;
 END;//
 
 DROP TRIGGER IF EXISTS update_city_avg_rent_delete;
@@ -204,36 +570,209 @@ CREATE TRIGGER update_city_avg_rent_delete
 AFTER DELETE ON Housing
 FOR EACH ROW
 BEGIN
-    UPDATE City
-    SET Avg_Rent = (
-        SELECT AVG(Rent)
-        FROM Housing
-        WHERE City_ID = OLD.City_ID
-    )
-    WHERE City_ID = OLD.City_ID;
+    IF @skip_city_avg_triggers IS NULL THEN
+        IF OLD.Rent IS NOT NULL THEN
+            UPDATE CityRentStats
+            SET Rent_Sum = Rent_Sum - OLD.Rent,
+                Rent_Count = Rent_Count - 1
+            WHERE City_ID = OLD.City_ID;
+        END IF;
+        CALL refresh_city_avg_rent(OLD.City_ID);
+    END IF;
 END;//
 
+#Every City change moves the national totals by the difference between the
+#old and new row. This includes the Avg_Rent/Avg_Wage updates made by the
+#Housing and Job triggers above.
+DROP TRIGGER IF EXISTS national_city_stats_insert;
+CREATE TRIGGER national_city_stats_insert
+AFTER INSERT ON City
+FOR EACH ROW
+BEGIN
+    UPDATE NationalCityStats
+    SET Cost_Sum = Cost_Sum + COALESCE(NEW.Avg_Cost_Of_Living, 0),
+        Cost_Count = Cost_Count + (NEW.Avg_Cost_Of_Living IS NOT NULL),
+        Rent_Sum = Rent_Sum + COALESCE(NEW.Avg_Rent, 0),
+        Rent_Count = Rent_Count + (NEW.Avg_Rent IS NOT NULL),
+        Wage_Sum = Wage_Sum + COALESCE(NEW.Avg_Wage, 0),
+        Wage_Count = Wage_Count + (NEW.Avg_Wage IS NOT NULL)
+    WHERE Stats_ID = 1;
+END;//
+
+DROP TRIGGER IF EXISTS national_city_stats_update;
+CREATE TRIGGER national_city_stats_update
+AFTER UPDATE ON City
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.Avg_Cost_Of_Living <=> OLD.Avg_Cost_Of_Living
+            AND NEW.Avg_Rent <=> OLD.Avg_Rent
+            AND NEW.Avg_Wage <=> OLD.Avg_Wage) THEN
+        UPDATE NationalCityStats
+        SET Cost_Sum = Cost_Sum + COALESCE(NEW.Avg_Cost_Of_Living, 0) - COALESCE(OLD.Avg_Cost_Of_Living, 0),
+            Cost_Count = Cost_Count + (NEW.Avg_Cost_Of_Living IS NOT NULL) - (OLD.Avg_Cost_Of_Living IS NOT NULL),
+            Rent_Sum = Rent_Sum + COALESCE(NEW.Avg_Rent, 0) - COALESCE(OLD.Avg_Rent, 0),
+            Rent_Count = Rent_Count + (NEW.Avg_Rent IS NOT NULL) - (OLD.Avg_Rent IS NOT NULL),
+            Wage_Sum = Wage_Sum + COALESCE(NEW.Avg_Wage, 0) - COALESCE(OLD.Avg_Wage, 0),
+            Wage_Count = Wage_Count + (NEW.Avg_Wage IS NOT NULL) - (OLD.Avg_Wage IS NOT NULL)
+        WHERE Stats_ID = 1;
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS national_city_stats_delete;
+CREATE TRIGGER national_city_stats_delete
+AFTER DELETE ON City
+FOR EACH ROW
+BEGIN
+    UPDATE NationalCityStats
+    SET Cost_Sum = Cost_Sum - COALESCE(OLD.Avg_Cost_Of_Living, 0),
+        Cost_Count = Cost_Count - (OLD.Avg_Cost_Of_Living IS NOT NULL),
+        Rent_Sum = Rent_Sum - COALESCE(OLD.Avg_Rent, 0),
+        Rent_Count = Rent_Count - (OLD.Avg_Rent IS NOT NULL),
+        Wage_Sum = Wage_Sum - COALESCE(OLD.Avg_Wage, 0),
+        Wage_Count = Wage_Count - (OLD.Avg_Wage IS NOT NULL)
+    WHERE Stats_ID = 1;
+END;//
+
+#New and moved housing listings take their zip's coordinates unless they
+#bring their own (Approximate says which), and Geo always follows
+#Latitude/Longitude so the spatial index (used by GET /housing/<id>/nearby
+#and /map/bbox) stays correct
+DROP TRIGGER IF EXISTS housing_geo_insert;
+CREATE TRIGGER housing_geo_insert
+BEFORE INSERT ON Housing
+FOR EACH ROW
+BEGIN
+    SET NEW.Approximate = NEW.Latitude IS NULL;
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude FROM Location WHERE Zip = NEW.zipID),
+            NEW.Longitude = (SELECT Longitude FROM Location WHERE Zip = NEW.zipID);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS housing_geo_update;
+CREATE TRIGGER housing_geo_update
+BEFORE UPDATE ON Housing
+FOR EACH ROW
+BEGIN
+    IF NEW.zipID <> OLD.zipID AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude FROM Location WHERE Zip = NEW.zipID),
+            NEW.Longitude = (SELECT Longitude FROM Location WHERE Zip = NEW.zipID),
+            NEW.Approximate = TRUE;
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+#New zip codes without coordinates sit near their city's center, spread by
+#zip so they don't stack; facilities sit near their zip like housing does
+DROP TRIGGER IF EXISTS location_geo_insert;
+CREATE TRIGGER location_geo_insert
+BEFORE INSERT ON Location
+FOR EACH ROW
+BEGIN
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Zip) % 201) - 100) / 10000 FROM City WHERE City_ID = NEW.City_ID),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(NEW.Zip * 7) % 201) - 100) / 10000 FROM City WHERE City_ID = NEW.City_ID);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS location_geo_update;
+CREATE TRIGGER location_geo_update
+BEFORE UPDATE ON Location
+FOR EACH ROW
+BEGIN
+    IF NEW.City_ID <> OLD.City_ID AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Zip) % 201) - 100) / 10000 FROM City WHERE City_ID = NEW.City_ID),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(NEW.Zip * 7) % 201) - 100) / 10000 FROM City WHERE City_ID = NEW.City_ID);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS airport_geo_insert;
+CREATE TRIGGER airport_geo_insert
+BEFORE INSERT ON Airport
+FOR EACH ROW
+BEGIN
+    SET NEW.Approximate = NEW.Latitude IS NULL;
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS airport_geo_update;
+CREATE TRIGGER airport_geo_update
+BEFORE UPDATE ON Airport
+FOR EACH ROW
+BEGIN
+    IF NEW.Zip <> OLD.Zip AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Approximate = TRUE;
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS hospital_geo_insert;
+CREATE TRIGGER hospital_geo_insert
+BEFORE INSERT ON Hospital
+FOR EACH ROW
+BEGIN
+    SET NEW.Approximate = NEW.Latitude IS NULL;
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS hospital_geo_update;
+CREATE TRIGGER hospital_geo_update
+BEFORE UPDATE ON Hospital
+FOR EACH ROW
+BEGIN
+    IF NEW.Zip <> OLD.Zip AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Approximate = TRUE;
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+#Avg_Wage works the same way as Avg_Rent: each Job change adjusts the
+#running totals in CityWageStats for the city its user currently lives in.
+#A job's city is looked up through User by primary key.
 DROP TRIGGER IF EXISTS update_city_avg_wage_insert;
 CREATE TRIGGER update_city_avg_wage_insert
 AFTER INSERT ON Job
 FOR EACH ROW
 BEGIN
-    UPDATE City
-    SET Avg_Wage = (
-        SELECT AVG(j.Wage)
-        FROM Job j
-        JOIN User u ON j.User_ID = u.UserID
-        WHERE u.Current_City_ID = (
-            SELECT Current_City_ID
-            FROM User
-            WHERE UserID = NEW.User_ID
-        )
-    )
-    WHERE City_ID = (
-        SELECT Current_City_ID
-        FROM User
-        WHERE UserID = NEW.User_ID
-    );
+    DECLARE city INT;
+    SELECT Current_City_ID INTO city FROM User WHERE UserID = NEW.User_ID;
+    INSERT INTO CityWageStats (City_ID, Wage_Sum, Wage_Count)
+    VALUES (city, NEW.Wage, 1)
+    ON DUPLICATE KEY UPDATE
+        Wage_Sum = Wage_Sum + NEW.Wage,
+        Wage_Count = Wage_Count + 1;
+    CALL refresh_city_avg_wage(city);
 END;//
 
 DROP TRIGGER IF EXISTS update_city_avg_wage_update;
@@ -241,22 +780,25 @@ CREATE TRIGGER update_city_avg_wage_update
 AFTER UPDATE ON Job
 FOR EACH ROW
 BEGIN
-    UPDATE City
-    SET Avg_Wage = (
-        SELECT AVG(j.Wage)
-        FROM Job j
-        JOIN User u ON j.User_ID = u.UserID
-        WHERE u.Current_City_ID = (
-            SELECT Current_City_ID
-            FROM User
-            WHERE UserID = NEW.User_ID
-        )
-    )
-    WHERE City_ID = (
-        SELECT Current_City_ID
-        FROM User
-        WHERE UserID = NEW.User_ID
-    );
+    DECLARE old_city INT;
+    DECLARE new_city INT;
+    SELECT Current_City_ID INTO old_city FROM User WHERE UserID = OLD.User_ID;
+    SELECT Current_City_ID INTO new_city FROM User WHERE UserID = NEW.User_ID;
+
+    UPDATE CityWageStats
+    SET Wage_Sum = Wage_Sum - OLD.Wage,
+        Wage_Count = Wage_Count - 1
+    WHERE City_ID = old_city;
+    INSERT INTO CityWageStats (City_ID, Wage_Sum, Wage_Count)
+    VALUES (new_city, NEW.Wage, 1)
+    ON DUPLICATE KEY UPDATE
+        Wage_Sum = Wage_Sum + NEW.Wage,
+        Wage_Count = Wage_Count + 1;
+
+    CALL refresh_city_avg_wage(new_city);
+    IF old_city <> new_city THEN
+        CALL refresh_city_avg_wage(old_city);
+    END IF;
 END;//
 
 DROP TRIGGER IF EXISTS update_city_avg_wage_delete;
@@ -264,22 +806,42 @@ CREATE TRIGGER update_city_avg_wage_delete
 AFTER DELETE ON Job
 FOR EACH ROW
 BEGIN
-    UPDATE City
-    SET Avg_Wage = (
-        SELECT AVG(j.Wage)
-        FROM Job j
-        JOIN User u ON j.User_ID = u.UserID
-        WHERE u.Current_City_ID = (
-            SELECT Current_City_ID
-            FROM User
-            WHERE UserID = OLD.User_ID
-        )
-    )
-    WHERE City_ID = (
-        SELECT Current_City_ID
-        FROM User
-        WHERE UserID = OLD.User_ID
-    );
+    DECLARE city INT;
+    SELECT Current_City_ID INTO city FROM User WHERE UserID = OLD.User_ID;
+    UPDATE CityWageStats
+    SET Wage_Sum = Wage_Sum - OLD.Wage,
+        Wage_Count = Wage_Count - 1
+    WHERE City_ID = city;
+    CALL refresh_city_avg_wage(city);
+END;//
+
+#When a user moves, their jobs' wages move with them to the new city
+DROP TRIGGER IF EXISTS update_city_avg_wage_user_moved;
+CREATE TRIGGER update_city_avg_wage_user_moved
+AFTER UPDATE ON User
+FOR EACH ROW
+BEGIN
+    DECLARE moved_sum BIGINT;
+    DECLARE moved_count INT;
+    IF OLD.Current_City_ID <> NEW.Current_City_ID THEN
+        SELECT COALESCE(SUM(Wage), 0), COUNT(*) INTO moved_sum, moved_count
+        FROM Job
+        WHERE User_ID = NEW.UserID;
+
+        IF moved_count > 0 THEN
+            UPDATE CityWageStats
+            SET Wage_Sum = Wage_Sum - moved_sum,
+                Wage_Count = Wage_Count - moved_count
+            WHERE City_ID = OLD.Current_City_ID;
+            INSERT INTO CityWageStats (City_ID, Wage_Sum, Wage_Count)
+            VALUES (NEW.Current_City_ID, moved_sum, moved_count)
+            ON DUPLICATE KEY UPDATE
+                Wage_Sum = Wage_Sum + moved_sum,
+                Wage_Count = Wage_Count + moved_count;
+            CALL refresh_city_avg_wage(OLD.Current_City_ID);
+            CALL refresh_city_avg_wage(NEW.Current_City_ID);
+        END IF;
+    END IF;
 END;//
 
 DELIMITER ;
@@ -749,6 +1311,8 @@ INSERT INTO Performance (Date, Avg_Speed, Median_Speed, Top_Speed, Low_Speed) VA
 ('2024-01-28', 60, 55, 80, 40),
 ('2024-01-29', 72, 67, 92, 52),
 ('2024-01-30', 74, 69, 94, 54);
+CALL rebuild_performance_rollups();
+
 -- Sample data for Airport (10 rows)
 INSERT INTO Airport (Name, City_ID, Zip) VALUES
 ('Logan International Airport', 1, 02115),
@@ -820,6 +1384,17 @@ INSERT INTO JobPosting (Title, Bio, Compensation, Location_ID, User_ID) VALUES
 ('E-commerce Specialist', 'Manage online sales and marketing.', 56000, 33106, 39),  -- Miami
 ('Content Strategist', 'Develop content strategies for brands.', 59000, 48206, 39);  -- Detroit
 
+-- Sample data for Application
+INSERT INTO Application (Student_ID, Post_ID, Date_Applied) VALUES
+(1, 1, '2024-09-01'),
+(1, 8, '2024-09-03'),
+(1, 15, '2024-09-10'),
+(3, 3, '2024-09-05'),
+(3, 10, '2024-09-06'),
+(5, 5, '2024-09-12'),
+(7, 7, '2024-10-01'),
+(9, 2, '2024-10-15');
+
 
 ## Persona 1: Timothy (Northeastern Student)**
 
@@ -0,0 +1,16 @@
+# Adds the JobPosting indexes behind /job_postings/search and ranked keyword
+# search to a database bootstrapped before they existed. A fresh bootstrap
+# already has them.
+#
+#   mysql -u root -p < database-files/migrations/001_job_search_indexes.sql
+USE coopConnect;
+
+ALTER TABLE JobPosting
+    ADD INDEX idx_jp_comp (Compensation, Post_ID);
+
+# InnoDB builds one FULLTEXT index per ALTER TABLE
+ALTER TABLE JobPosting
+    ADD FULLTEXT INDEX ft_jp_title (Title);
+
+ALTER TABLE JobPosting
+    ADD FULLTEXT INDEX ft_jp_title_bio (Title, Bio);
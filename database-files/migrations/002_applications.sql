@@ -0,0 +1,24 @@
+# Adds the Application table behind the available-jobs feed to a database
+# bootstrapped before it existed. A fresh bootstrap already has it.
+#
+#   mysql -u root -p < database-files/migrations/002_applications.sql
+USE coopConnect;
+
+# one row per student per job posting they applied to. The primary key
+# leads with Student_ID so "jobs I haven't applied to" is an index probe
+# per posting instead of a scan of every application
+Create table if not exists Application (
+    Student_ID int not null,
+    Post_ID int not null,
+    Date_Applied datetime not null default current_timestamp,
+
+    Primary Key (Student_ID, Post_ID),
+    Constraint app_student
+        foreign key (Student_ID) references User (UserID)
+            on update cascade
+            on delete cascade,
+    Constraint app_post
+        foreign key (Post_ID) references JobPosting (Post_ID)
+            on update cascade
+            on delete cascade
+);
@@ -0,0 +1,119 @@
+# Adds CityRentStats and the procedures and triggers that keep City.Avg_Rent
+# from running totals to a database bootstrapped before they existed, then
+# fills them from the existing Housing rows. The triggers replace the ones
+# that re-averaged every listing in the city. A fresh bootstrap already has them.
+#
+#   mysql -u root -p < database-files/migrations/003_city_rent_stats.sql
+USE coopConnect;
+
+# running rent totals per city that the Housing triggers keep current;
+# City.Avg_Rent is Rent_Sum / Rent_Count
+Create table if not exists CityRentStats (
+    City_ID int not null,
+    Rent_Sum bigint not null default 0,
+    Rent_Count int not null default 0,
+
+    Primary Key (City_ID),
+    Constraint crs_city
+        foreign key (City_ID) references City (City_ID)
+            on update cascade
+            on delete cascade
+);
+
+DELIMITER //
+#Copies one city's running rent totals into City.Avg_Rent. A city with no
+#rents keeps the average it had (its seeded one, or its last listings')
+DROP PROCEDURE IF EXISTS refresh_city_avg_rent;
+CREATE PROCEDURE refresh_city_avg_rent(IN city INT)
+BEGIN
+    UPDATE City c
+    LEFT JOIN CityRentStats s ON s.City_ID = c.City_ID
+    SET c.Avg_Rent = IF(s.Rent_Count > 0, s.Rent_Sum / s.Rent_Count, c.Avg_Rent)
+    WHERE c.City_ID = city;
+END;//
+
+#Rebuilds CityRentStats and every city's Avg_Rent from the Housing table.
+#Use it after loading data with the triggers bypassed or to repair drift.
+DROP PROCEDURE IF EXISTS rebuild_city_avg_rent;
+CREATE PROCEDURE rebuild_city_avg_rent()
+BEGIN
+    DELETE FROM CityRentStats;
+    INSERT INTO CityRentStats (City_ID, Rent_Sum, Rent_Count)
+    SELECT City_ID, SUM(Rent), COUNT(Rent)
+    FROM Housing
+    GROUP BY City_ID;
+
+    #cities with no housing have no stats row and keep the average they had
+    UPDATE City c
+    LEFT JOIN CityRentStats s ON s.City_ID = c.City_ID
+    SET c.Avg_Rent = IF(s.Rent_Count > 0, s.Rent_Sum / s.Rent_Count, c.Avg_Rent);
+END;//
+
+#Avg_Rent is kept up to date from a running sum and count of rents per city
+#(CityRentStats) so each Housing change costs a couple of primary key
+#lookups instead of re-averaging every listing in the city.
+#Rows with a NULL Rent are left out of the count, like AVG() does.
+#Bulk loads set @skip_city_avg_triggers for their session and apply the
+#per-city totals once themselves (see POST /housing/bulk).
+DROP TRIGGER IF EXISTS update_city_avg_rent_insert;
+CREATE TRIGGER update_city_avg_rent_insert
+AFTER INSERT ON Housing
+FOR EACH ROW
+BEGIN
+    IF @skip_city_avg_triggers IS NULL THEN
+        IF NEW.Rent IS NOT NULL THEN
+            INSERT INTO CityRentStats (City_ID, Rent_Sum, Rent_Count)
+            VALUES (NEW.City_ID, NEW.Rent, 1)
+            ON DUPLICATE KEY UPDATE
+                Rent_Sum = Rent_Sum + NEW.Rent,
+                Rent_Count = Rent_Count + 1;
+        END IF;
+        CALL refresh_city_avg_rent(NEW.City_ID);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS update_city_avg_rent_update;
+CREATE TRIGGER update_city_avg_rent_update
+AFTER UPDATE ON Housing
+FOR EACH ROW
+BEGIN
+    IF @skip_city_avg_triggers IS NULL THEN
+        #take the old row out of its city and add the new row to its (maybe different) city
+        IF OLD.Rent IS NOT NULL THEN
+            UPDATE CityRentStats
+            SET Rent_Sum = Rent_Sum - OLD.Rent,
+                Rent_Count = Rent_Count - 1
+            WHERE City_ID = OLD.City_ID;
+        END IF;
+        IF NEW.Rent IS NOT NULL THEN
+            INSERT INTO CityRentStats (City_ID, Rent_Sum, Rent_Count)
+            VALUES (NEW.City_ID, NEW.Rent, 1)
+            ON DUPLICATE KEY UPDATE
+                Rent_Sum = Rent_Sum + NEW.Rent,
+                Rent_Count = Rent_Count + 1;
+        END IF;
+        CALL refresh_city_avg_rent(NEW.City_ID);
+        IF OLD.City_ID <> NEW.City_ID THEN
+            CALL refresh_city_avg_rent(OLD.City_ID);
+        END IF;
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS update_city_avg_rent_delete;
+CREATE TRIGGER update_city_avg_rent_delete
+AFTER DELETE ON Housing
+FOR EACH ROW
+BEGIN
+    IF @skip_city_avg_triggers IS NULL THEN
+        IF OLD.Rent IS NOT NULL THEN
+            UPDATE CityRentStats
+            SET Rent_Sum = Rent_Sum - OLD.Rent,
+                Rent_Count = Rent_Count - 1
+            WHERE City_ID = OLD.City_ID;
+        END IF;
+        CALL refresh_city_avg_rent(OLD.City_ID);
+    END IF;
+END;//
+DELIMITER ;
+
+CALL rebuild_city_avg_rent();
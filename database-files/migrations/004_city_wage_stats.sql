@@ -0,0 +1,140 @@
+# Adds CityWageStats and the procedures and triggers that keep City.Avg_Wage
+# from running totals to a database bootstrapped before they existed, then
+# fills them from the existing Job rows. The triggers replace the ones that
+# re-averaged every job in the city. A fresh bootstrap already has them.
+#
+#   mysql -u root -p < database-files/migrations/004_city_wage_stats.sql
+USE coopConnect;
+
+# running wage totals per city that the Job triggers keep current;
+# City.Avg_Wage is Wage_Sum / Wage_Count
+Create table if not exists CityWageStats (
+    City_ID int not null,
+    Wage_Sum bigint not null default 0,
+    Wage_Count int not null default 0,
+
+    Primary Key (City_ID),
+    Constraint cws_city
+        foreign key (City_ID) references City (City_ID)
+            on update cascade
+            on delete cascade
+);
+
+DELIMITER //
+#Copies one city's running wage totals into City.Avg_Wage. A city with no
+#wages keeps the average it had (its seeded one, or its last jobs')
+DROP PROCEDURE IF EXISTS refresh_city_avg_wage;
+CREATE PROCEDURE refresh_city_avg_wage(IN city INT)
+BEGIN
+    UPDATE City c
+    LEFT JOIN CityWageStats s ON s.City_ID = c.City_ID
+    SET c.Avg_Wage = IF(s.Wage_Count > 0, s.Wage_Sum / s.Wage_Count, c.Avg_Wage)
+    WHERE c.City_ID = city;
+END;//
+
+#Rebuilds CityWageStats and every city's Avg_Wage from the Job table
+DROP PROCEDURE IF EXISTS rebuild_city_avg_wage;
+CREATE PROCEDURE rebuild_city_avg_wage()
+BEGIN
+    DELETE FROM CityWageStats;
+    INSERT INTO CityWageStats (City_ID, Wage_Sum, Wage_Count)
+    SELECT u.Current_City_ID, SUM(j.Wage), COUNT(*)
+    FROM Job j
+    JOIN User u ON j.User_ID = u.UserID
+    GROUP BY u.Current_City_ID;
+
+    #cities with no jobs have no stats row and keep the average they had
+    UPDATE City c
+    LEFT JOIN CityWageStats s ON s.City_ID = c.City_ID
+    SET c.Avg_Wage = IF(s.Wage_Count > 0, s.Wage_Sum / s.Wage_Count, c.Avg_Wage);
+END;//
+
+#Avg_Wage works the same way as Avg_Rent: each Job change adjusts the
+#running totals in CityWageStats for the city its user currently lives in.
+#A job's city is looked up through User by primary key.
+DROP TRIGGER IF EXISTS update_city_avg_wage_insert;
+CREATE TRIGGER update_city_avg_wage_insert
+AFTER INSERT ON Job
+FOR EACH ROW
+BEGIN
+    DECLARE city INT;
+    SELECT Current_City_ID INTO city FROM User WHERE UserID = NEW.User_ID;
+    INSERT INTO CityWageStats (City_ID, Wage_Sum, Wage_Count)
+    VALUES (city, NEW.Wage, 1)
+    ON DUPLICATE KEY UPDATE
+        Wage_Sum = Wage_Sum + NEW.Wage,
+        Wage_Count = Wage_Count + 1;
+    CALL refresh_city_avg_wage(city);
+END;//
+
+DROP TRIGGER IF EXISTS update_city_avg_wage_update;
+CREATE TRIGGER update_city_avg_wage_update
+AFTER UPDATE ON Job
+FOR EACH ROW
+BEGIN
+    DECLARE old_city INT;
+    DECLARE new_city INT;
+    SELECT Current_City_ID INTO old_city FROM User WHERE UserID = OLD.User_ID;
+    SELECT Current_City_ID INTO new_city FROM User WHERE UserID = NEW.User_ID;
+
+    UPDATE CityWageStats
+    SET Wage_Sum = Wage_Sum - OLD.Wage,
+        Wage_Count = Wage_Count - 1
+    WHERE City_ID = old_city;
+    INSERT INTO CityWageStats (City_ID, Wage_Sum, Wage_Count)
+    VALUES (new_city, NEW.Wage, 1)
+    ON DUPLICATE KEY UPDATE
+        Wage_Sum = Wage_Sum + NEW.Wage,
+        Wage_Count = Wage_Count + 1;
+
+    CALL refresh_city_avg_wage(new_city);
+    IF old_city <> new_city THEN
+        CALL refresh_city_avg_wage(old_city);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS update_city_avg_wage_delete;
+CREATE TRIGGER update_city_avg_wage_delete
+AFTER DELETE ON Job
+FOR EACH ROW
+BEGIN
+    DECLARE city INT;
+    SELECT Current_City_ID INTO city FROM User WHERE UserID = OLD.User_ID;
+    UPDATE CityWageStats
+    SET Wage_Sum = Wage_Sum - OLD.Wage,
+        Wage_Count = Wage_Count - 1
+    WHERE City_ID = city;
+    CALL refresh_city_avg_wage(city);
+END;//
+
+#When a user moves, their jobs' wages move with them to the new city
+DROP TRIGGER IF EXISTS update_city_avg_wage_user_moved;
+CREATE TRIGGER update_city_avg_wage_user_moved
+AFTER UPDATE ON User
+FOR EACH ROW
+BEGIN
+    DECLARE moved_sum BIGINT;
+    DECLARE moved_count INT;
+    IF OLD.Current_City_ID <> NEW.Current_City_ID THEN
+        SELECT COALESCE(SUM(Wage), 0), COUNT(*) INTO moved_sum, moved_count
+        FROM Job
+        WHERE User_ID = NEW.UserID;
+
+        IF moved_count > 0 THEN
+            UPDATE CityWageStats
+            SET Wage_Sum = Wage_Sum - moved_sum,
+                Wage_Count = Wage_Count - moved_count
+            WHERE City_ID = OLD.Current_City_ID;
+            INSERT INTO CityWageStats (City_ID, Wage_Sum, Wage_Count)
+            VALUES (NEW.Current_City_ID, moved_sum, moved_count)
+            ON DUPLICATE KEY UPDATE
+                Wage_Sum = Wage_Sum + moved_sum,
+                Wage_Count = Wage_Count + moved_count;
+            CALL refresh_city_avg_wage(OLD.Current_City_ID);
+            CALL refresh_city_avg_wage(NEW.Current_City_ID);
+        END IF;
+    END IF;
+END;//
+DELIMITER ;
+
+CALL rebuild_city_avg_wage();
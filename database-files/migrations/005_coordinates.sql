@@ -0,0 +1,156 @@
+# Adds coordinates, the Geo columns with their spatial indexes and the
+# triggers that keep Geo current to a database bootstrapped before they
+# existed. A fresh bootstrap already has them.
+#
+# The new columns start out empty: the API fills them on its next start
+# (API_GEOCODE_ON_START), or run `flask import-geocodes`.
+#
+#   mysql -u root -p < database-files/migrations/005_coordinates.sql
+USE coopConnect;
+
+ALTER TABLE City
+    ADD COLUMN Latitude double,
+    ADD COLUMN Longitude double;
+
+ALTER TABLE Location
+    ADD COLUMN Latitude double,
+    ADD COLUMN Longitude double,
+    ADD COLUMN Geo point not null srid 0 default (point(0, 0)) invisible,
+    ADD SPATIAL INDEX sp_loc_geo (Geo);
+
+ALTER TABLE Housing
+    ADD COLUMN Latitude double,
+    ADD COLUMN Longitude double,
+    ADD COLUMN Geo point not null srid 0 default (point(0, 0)) invisible,
+    ADD SPATIAL INDEX sp_housing_geo (Geo);
+
+ALTER TABLE Airport
+    ADD COLUMN Latitude double,
+    ADD COLUMN Longitude double,
+    ADD COLUMN Geo point not null srid 0 default (point(0, 0)) invisible,
+    ADD SPATIAL INDEX sp_air_geo (Geo);
+
+ALTER TABLE Hospital
+    ADD COLUMN Latitude double,
+    ADD COLUMN Longitude double,
+    ADD COLUMN Geo point not null srid 0 default (point(0, 0)) invisible,
+    ADD SPATIAL INDEX sp_hosp_geo (Geo);
+
+DELIMITER //
+#New and moved housing listings take their zip's coordinates unless they
+#bring their own, and Geo always follows Latitude/Longitude so the spatial
+#index (used by GET /housing/<id>/nearby and /map/bbox) stays correct
+DROP TRIGGER IF EXISTS housing_geo_insert;
+CREATE TRIGGER housing_geo_insert
+BEFORE INSERT ON Housing
+FOR EACH ROW
+BEGIN
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude FROM Location WHERE Zip = NEW.zipID),
+            NEW.Longitude = (SELECT Longitude FROM Location WHERE Zip = NEW.zipID);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS housing_geo_update;
+CREATE TRIGGER housing_geo_update
+BEFORE UPDATE ON Housing
+FOR EACH ROW
+BEGIN
+    IF NEW.zipID <> OLD.zipID AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude FROM Location WHERE Zip = NEW.zipID),
+            NEW.Longitude = (SELECT Longitude FROM Location WHERE Zip = NEW.zipID);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+#New zip codes without coordinates sit near their city's center, spread by
+#zip so they don't stack; facilities sit near their zip like housing does
+DROP TRIGGER IF EXISTS location_geo_insert;
+CREATE TRIGGER location_geo_insert
+BEFORE INSERT ON Location
+FOR EACH ROW
+BEGIN
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Zip) % 201) - 100) / 10000 FROM City WHERE City_ID = NEW.City_ID),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(NEW.Zip * 7) % 201) - 100) / 10000 FROM City WHERE City_ID = NEW.City_ID);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS location_geo_update;
+CREATE TRIGGER location_geo_update
+BEFORE UPDATE ON Location
+FOR EACH ROW
+BEGIN
+    IF NEW.City_ID <> OLD.City_ID AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Zip) % 201) - 100) / 10000 FROM City WHERE City_ID = NEW.City_ID),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(NEW.Zip * 7) % 201) - 100) / 10000 FROM City WHERE City_ID = NEW.City_ID);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS airport_geo_insert;
+CREATE TRIGGER airport_geo_insert
+BEFORE INSERT ON Airport
+FOR EACH ROW
+BEGIN
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS airport_geo_update;
+CREATE TRIGGER airport_geo_update
+BEFORE UPDATE ON Airport
+FOR EACH ROW
+BEGIN
+    IF NEW.Zip <> OLD.Zip AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS hospital_geo_insert;
+CREATE TRIGGER hospital_geo_insert
+BEFORE INSERT ON Hospital
+FOR EACH ROW
+BEGIN
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS hospital_geo_update;
+CREATE TRIGGER hospital_geo_update
+BEFORE UPDATE ON Hospital
+FOR EACH ROW
+BEGIN
+    IF NEW.Zip <> OLD.Zip AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+DELIMITER ;
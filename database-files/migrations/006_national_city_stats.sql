@@ -0,0 +1,96 @@
+# Adds the cost of living index, NationalCityStats and the City triggers that
+# keep it to a database bootstrapped before they existed, then fills it from
+# the existing cities. A fresh bootstrap already has them.
+#
+#   mysql -u root -p < database-files/migrations/006_national_city_stats.sql
+USE coopConnect;
+
+ALTER TABLE City
+    ADD INDEX idx_city_col (Avg_Cost_Of_Living);
+
+# running totals over every city, kept current by the City triggers, so the
+# national averages are one primary key lookup instead of AVG() over City.
+# There is only ever the one row (Stats_ID = 1); sums and counts skip NULLs
+# like AVG() does
+Create table if not exists NationalCityStats (
+    Stats_ID tinyint not null default 1,
+    Cost_Sum double not null default 0,
+    Cost_Count int not null default 0,
+    Rent_Sum double not null default 0,
+    Rent_Count int not null default 0,
+    Wage_Sum double not null default 0,
+    Wage_Count int not null default 0,
+
+    check (Stats_ID = 1),
+    Primary Key (Stats_ID)
+);
+
+INSERT IGNORE INTO NationalCityStats (Stats_ID) VALUES (1);
+
+DELIMITER //
+#Rebuilds the national running totals from the City table
+DROP PROCEDURE IF EXISTS rebuild_national_city_stats;
+CREATE PROCEDURE rebuild_national_city_stats()
+BEGIN
+    REPLACE INTO NationalCityStats (Stats_ID, Cost_Sum, Cost_Count, Rent_Sum, Rent_Count, Wage_Sum, Wage_Count)
+    SELECT 1,
+           COALESCE(SUM(Avg_Cost_Of_Living), 0), COUNT(Avg_Cost_Of_Living),
+           COALESCE(SUM(Avg_Rent), 0), COUNT(Avg_Rent),
+           COALESCE(SUM(Avg_Wage), 0), COUNT(Avg_Wage)
+    FROM City;
+END;//
+
+#Every City change moves the national totals by the difference between the
+#old and new row. This includes the Avg_Rent/Avg_Wage updates made by the
+#Housing and Job triggers above.
+DROP TRIGGER IF EXISTS national_city_stats_insert;
+CREATE TRIGGER national_city_stats_insert
+AFTER INSERT ON City
+FOR EACH ROW
+BEGIN
+    UPDATE NationalCityStats
+    SET Cost_Sum = Cost_Sum + COALESCE(NEW.Avg_Cost_Of_Living, 0),
+        Cost_Count = Cost_Count + (NEW.Avg_Cost_Of_Living IS NOT NULL),
+        Rent_Sum = Rent_Sum + COALESCE(NEW.Avg_Rent, 0),
+        Rent_Count = Rent_Count + (NEW.Avg_Rent IS NOT NULL),
+        Wage_Sum = Wage_Sum + COALESCE(NEW.Avg_Wage, 0),
+        Wage_Count = Wage_Count + (NEW.Avg_Wage IS NOT NULL)
+    WHERE Stats_ID = 1;
+END;//
+
+DROP TRIGGER IF EXISTS national_city_stats_update;
+CREATE TRIGGER national_city_stats_update
+AFTER UPDATE ON City
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.Avg_Cost_Of_Living <=> OLD.Avg_Cost_Of_Living
+            AND NEW.Avg_Rent <=> OLD.Avg_Rent
+            AND NEW.Avg_Wage <=> OLD.Avg_Wage) THEN
+        UPDATE NationalCityStats
+        SET Cost_Sum = Cost_Sum + COALESCE(NEW.Avg_Cost_Of_Living, 0) - COALESCE(OLD.Avg_Cost_Of_Living, 0),
+            Cost_Count = Cost_Count + (NEW.Avg_Cost_Of_Living IS NOT NULL) - (OLD.Avg_Cost_Of_Living IS NOT NULL),
+            Rent_Sum = Rent_Sum + COALESCE(NEW.Avg_Rent, 0) - COALESCE(OLD.Avg_Rent, 0),
+            Rent_Count = Rent_Count + (NEW.Avg_Rent IS NOT NULL) - (OLD.Avg_Rent IS NOT NULL),
+            Wage_Sum = Wage_Sum + COALESCE(NEW.Avg_Wage, 0) - COALESCE(OLD.Avg_Wage, 0),
+            Wage_Count = Wage_Count + (NEW.Avg_Wage IS NOT NULL) - (OLD.Avg_Wage IS NOT NULL)
+        WHERE Stats_ID = 1;
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS national_city_stats_delete;
+CREATE TRIGGER national_city_stats_delete
+AFTER DELETE ON City
+FOR EACH ROW
+BEGIN
+    UPDATE NationalCityStats
+    SET Cost_Sum = Cost_Sum - COALESCE(OLD.Avg_Cost_Of_Living, 0),
+        Cost_Count = Cost_Count - (OLD.Avg_Cost_Of_Living IS NOT NULL),
+        Rent_Sum = Rent_Sum - COALESCE(OLD.Avg_Rent, 0),
+        Rent_Count = Rent_Count - (OLD.Avg_Rent IS NOT NULL),
+        Wage_Sum = Wage_Sum - COALESCE(OLD.Avg_Wage, 0),
+        Wage_Count = Wage_Count - (OLD.Avg_Wage IS NOT NULL)
+    WHERE Stats_ID = 1;
+END;//
+DELIMITER ;
+
+CALL rebuild_national_city_stats();
@@ -0,0 +1,36 @@
+# Adds the secondary indexes from coopConnect.sql to a database that was
+# bootstrapped before they existed. A fresh bootstrap already has them.
+#
+#   mysql -u root -p < database-files/migrations/007_secondary_indexes.sql
+#
+# Indexes on foreign key columns replace the ones InnoDB created for the
+# constraints, which MySQL drops on its own once they're redundant.
+USE coopConnect;
+
+ALTER TABLE City
+    ADD INDEX idx_city_name (Name);
+
+ALTER TABLE Location
+    ADD INDEX idx_loc_city (City_ID, Safety_Rating, Student_pop);
+
+ALTER TABLE Housing
+    ADD INDEX idx_housing_city (City_ID, Rent);
+
+ALTER TABLE Sublet
+    ADD INDEX idx_sublet_subleter (Subleter_ID);
+
+ALTER TABLE Job
+    ADD INDEX idx_job_user (User_ID, Wage);
+
+ALTER TABLE Performance
+    ADD INDEX idx_perf_date (`Date`);
+
+ALTER TABLE Airport
+    ADD INDEX idx_air_city (City_ID);
+
+ALTER TABLE Hospital
+    ADD INDEX idx_hosp_city (City_ID);
+
+ALTER TABLE JobPosting
+    ADD INDEX idx_jp_location (Location_ID, Compensation),
+    ADD INDEX idx_jp_user (User_ID, Compensation, Location_ID);
@@ -0,0 +1,127 @@
+# Adds the Performance rollups (PerformanceRollup and the procedures that
+# maintain it) to a database bootstrapped before they existed, then fills
+# them from the existing samples. A fresh bootstrap already has them.
+#
+#   mysql -u root -p < database-files/migrations/008_performance_rollups.sql
+USE coopConnect;
+
+# Performance samples rolled up per minute, hour and day so long-range charts
+# read a few hundred rows instead of every sample. Each metric keeps a sum and
+# count (so averages combine exactly), min, max and p50. Minute p50s are exact;
+# hour and day p50s are the median of the finer buckets' p50s.
+# refresh_performance_rollups() keeps it current (see the Performance routes)
+Create table if not exists PerformanceRollup (
+    Resolution enum('minute', 'hour', 'day') not null,
+    Bucket datetime not null,
+    Samples int not null,
+    Avg_Speed_Sum double, Avg_Speed_Count int, Avg_Speed_Min int, Avg_Speed_Max int, Avg_Speed_P50 double,
+    Median_Speed_Sum double, Median_Speed_Count int, Median_Speed_Min int, Median_Speed_Max int, Median_Speed_P50 double,
+    Top_Speed_Sum double, Top_Speed_Count int, Top_Speed_Min int, Top_Speed_Max int, Top_Speed_P50 double,
+    Low_Speed_Sum double, Low_Speed_Count int, Low_Speed_Min int, Low_Speed_Max int, Low_Speed_P50 double,
+
+    Primary Key (Resolution, Bucket)
+);
+
+DELIMITER //
+#Recomputes one rollup level (hour or day) for buckets in [from_time, to_time)
+#from the level below it. Sums, counts, min and max combine exactly; p50 is
+#the median of the finer p50s. NULLs sort last so ROW_NUMBER counts values only
+DROP PROCEDURE IF EXISTS rollup_performance_level;
+CREATE PROCEDURE rollup_performance_level(IN from_res VARCHAR(10), IN to_res VARCHAR(10),
+                                          IN fmt VARCHAR(30), IN from_time DATETIME, IN to_time DATETIME)
+BEGIN
+    DELETE FROM PerformanceRollup
+    WHERE Resolution = to_res AND Bucket >= from_time AND Bucket < to_time;
+
+    INSERT INTO PerformanceRollup
+    SELECT to_res, Parent, SUM(Samples),
+           SUM(Avg_Speed_Sum), SUM(Avg_Speed_Count), MIN(Avg_Speed_Min), MAX(Avg_Speed_Max),
+           AVG(CASE WHEN a_rn IN (FLOOR((a_n + 1) / 2), CEIL((a_n + 1) / 2)) THEN Avg_Speed_P50 END),
+           SUM(Median_Speed_Sum), SUM(Median_Speed_Count), MIN(Median_Speed_Min), MAX(Median_Speed_Max),
+           AVG(CASE WHEN m_rn IN (FLOOR((m_n + 1) / 2), CEIL((m_n + 1) / 2)) THEN Median_Speed_P50 END),
+           SUM(Top_Speed_Sum), SUM(Top_Speed_Count), MIN(Top_Speed_Min), MAX(Top_Speed_Max),
+           AVG(CASE WHEN t_rn IN (FLOOR((t_n + 1) / 2), CEIL((t_n + 1) / 2)) THEN Top_Speed_P50 END),
+           SUM(Low_Speed_Sum), SUM(Low_Speed_Count), MIN(Low_Speed_Min), MAX(Low_Speed_Max),
+           AVG(CASE WHEN l_rn IN (FLOOR((l_n + 1) / 2), CEIL((l_n + 1) / 2)) THEN Low_Speed_P50 END)
+    FROM (
+        SELECT R.*, DATE_FORMAT(R.Bucket, fmt) AS Parent,
+               ROW_NUMBER() OVER (w ORDER BY R.Avg_Speed_P50 IS NULL, R.Avg_Speed_P50) AS a_rn,
+               COUNT(R.Avg_Speed_P50) OVER w AS a_n,
+               ROW_NUMBER() OVER (w ORDER BY R.Median_Speed_P50 IS NULL, R.Median_Speed_P50) AS m_rn,
+               COUNT(R.Median_Speed_P50) OVER w AS m_n,
+               ROW_NUMBER() OVER (w ORDER BY R.Top_Speed_P50 IS NULL, R.Top_Speed_P50) AS t_rn,
+               COUNT(R.Top_Speed_P50) OVER w AS t_n,
+               ROW_NUMBER() OVER (w ORDER BY R.Low_Speed_P50 IS NULL, R.Low_Speed_P50) AS l_rn,
+               COUNT(R.Low_Speed_P50) OVER w AS l_n
+        FROM PerformanceRollup R
+        WHERE R.Resolution = from_res AND R.Bucket >= from_time AND R.Bucket < to_time
+        WINDOW w AS (PARTITION BY DATE_FORMAT(R.Bucket, fmt))
+    ) ranked
+    GROUP BY Parent;
+END;//
+
+#Recomputes every rollup bucket that overlaps [from_time, to_time) from the
+#raw Performance rows. Call it after inserting, changing or deleting samples
+#in that range; it only reads the minutes, hours and days involved
+DROP PROCEDURE IF EXISTS refresh_performance_rollups;
+CREATE PROCEDURE refresh_performance_rollups(IN from_time DATETIME, IN to_time DATETIME)
+BEGIN
+    DECLARE last_time DATETIME DEFAULT to_time - INTERVAL 1 SECOND;
+    DECLARE minute_start DATETIME DEFAULT DATE_FORMAT(from_time, '%Y-%m-%d %H:%i:00');
+    DECLARE minute_end DATETIME DEFAULT DATE_FORMAT(last_time, '%Y-%m-%d %H:%i:00') + INTERVAL 1 MINUTE;
+    DECLARE hour_start DATETIME DEFAULT DATE_FORMAT(from_time, '%Y-%m-%d %H:00:00');
+    DECLARE hour_end DATETIME DEFAULT DATE_FORMAT(last_time, '%Y-%m-%d %H:00:00') + INTERVAL 1 HOUR;
+    DECLARE day_start DATETIME DEFAULT DATE(from_time);
+    DECLARE day_end DATETIME DEFAULT DATE(last_time) + INTERVAL 1 DAY;
+
+    DELETE FROM PerformanceRollup
+    WHERE Resolution = 'minute' AND Bucket >= minute_start AND Bucket < minute_end;
+
+    INSERT INTO PerformanceRollup
+    SELECT 'minute', Minute, COUNT(*),
+           SUM(Avg_Speed), COUNT(Avg_Speed), MIN(Avg_Speed), MAX(Avg_Speed),
+           AVG(CASE WHEN a_rn IN (FLOOR((a_n + 1) / 2), CEIL((a_n + 1) / 2)) THEN Avg_Speed END),
+           SUM(Median_Speed), COUNT(Median_Speed), MIN(Median_Speed), MAX(Median_Speed),
+           AVG(CASE WHEN m_rn IN (FLOOR((m_n + 1) / 2), CEIL((m_n + 1) / 2)) THEN Median_Speed END),
+           SUM(Top_Speed), COUNT(Top_Speed), MIN(Top_Speed), MAX(Top_Speed),
+           AVG(CASE WHEN t_rn IN (FLOOR((t_n + 1) / 2), CEIL((t_n + 1) / 2)) THEN Top_Speed END),
+           SUM(Low_Speed), COUNT(Low_Speed), MIN(Low_Speed), MAX(Low_Speed),
+           AVG(CASE WHEN l_rn IN (FLOOR((l_n + 1) / 2), CEIL((l_n + 1) / 2)) THEN Low_Speed END)
+    FROM (
+        SELECT P.Avg_Speed, P.Median_Speed, P.Top_Speed, P.Low_Speed,
+               DATE_FORMAT(P.`Date`, '%Y-%m-%d %H:%i:00') AS Minute,
+               ROW_NUMBER() OVER (w ORDER BY P.Avg_Speed IS NULL, P.Avg_Speed) AS a_rn,
+               COUNT(P.Avg_Speed) OVER w AS a_n,
+               ROW_NUMBER() OVER (w ORDER BY P.Median_Speed IS NULL, P.Median_Speed) AS m_rn,
+               COUNT(P.Median_Speed) OVER w AS m_n,
+               ROW_NUMBER() OVER (w ORDER BY P.Top_Speed IS NULL, P.Top_Speed) AS t_rn,
+               COUNT(P.Top_Speed) OVER w AS t_n,
+               ROW_NUMBER() OVER (w ORDER BY P.Low_Speed IS NULL, P.Low_Speed) AS l_rn,
+               COUNT(P.Low_Speed) OVER w AS l_n
+        FROM Performance P
+        WHERE P.`Date` >= minute_start AND P.`Date` < minute_end
+        WINDOW w AS (PARTITION BY DATE_FORMAT(P.`Date`, '%Y-%m-%d %H:%i:00'))
+    ) ranked
+    GROUP BY Minute;
+
+    CALL rollup_performance_level('minute', 'hour', '%Y-%m-%d %H:00:00', hour_start, hour_end);
+    CALL rollup_performance_level('hour', 'day', '%Y-%m-%d 00:00:00', day_start, day_end);
+END;//
+
+#Rebuilds every rollup from scratch, one day at a time
+DROP PROCEDURE IF EXISTS rebuild_performance_rollups;
+CREATE PROCEDURE rebuild_performance_rollups()
+BEGIN
+    DECLARE day_start DATETIME;
+    DECLARE last_day DATETIME;
+    DELETE FROM PerformanceRollup;
+    SELECT DATE(MIN(`Date`)), DATE(MAX(`Date`)) INTO day_start, last_day FROM Performance;
+    WHILE day_start <= last_day DO
+        CALL refresh_performance_rollups(day_start, day_start + INTERVAL 1 DAY);
+        SET day_start = day_start + INTERVAL 1 DAY;
+    END WHILE;
+END;//
+
+DELIMITER ;
+
+CALL rebuild_performance_rollups();
@@ -0,0 +1,29 @@
+# Adds ApiMetric, where the API writes its own request and query timings, to a
+# database bootstrapped before it existed. A fresh bootstrap already has it.
+#
+#   mysql -u root -p < database-files/migrations/009_api_metrics.sql
+USE coopConnect;
+
+# Request and query timings the API records about itself (backend/metrics),
+# one row per worker process, interval and endpoint or SQL statement. Histogram
+# is the JSON array of call counts per latency bucket, so percentiles can be
+# worked out over any range by adding histograms up
+Create table if not exists ApiMetric (
+    Metric_ID bigint auto_increment not null,
+    Recorded_At datetime not null,
+    Interval_Seconds int not null,
+    Worker varchar(100) not null,
+    Kind enum('endpoint', 'query') not null,
+    Name varchar(255) not null,
+    Calls int not null,
+    Errors int not null default 0,
+    Total_Ms double not null,
+    Max_Ms double not null,
+    Db_Ms double,
+    Db_Queries int,
+    Rows_Returned bigint,
+    Histogram json not null,
+
+    Primary Key (Metric_ID),
+    Index idx_apimetric_kind_time (Kind, Recorded_At)
+);
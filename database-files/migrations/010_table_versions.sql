@@ -0,0 +1,26 @@
+# Adds TableVersion, the counters the API's ETags are built from, to a
+# database bootstrapped before it existed. A fresh bootstrap already has it.
+#
+#   mysql -u root -p < database-files/migrations/010_table_versions.sql
+USE coopConnect;
+
+# A counter per table, bumped by the API once per write it makes to the table
+# (cache.invalidate() in backend/cache). The API builds its response ETags
+# from these, so any worker can tell whether a response is still current with
+# one primary key lookup, whichever process made the change
+Create table if not exists TableVersion (
+    Table_Name varchar(64) not null,
+    Version bigint unsigned not null default 0,
+
+    Primary Key (Table_Name)
+);
+
+INSERT INTO TableVersion (Table_Name) VALUES
+('Category'),
+('City'),
+('User'),
+('Location'),
+('Housing'),
+('Airport'),
+('Hospital'),
+('JobPosting');
@@ -0,0 +1,40 @@
+# Drops the per-row <table>_version_* triggers that an earlier version of
+# 010_table_versions.sql created. The API now bumps each TableVersion counter
+# once per write itself; the triggers would only add another update of the
+# same hot row for every row a bulk write touches.
+# Safe to run on a database that never had them.
+#
+#   mysql -u root -p < database-files/migrations/011_drop_version_triggers.sql
+USE coopConnect;
+
+DROP TRIGGER IF EXISTS category_version_insert;
+DROP TRIGGER IF EXISTS category_version_update;
+DROP TRIGGER IF EXISTS category_version_delete;
+
+DROP TRIGGER IF EXISTS city_version_insert;
+DROP TRIGGER IF EXISTS city_version_update;
+DROP TRIGGER IF EXISTS city_version_delete;
+
+DROP TRIGGER IF EXISTS user_version_insert;
+DROP TRIGGER IF EXISTS user_version_update;
+DROP TRIGGER IF EXISTS user_version_delete;
+
+DROP TRIGGER IF EXISTS location_version_insert;
+DROP TRIGGER IF EXISTS location_version_update;
+DROP TRIGGER IF EXISTS location_version_delete;
+
+DROP TRIGGER IF EXISTS housing_version_insert;
+DROP TRIGGER IF EXISTS housing_version_update;
+DROP TRIGGER IF EXISTS housing_version_delete;
+
+DROP TRIGGER IF EXISTS airport_version_insert;
+DROP TRIGGER IF EXISTS airport_version_update;
+DROP TRIGGER IF EXISTS airport_version_delete;
+
+DROP TRIGGER IF EXISTS hospital_version_insert;
+DROP TRIGGER IF EXISTS hospital_version_update;
+DROP TRIGGER IF EXISTS hospital_version_delete;
+
+DROP TRIGGER IF EXISTS jobposting_version_insert;
+DROP TRIGGER IF EXISTS jobposting_version_update;
+DROP TRIGGER IF EXISTS jobposting_version_delete;
@@ -0,0 +1,114 @@
+# Adds the Approximate flag to Housing, Airport and Hospital and the geo
+# triggers that keep it, so `flask import-geocodes` can tell coordinates
+# that only come from a zip from exact ones. A fresh bootstrap already has it.
+#
+# Every existing row starts out Approximate; rerun the import with
+# --facilities to mark the exact ones again.
+#
+#   mysql -u root -p < database-files/migrations/012_approximate_coordinates.sql
+USE coopConnect;
+
+ALTER TABLE Housing
+    ADD COLUMN Approximate boolean not null default true invisible;
+
+ALTER TABLE Airport
+    ADD COLUMN Approximate boolean not null default true invisible;
+
+ALTER TABLE Hospital
+    ADD COLUMN Approximate boolean not null default true invisible;
+
+DELIMITER //
+#New and moved housing listings take their zip's coordinates unless they
+#bring their own (Approximate says which), and Geo always follows
+#Latitude/Longitude so the spatial index (used by GET /housing/<id>/nearby
+#and /map/bbox) stays correct
+DROP TRIGGER IF EXISTS housing_geo_insert;
+CREATE TRIGGER housing_geo_insert
+BEFORE INSERT ON Housing
+FOR EACH ROW
+BEGIN
+    SET NEW.Approximate = NEW.Latitude IS NULL;
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude FROM Location WHERE Zip = NEW.zipID),
+            NEW.Longitude = (SELECT Longitude FROM Location WHERE Zip = NEW.zipID);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS housing_geo_update;
+CREATE TRIGGER housing_geo_update
+BEFORE UPDATE ON Housing
+FOR EACH ROW
+BEGIN
+    IF NEW.zipID <> OLD.zipID AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude FROM Location WHERE Zip = NEW.zipID),
+            NEW.Longitude = (SELECT Longitude FROM Location WHERE Zip = NEW.zipID),
+            NEW.Approximate = TRUE;
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS airport_geo_insert;
+CREATE TRIGGER airport_geo_insert
+BEFORE INSERT ON Airport
+FOR EACH ROW
+BEGIN
+    SET NEW.Approximate = NEW.Latitude IS NULL;
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS airport_geo_update;
+CREATE TRIGGER airport_geo_update
+BEFORE UPDATE ON Airport
+FOR EACH ROW
+BEGIN
+    IF NEW.Zip <> OLD.Zip AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Approximate = TRUE;
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS hospital_geo_insert;
+CREATE TRIGGER hospital_geo_insert
+BEFORE INSERT ON Hospital
+FOR EACH ROW
+BEGIN
+    SET NEW.Approximate = NEW.Latitude IS NULL;
+    IF NEW.Latitude IS NULL THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip);
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+
+DROP TRIGGER IF EXISTS hospital_geo_update;
+CREATE TRIGGER hospital_geo_update
+BEFORE UPDATE ON Hospital
+FOR EACH ROW
+BEGIN
+    IF NEW.Zip <> OLD.Zip AND NEW.Latitude <=> OLD.Latitude AND NEW.Longitude <=> OLD.Longitude THEN
+        SET NEW.Latitude = (SELECT Latitude + ((CRC32(NEW.Name) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Longitude = (SELECT Longitude + ((CRC32(REVERSE(NEW.Name)) % 201) - 100) / 100000 FROM Location WHERE Zip = NEW.Zip),
+            NEW.Approximate = TRUE;
+    END IF;
+    IF NEW.Latitude IS NOT NULL THEN
+        SET NEW.Geo = POINT(NEW.Longitude, NEW.Latitude);
+    END IF;
+END;//
+DELIMITER ;